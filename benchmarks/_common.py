@@ -0,0 +1,119 @@
+"""
+Shared helpers for the Siraj benchmark scripts.
+
+The scripts run against the ACTIVE project (server/store/active_paths.json),
+read vectors straight from its Chroma collection and never modify it: every
+experiment is built in a throwaway collection.
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from server.services.projects import get_active_manifest, ProjectManifest  # noqa: E402
+from server.services.vectorstore import _get_client, DEFAULT_COLLECTION  # noqa: E402
+
+
+def active_project() -> Tuple[Path, ProjectManifest]:
+    active = get_active_manifest()
+    if not active:
+        print("❌ No active project. Open one in the app (or POST /projects/open) first.")
+        sys.exit(1)
+    return active
+
+
+def load_collection(project_dir: Path, manifest: ProjectManifest, doc_id: Optional[str] = None) -> Dict[str, object]:
+    """All ids/documents/metadatas/embeddings of the project's collection."""
+    client = _get_client(str((project_dir / manifest.chroma_dir).resolve()))
+    col = client.get_collection(manifest.collection_name or DEFAULT_COLLECTION)
+    kw = {"where": {"doc_id": doc_id}} if doc_id else {}
+    res = col.get(include=["embeddings", "documents", "metadatas"], **kw)
+    if not res["ids"]:
+        print("❌ The collection is empty.")
+        sys.exit(1)
+    return {
+        "ids": list(res["ids"]),
+        "documents": list(res["documents"]),
+        "metadatas": list(res["metadatas"]),
+        "embeddings": np.asarray(res["embeddings"], dtype=np.float32),
+        "metadata": col.metadata or {},
+    }
+
+
+def normalize(m: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(m, axis=-1, keepdims=True)
+    n[n == 0] = 1.0
+    return m / n
+
+
+def exact_topk(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k (ground truth). Returns (n_queries, k) indices."""
+    sims = normalize(queries) @ normalize(corpus).T
+    k = min(k, corpus.shape[0])
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(sims, part, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+def recall(pred: Sequence, truth: Sequence) -> float:
+    t = set(truth)
+    return len(t.intersection(pred)) / max(1, len(t))
+
+
+def percentile(values: List[float], p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def sample_queries(documents: List[str], n: int, seed: int = 7) -> List[str]:
+    """Pseudo-queries: the first sentence of randomly sampled chunks."""
+    rnd = random.Random(seed)
+    picks = rnd.sample(documents, min(n, len(documents)))
+    out = []
+    for d in picks:
+        first = re.split(r"(?<=[.!?])\s+", (d or "").strip())[0]
+        out.append(first[:200] or d[:200])
+    return [q for q in out if q.strip()]
+
+
+def read_lines(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    return [ln.strip() for ln in Path(path).read_text(encoding="utf-8").splitlines() if ln.strip()]
+
+
+def build_scratch_collection(embeddings: np.ndarray, ids: List[str], metadata: Optional[dict] = None, batch: int = 512):
+    """In-memory Chroma collection with the given vectors (and HNSW metadata)."""
+    import chromadb
+    client = chromadb.EphemeralClient()
+    name = f"bench_{int(time.time() * 1e6)}"
+    col = client.create_collection(name, metadata=metadata or None)
+    for i in range(0, len(ids), batch):
+        col.add(ids=ids[i:i + batch], embeddings=embeddings[i:i + batch].tolist())
+    return client, col
+
+
+def timed_queries(col, queries: np.ndarray, k: int) -> Tuple[List[List[str]], List[float]]:
+    """Query one vector at a time (like the API does); returns ids + ms latencies."""
+    hits, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = col.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        hits.append(res["ids"][0])
+    return hits, lat
+
+
+def print_table(rows: List[Dict[str, object]], cols: List[str]) -> None:
+    widths = {c: max(len(c), *(len(f"{r.get(c, '')}") for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    print("  ".join("-" * widths[c] for c in cols))
+    for r in rows:
+        print("  ".join(f"{r.get(c, '')}".ljust(widths[c]) for c in cols))
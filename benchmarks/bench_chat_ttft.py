@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-token benchmark: /chat vs /chat/stream on a running server.
+
+For /chat the user sees nothing until the full answer arrives; for
+/chat/stream we measure when the first token event lands client-side, and
+compare it with the server-reported ttft_ms.
+
+Usage:
+    python benchmarks/bench_chat_ttft.py --doc-id doc_1a2b3c4d [--base http://localhost:8000]
+                                         [--questions questions.txt] [--repeat 3]
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from _common import percentile, print_table, read_lines
+
+DEFAULT_QUESTIONS = [
+    "What is the main idea of this document?",
+    "Explain the most important definition with an example.",
+    "What are the key steps described?",
+]
+
+
+def _blocking(base: str, doc_id: str, q: str) -> float:
+    t0 = time.perf_counter()
+    r = requests.post(f"{base}/chat", json={"doc_id": doc_id, "messages": [{"role": "user", "content": q}]}, timeout=300)
+    r.raise_for_status()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def _streaming(base: str, doc_id: str, q: str):
+    t0 = time.perf_counter()
+    first = server_ttft = None
+    with requests.post(
+        f"{base}/chat/stream",
+        json={"doc_id": doc_id, "messages": [{"role": "user", "content": q}]},
+        stream=True, timeout=300,
+    ) as r:
+        r.raise_for_status()
+        event = None
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                if event == "token" and first is None:
+                    first = (time.perf_counter() - t0) * 1000.0
+                elif event == "done":
+                    server_ttft = json.loads(line[5:]).get("ttft_ms")
+                elif event == "error":
+                    raise RuntimeError(line[5:])
+    return first or 0.0, (time.perf_counter() - t0) * 1000.0, server_ttft or 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare /chat latency with /chat/stream time-to-first-token")
+    ap.add_argument("--base", default="http://localhost:8000")
+    ap.add_argument("--doc-id", required=True)
+    ap.add_argument("--questions", help="text file, one question per line")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    base = args.base.rstrip("/")
+    questions = read_lines(args.questions) or DEFAULT_QUESTIONS
+    full, ttft, stream_total, server_ttft = [], [], [], []
+    for _ in range(args.repeat):
+        for q in questions:
+            full.append(_blocking(base, args.doc_id, q))
+            a, b, c = _streaming(base, args.doc_id, q)
+            ttft.append(a)
+            stream_total.append(b)
+            server_ttft.append(c)
+
+    rows = [
+        {"metric": "/chat full response", "p50_ms": f"{percentile(full, 50):.0f}", "p95_ms": f"{percentile(full, 95):.0f}"},
+        {"metric": "/chat/stream first token (client)", "p50_ms": f"{percentile(ttft, 50):.0f}", "p95_ms": f"{percentile(ttft, 95):.0f}"},
+        {"metric": "/chat/stream first token (server)", "p50_ms": f"{percentile(server_ttft, 50):.0f}", "p95_ms": f"{percentile(server_ttft, 95):.0f}"},
+        {"metric": "/chat/stream complete", "p50_ms": f"{percentile(stream_total, 50):.0f}", "p95_ms": f"{percentile(stream_total, 95):.0f}"},
+    ]
+    print(f"📊 {len(full)} requests per endpoint\n")
+    print_table(rows, ["metric", "p50_ms", "p95_ms"])
+
+
+if __name__ == "__main__":
+    main()
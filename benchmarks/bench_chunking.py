@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality / latency benchmark over chunking and k.
+
+Re-chunks the active project's PDFs for every (chunk_size, overlap) pair,
+indexes them in a scratch Chroma directory with the project's embedding
+settings, then asks each question and reports recall@k, MRR@k, query latency
+and index size. The live index is never touched.
+
+The question file is JSONL, one object per line (pages are 1-based):
+    {"question": "What does Newton's 2nd law state?", "pages": [12, 13], "doc_id": "doc_1a2b3c4d"}
+`doc_id` is optional; without it the question searches every document.
+
+Usage:
+    python benchmarks/bench_chunking.py --qa questions.jsonl
+        [--chunk-sizes 600,1200,2000] [--overlaps 0,150] [--ks 2,4,8]
+"""
+import argparse
+import itertools
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _common import active_project, load_collection, percentile, print_table
+from server.config import OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL
+from server.services.chunking import extract_pages, chunk_pages
+from server.services.embedder import OllamaEmbedViaEmbedRoute
+from server.services.vectorstore import hnsw_metadata
+
+EMBED_BATCH = 64
+
+
+def _ints(s: str):
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _load_qa(path: str):
+    qa = []
+    for ln in Path(path).read_text(encoding="utf-8").splitlines():
+        if ln.strip():
+            row = json.loads(ln)
+            qa.append({"question": row["question"], "pages": set(row["pages"]), "doc_id": row.get("doc_id")})
+    return qa
+
+
+def _project_docs(project_dir, m):
+    """doc_id -> source PDF, recovered from chunk metadata."""
+    meta = load_collection(project_dir, m)["metadatas"]
+    docs = {}
+    for md in meta:
+        if md and md.get("doc_id") and md.get("source") and Path(md["source"]).exists():
+            docs.setdefault(md["doc_id"], md["source"])
+    return docs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="recall@k / MRR / latency / index size per chunking config")
+    ap.add_argument("--qa", required=True, help="JSONL of {question, pages, doc_id?}")
+    ap.add_argument("--chunk-sizes", default="600,1200,2000")
+    ap.add_argument("--overlaps", default="0,150")
+    ap.add_argument("--ks", default="2,4,8")
+    args = ap.parse_args()
+
+    project_dir, m = active_project()
+    qa = _load_qa(args.qa)
+    docs = _project_docs(project_dir, m)
+    wanted = {q["doc_id"] for q in qa if q["doc_id"]} or set(docs)
+    docs = {d: s for d, s in docs.items() if d in wanted}
+    if not docs:
+        print("❌ None of the referenced documents have a source PDF on disk.")
+        return
+    pages = {d: extract_pages(s) for d, s in docs.items()}
+    ks = sorted(_ints(args.ks))
+
+    import chromadb
+    embed = OllamaEmbedViaEmbedRoute(model=m.embed_model or OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL, dim=m.embed_dim)
+    # question vectors don't depend on chunking: embed once
+    qvecs = embed.embed_documents([q["question"] for q in qa])
+
+    print(f"📊 {len(docs)} document(s), {len(qa)} question(s), ks={ks}\n")
+    rows = []
+    for size, overlap in itertools.product(_ints(args.chunk_sizes), _ints(args.overlaps)):
+        if overlap >= size:
+            continue
+        scratch = Path(tempfile.mkdtemp(prefix="siraj_bench_"))
+        try:
+            client = chromadb.PersistentClient(path=str(scratch))
+            col = client.create_collection("bench", metadata=hnsw_metadata(m.hnsw))
+            n_chunks, t0 = 0, time.perf_counter()
+            for doc_id, ptext in pages.items():
+                chunks = chunk_pages(ptext, {"doc_id": doc_id}, chunk_size=size, chunk_overlap=overlap)
+                for i in range(0, len(chunks), EMBED_BATCH):
+                    batch = chunks[i:i + EMBED_BATCH]
+                    col.add(
+                        ids=[f"{doc_id}:{c.metadata['chunk_index']}" for c in batch],
+                        embeddings=embed.embed_documents([c.page_content for c in batch]),
+                        metadatas=[c.metadata for c in batch],
+                    )
+                n_chunks += len(chunks)
+            index_s = time.perf_counter() - t0
+            index_mb = _dir_bytes(scratch) / 1e6
+
+            for k in ks:
+                hits, rr, lat = [], [], []
+                for q, qv in zip(qa, qvecs):
+                    kw = {"where": {"doc_id": q["doc_id"]}} if q["doc_id"] else {}
+                    t1 = time.perf_counter()
+                    res = col.query(query_embeddings=[qv], n_results=k, include=["metadatas"], **kw)
+                    lat.append((time.perf_counter() - t1) * 1000.0)
+                    got = [md.get("page") for md in res["metadatas"][0]]
+                    ranks = [r for r, p in enumerate(got, start=1) if p in q["pages"]]
+                    hits.append(1.0 if ranks else 0.0)
+                    rr.append(1.0 / ranks[0] if ranks else 0.0)
+                rows.append({
+                    "chunk_size": size, "overlap": overlap, "k": k, "chunks": n_chunks,
+                    "recall@k": f"{np.mean(hits):.3f}",
+                    "MRR": f"{np.mean(rr):.3f}",
+                    "p50_ms": f"{percentile(lat, 50):.2f}",
+                    "p95_ms": f"{percentile(lat, 95):.2f}",
+                    "index_MB": f"{index_mb:.1f}",
+                    "index_s": f"{index_s:.1f}",
+                })
+            del col, client
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print_table(rows, ["chunk_size", "overlap", "k", "chunks", "recall@k", "MRR", "p50_ms", "p95_ms", "index_MB", "index_s"])
+    print("\nApply a configuration with CHUNK_SIZE / CHUNK_OVERLAP / CHAT_TOPK (new ingests pick it up).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Matryoshka dimension benchmark.
+
+For each candidate dimension, truncates + re-normalizes the active project's
+vectors, indexes them in a scratch Chroma collection and reports search
+latency (p50/p95) and recall@k against exact full-dimension search.
+
+Usage:
+    python benchmarks/bench_embed_dims.py [--dims 128,256,512,768] [--k 10]
+                                          [--queries questions.txt] [--n-queries 50]
+"""
+import argparse
+
+import numpy as np
+
+from _common import (
+    active_project, load_collection, exact_topk, recall, percentile,
+    sample_queries, read_lines, build_scratch_collection, timed_queries, print_table,
+)
+from server.config import OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL
+from server.services.embedder import OllamaEmbedViaEmbedRoute, truncate_embeddings
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Search latency / recall per embedding dimension")
+    ap.add_argument("--dims", default="128,256,512,768")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", help="text file, one query per line (default: sampled chunk sentences)")
+    ap.add_argument("--n-queries", type=int, default=50)
+    args = ap.parse_args()
+
+    project_dir, m = active_project()
+    data = load_collection(project_dir, m)
+    ids, docs = data["ids"], data["documents"]
+    embed = OllamaEmbedViaEmbedRoute(model=m.embed_model or OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL)
+
+    corpus = data["embeddings"]
+    if m.embed_dim is not None:
+        # stored vectors are already truncated: re-embed to get the full-size reference
+        print(f"ℹ️  Project is stored at {m.embed_dim} dims; re-embedding {len(docs)} chunks at full size…")
+        corpus = np.asarray(embed.embed_documents(docs), dtype=np.float32)
+
+    queries = read_lines(args.queries) or sample_queries(docs, args.n_queries)
+    qvecs = np.asarray(embed.embed_documents(queries), dtype=np.float32)
+    full_dim = corpus.shape[1]
+    truth = exact_topk(qvecs, corpus, args.k)
+
+    print(f"📊 {len(ids)} chunks, {len(queries)} queries, k={args.k}, native dim={full_dim}\n")
+    rows = []
+    for dim in sorted({int(d) for d in args.dims.split(",") if d.strip()}):
+        if dim > full_dim:
+            continue
+        c = np.asarray(truncate_embeddings(corpus, dim), dtype=np.float32)
+        q = np.asarray(truncate_embeddings(qvecs, dim), dtype=np.float32)
+        _, col = build_scratch_collection(c, ids, data["metadata"])
+        hits, lat = timed_queries(col, q, args.k)
+        id_index = {i: n for n, i in enumerate(ids)}
+        rec = [recall([id_index[h] for h in hs], t) for hs, t in zip(hits, truth)]
+        rows.append({
+            "dim": dim,
+            f"recall@{args.k}": f"{np.mean(rec):.3f}",
+            "p50_ms": f"{percentile(lat, 50):.2f}",
+            "p95_ms": f"{percentile(lat, 95):.2f}",
+            "vectors_MB": f"{c.nbytes / 1e6:.1f}",
+        })
+    print_table(rows, ["dim", f"recall@{args.k}", "p50_ms", "p95_ms", "vectors_MB"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+HNSW parameter sweep.
+
+Replays the active project's real chat queries (queries.jsonl, written when
+the server runs with LOG_QUERIES=1; falls back to sampled chunk sentences) against scratch copies of its vectors built with
+every combination of M / construction_ef / search_ef, and reports build time,
+p50/p95 query latency and recall@k against exact search.
+
+Apply a winner with:
+    curl -X POST localhost:8000/index/hnsw -d '{"M": 16, "construction_ef": 100, "search_ef": 50}'
+
+Usage:
+    python benchmarks/bench_hnsw.py [--space cosine] [--M 8,16,32]
+                                    [--construction-ef 64,100,200] [--search-ef 10,50,100] [--k 4]
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from _common import (
+    active_project, load_collection, exact_topk, recall, percentile,
+    sample_queries, build_scratch_collection, timed_queries, print_table,
+)
+from server.config import OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL
+from server.services.embedder import OllamaEmbedViaEmbedRoute
+from server.services.querylog import load_queries
+
+
+def _ints(s: str):
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep HNSW parameters over the active project's queries")
+    ap.add_argument("--space", choices=["l2", "cosine", "ip"], default=None,
+                    help="distance (default: the project's current space)")
+    ap.add_argument("--M", default="8,16,32")
+    ap.add_argument("--construction-ef", default="64,100,200")
+    ap.add_argument("--search-ef", default="10,50,100")
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--n-queries", type=int, default=200)
+    args = ap.parse_args()
+
+    project_dir, m = active_project()
+    data = load_collection(project_dir, m)
+    ids, corpus = data["ids"], data["embeddings"]
+    space = args.space or (m.hnsw or {}).get("space") or "l2"
+
+    queries = load_queries(project_dir, limit=args.n_queries)
+    source = "query log"
+    if not queries:
+        queries, source = sample_queries(data["documents"], args.n_queries), "sampled chunks"
+    embed = OllamaEmbedViaEmbedRoute(model=m.embed_model or OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL, dim=m.embed_dim)
+    qvecs = np.asarray(embed.embed_documents(queries), dtype=np.float32)
+
+    # Exact neighbours as ground truth (vectors are unit-norm, so cosine ranks = l2 ranks)
+    truth = exact_topk(qvecs, corpus, args.k)
+    id_index = {i: n for n, i in enumerate(ids)}
+
+    print(f"📊 {len(ids)} chunks, {len(queries)} queries ({source}), space={space}, k={args.k}\n")
+    rows = []
+    for M, cef, sef in itertools.product(_ints(args.M), _ints(args.construction_ef), _ints(args.search_ef)):
+        meta = {"hnsw:space": space, "hnsw:M": M, "hnsw:construction_ef": cef, "hnsw:search_ef": sef}
+        t0 = time.perf_counter()
+        _, col = build_scratch_collection(corpus, ids, meta)
+        build_s = time.perf_counter() - t0
+        hits, lat = timed_queries(col, qvecs, args.k)
+        rec = [recall([id_index[h] for h in hs], t) for hs, t in zip(hits, truth)]
+        rows.append({
+            "M": M, "construction_ef": cef, "search_ef": sef,
+            "build_s": f"{build_s:.2f}",
+            "p50_ms": f"{percentile(lat, 50):.2f}",
+            "p95_ms": f"{percentile(lat, 95):.2f}",
+            f"recall@{args.k}": f"{np.mean(rec):.3f}",
+        })
+    print_table(rows, ["M", "construction_ef", "search_ef", "build_s", "p50_ms", "p95_ms", f"recall@{args.k}"])
+
+
+if __name__ == "__main__":
+    main()
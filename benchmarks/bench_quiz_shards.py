@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Quiz generation wall-clock: one structured call vs parallel shards.
+
+Runs generate_quiz_from_doc in-process against the active project for each
+shard size (0 = the single-call path) and reports wall-clock p50/p95, how
+many questions came from the LLM (not the placeholder fallback) and how many
+near-duplicate stems the merge dropped. The response cache is disabled so
+every run hits Ollama; shards only overlap if Ollama serves requests in
+parallel (OLLAMA_NUM_PARALLEL > 1).
+
+Usage:
+    python benchmarks/bench_quiz_shards.py --doc-id doc_1a2b3c4d [--n 20]
+                                           [--shard-sizes 0,4,5,10] [--repeat 3]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ["LLM_CACHE_ROUTES"] = ""  # measure generation, not cache hits
+
+from _common import active_project, percentile, print_table  # noqa: E402
+from server.services.quizgen import generate_quiz_from_doc, quiz_stats  # noqa: E402
+
+
+async def _run(doc_id: str, n: int, shard_sizes, repeat: int):
+    rows = []
+    for size in shard_sizes:
+        times, from_llm, dups = [], [], []
+        for _ in range(repeat):
+            before = quiz_stats.snapshot()
+            t0 = time.perf_counter()
+            spec = await generate_quiz_from_doc(doc_id, n_questions=n, shard_size=size)
+            times.append(time.perf_counter() - t0)
+            after = quiz_stats.snapshot()
+            from_llm.append(len(spec.questions)
+                            - (after["fallback_questions"] - before["fallback_questions"])
+                            - (after["cloze_questions"] - before["cloze_questions"]))
+            dups.append(after["duplicates_dropped"] - before["duplicates_dropped"])
+        rows.append({
+            "shard_size": size or "single call",
+            "p50_s": f"{percentile(times, 50):.1f}",
+            "p95_s": f"{percentile(times, 95):.1f}",
+            "llm_questions": f"{sum(from_llm) / len(from_llm):.1f}/{n}",
+            "dups_dropped": f"{sum(dups) / len(dups):.1f}",
+        })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Single-call vs sharded quiz generation latency")
+    ap.add_argument("--doc-id", required=True)
+    ap.add_argument("--n", type=int, default=20)
+    ap.add_argument("--shard-sizes", default="0,4,5,10")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    active_project()
+    sizes = [int(s) for s in args.shard_sizes.split(",") if s.strip()]
+    rows = asyncio.run(_run(args.doc_id, args.n, sizes, args.repeat))
+    print(f"📊 {args.n}-question quiz, {args.repeat} run(s) per configuration\n")
+    print_table(rows, ["shard_size", "p50_s", "p95_s", "llm_questions", "dups_dropped"])
+    print("\nPick the default with QUIZ_SHARD_SIZE (0 disables sharding).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Siraj Compaction Script
+
+Reclaims space left behind by deleted documents in the ACTIVE project:
+1. Rebuilds the project's Chroma collection (HNSW indexes never shrink)
+2. VACUUMs the SQLite databases
+
+Stop the server first, or use POST /index/compact while it is running.
+
+Usage:
+    python compact_data.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from server.services.projects import get_active_manifest
+from server.services.reindex import compact_project
+
+
+def _human(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def main():
+    print("🧹 Siraj Compaction")
+    print("=" * 50)
+
+    active = get_active_manifest()
+    if not active:
+        print("❌ No active project. Open a project in the app first.")
+        sys.exit(1)
+    project_dir, manifest = active
+    print(f"   Project: {manifest.title} ({project_dir})")
+
+    try:
+        out = compact_project(project_dir, manifest)
+    except Exception as e:
+        print(f"\n❌ Compaction failed: {e}")
+        sys.exit(1)
+
+    print(f"   ✅ Rebuilt {out['copied']} chunks into {out['collection']}")
+    for p in out["vacuumed"]:
+        print(f"   ✅ VACUUM {p}")
+    for p, err in out["vacuum_errors"].items():
+        print(f"   ⚠️  Could not VACUUM {p}: {err}")
+    print(f"\n🎉 {_human(out['bytes_before'])} → {_human(out['bytes_after'])} "
+          f"(reclaimed {_human(out['bytes_reclaimed'])})")
+
+
+if __name__ == "__main__":
+    main()
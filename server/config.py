@@ -19,10 +19,63 @@ FALLBACK_CHROMA_DIR = Path(os.getenv("CHROMA_DIR", "server/store/chroma")).resol
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
 OLLAMA_LLM_MODEL = os.getenv("OLLAMA_LLM_MODEL", "llama3.1")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))            # default per-call timeout
+LLM_QUIZ_TIMEOUT_S = float(os.getenv("LLM_QUIZ_TIMEOUT_S", "240"))  # 2k-token quiz generations
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))   # pooled HTTP connections to Ollama
+LLM_TELEMETRY_BUFFER = int(os.getenv("LLM_TELEMETRY_BUFFER", "1000"))  # recent calls kept for /metrics/llm
+LLM_NUM_CTX = int(os.getenv("LLM_NUM_CTX", "8192"))                  # context window requested from Ollama
+
+# -------- Warm-up / keep-alive (services/warmup.py) --------
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1") == "1"                          # preload models on startup
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")                       # sent with every request
+OLLAMA_KEEPALIVE_IDLE_S = float(os.getenv("OLLAMA_KEEPALIVE_IDLE_S", "7200"))  # stop refreshing after this much idle
+
+# -------- Prompt packing (services/prompt_packer.py) --------
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4.0"))  # initial estimate, self-calibrating
+PROMPT_SAFETY_TOKENS = int(os.getenv("PROMPT_SAFETY_TOKENS", "128"))        # headroom for the model's chat template
+
+# -------- LLM scheduler (services/scheduler.py) --------
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "4"))                 # concurrent generations sent to Ollama
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "1"))  # slots only chat may use
+LLM_QUEUE_LIMITS = {
+    k.strip(): int(v)
+    for k, v in (kv.split("=", 1) for kv in os.getenv(
+        "LLM_QUEUE_LIMITS", "interactive=32,batch=256,background=512"
+    ).split(",") if "=" in kv)
+}
+
+# -------- LLM response cache (opt-in per route) --------
+LLM_CACHE_ROUTES = {r.strip() for r in os.getenv("LLM_CACHE_ROUTES", "").split(",") if r.strip()}
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "server/store/llm_cache.sqlite3")).resolve()
+
+# -------- Retrieval (see benchmarks/bench_chunking.py to tune) --------
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+CHAT_TOPK = int(os.getenv("CHAT_TOPK", "4"))
+LOG_QUERIES = os.getenv("LOG_QUERIES", "0") == "1"   # append chat queries to the project's queries.jsonl (bench_hnsw replays them)
+
+# -------- Embedding migration (re-embed a project with a new model) --------
+EMBED_MIGRATION_BATCH = int(os.getenv("EMBED_MIGRATION_BATCH", "32"))
+EMBED_MIGRATION_MAX_CHUNKS_PER_S = float(os.getenv("EMBED_MIGRATION_MAX_CHUNKS_PER_S", "20"))
 
 # -------- Summarize tuning --------
-SUMMARIZE_TOPK = int(os.getenv("SUMMARIZE_TOPK", "200"))
-SUMMARIZE_MAX_MAP_CHUNKS = int(os.getenv("SUMMARIZE_MAX_MAP_CHUNKS", "60"))
+SUMMARIZE_TOPK = int(os.getenv("SUMMARIZE_TOPK", "0"))                          # cap on chunks read, sampled evenly (0 = all)
+SUMMARIZE_MAX_MAP_CHUNKS = int(os.getenv("SUMMARIZE_MAX_MAP_CHUNKS", "0"))       # cap on map calls (0 = unlimited)
+SUMMARIZE_MAP_WINDOW_TOKENS = int(os.getenv("SUMMARIZE_MAP_WINDOW_TOKENS", "1500"))  # consecutive chunks per map call
+SUMMARIZE_CONCURRENCY = int(os.getenv("SUMMARIZE_CONCURRENCY", "4"))             # map/reduce calls in flight per summary
+SUMMARIZE_DEADLINE_S = float(os.getenv("SUMMARIZE_DEADLINE_S", "90"))            # time budget per summary (0 = none)
+SECTION_SUMMARIES = os.getenv("SECTION_SUMMARIES", "0") == "1"                  # opt-in: summarize chapters in the background after ingest
+SECTION_WINDOW_PAGES = int(os.getenv("SECTION_WINDOW_PAGES", "10"))              # section size when the PDF has no outline
+
+# -------- Quiz generation --------
+QUIZ_SHARD_SIZE = int(os.getenv("QUIZ_SHARD_SIZE", "4"))            # questions per parallel shard (0 = one call)
+QUIZ_CHUNKS_PER_SHARD = int(os.getenv("QUIZ_CHUNKS_PER_SHARD", "3"))  # retrieved chunks grounding each shard
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "2"))              # ready quizzes buffered per document (0 = off)
+QUIZ_POOL_DOCS = int(os.getenv("QUIZ_POOL_DOCS", "4"))              # recently used documents buffered per project
+QUIZ_BANK_DUPLICATE_SIM = float(os.getenv("QUIZ_BANK_DUPLICATE_SIM", "0.9"))  # stem cosine similarity = duplicate
+QUIZ_BANK_MIN_RATIO = int(os.getenv("QUIZ_BANK_MIN_RATIO", "3"))    # bank >= ratio x n questions: assemble (0 = off)
 
 # -------- Helpers --------
 def _read_active_paths() -> Optional[dict]:
@@ -44,6 +97,16 @@ def resolve_chroma_dir() -> Path:
         return Path(active["chroma_dir"]).resolve()
     return FALLBACK_CHROMA_DIR
 
+def resolve_sqlite_path() -> Path:
+    """
+    Returns the active project's SQLite database (manifest sqlite_path) if set,
+    otherwise server/store/sqlite.db.
+    """
+    active = _read_active_paths()
+    if active and active.get("sqlite_path"):
+        return Path(active["sqlite_path"]).resolve()
+    return Path("server/store/sqlite.db").resolve()
+
 def ensure_project_scaffold(project_id: str | None = None):
     """
     Minimal PoC scaffold creation. Creates resources/ and media/ for a project,
@@ -1,26 +1,108 @@
 # server/deps.py
 from __future__ import annotations
+from dataclasses import dataclass
 from functools import lru_cache
 from typing import Optional
 
-from server.services.vectorstore import get_vectordb as _make_vectordb
+import httpx
+
+from server.services.vectorstore import get_vectordb as _make_vectordb, DEFAULT_COLLECTION
 from server.services.embedder import OllamaEmbedViaEmbedRoute
+from server.services.llm import AsyncOllamaGenerateClient
+from server.services.scheduler import get_scheduler
+from server.services.projects import get_active_manifest
 from server.config import (
     resolve_chroma_dir,
     OLLAMA_BASE_URL,
     OLLAMA_EMBED_MODEL,
+    OLLAMA_LLM_MODEL,
+    LLM_TIMEOUT_S,
+    LLM_MAX_CONNECTIONS,
+    LLM_NUM_CTX,
+    OLLAMA_KEEP_ALIVE,
 )
 
+# ---------- LLM (shared, pooled) ----------
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    One keep-alive connection pool to Ollama for the whole process, used by
+    `async def` routes for both generate and embed calls. Closed on shutdown
+    (see main.lifespan).
+    """
+    return httpx.AsyncClient(
+        base_url=OLLAMA_BASE_URL,
+        timeout=LLM_TIMEOUT_S,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        ),
+    )
+
+@lru_cache(maxsize=8)
+def get_async_llm(model: str = OLLAMA_LLM_MODEL) -> AsyncOllamaGenerateClient:
+    """
+    Async generate clients by model, sharing get_async_http_client() and the
+    process-wide priority scheduler (services/scheduler.py).
+    """
+    return AsyncOllamaGenerateClient(
+        model=model,
+        host=OLLAMA_BASE_URL,
+        http=get_async_http_client(),
+        timeout=LLM_TIMEOUT_S,
+        scheduler=get_scheduler(),
+        num_ctx=LLM_NUM_CTX,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+async def close_http_clients() -> None:
+    """Close the pooled client (if it was ever created)."""
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
+        get_async_http_client.cache_clear()
+        get_async_llm.cache_clear()
+        reset_vectordb_cache()
+
 # ---------- Embeddings ----------
 @lru_cache(maxsize=4)
 def get_embedding_fn(
     model: str = OLLAMA_EMBED_MODEL,
     base_url: str = OLLAMA_BASE_URL,
+    dim: Optional[int] = None,
 ) -> OllamaEmbedViaEmbedRoute:
     """
-    Lazily create (and cache) the embedding function by model+base_url.
+    Lazily create (and cache) the embedding function by model+base_url(+dim).
+    """
+    return OllamaEmbedViaEmbedRoute(model=model, base_url=base_url, dim=dim, keep_alive=OLLAMA_KEEP_ALIVE)
+
+# ---------- Index settings (project-aware) ----------
+@dataclass(frozen=True)
+class IndexSettings:
+    chroma_dir: str
+    collection_name: str = DEFAULT_COLLECTION
+    embed_model: str = OLLAMA_EMBED_MODEL
+    embed_dim: Optional[int] = None
+    hnsw: tuple = ()                  # sorted (key, value) pairs, hashable for the cache
+
+def get_index_settings() -> IndexSettings:
+    """
+    Vector index settings for the CURRENT active project, read from its
+    .sirajproj manifest. Falls back to global defaults if no project is open.
     """
-    return OllamaEmbedViaEmbedRoute(model=model, base_url=base_url)
+    chroma_dir = str(resolve_chroma_dir())
+    active = get_active_manifest()
+    if not active:
+        return IndexSettings(chroma_dir=chroma_dir)
+    _, m = active
+    return IndexSettings(
+        chroma_dir=chroma_dir,
+        collection_name=m.collection_name or DEFAULT_COLLECTION,
+        # queries must use the model the vectors were built with, even if the
+        # configured OLLAMA_EMBED_MODEL changed since (see /index/embed-model)
+        embed_model=m.embed_model or OLLAMA_EMBED_MODEL,
+        embed_dim=m.embed_dim,
+        hnsw=tuple(sorted((m.hnsw or {}).items())),
+    )
 
 # ---------- Vector DB (project-aware) ----------
 @lru_cache(maxsize=8)
@@ -28,6 +110,9 @@ def _vectordb_for_dir(
     persist_directory: str,
     base_url: str = OLLAMA_BASE_URL,
     embed_model: str = OLLAMA_EMBED_MODEL,
+    embed_dim: Optional[int] = None,
+    collection_name: str = DEFAULT_COLLECTION,
+    hnsw: tuple = (),
 ):
     """
     Internal cache keyed by the Chroma persist directory (plus embed settings).
@@ -36,17 +121,29 @@ def _vectordb_for_dir(
         persist_directory=persist_directory,
         base_url=base_url,
         embed_model=embed_model,
+        embed_dim=embed_dim,
+        collection_name=collection_name,
+        hnsw=dict(hnsw) or None,
+        ahttp=get_async_http_client(),
+        keep_alive=OLLAMA_KEEP_ALIVE,
     )
 
 def get_vectordb():
     """
-    Public accessor that looks up the CURRENT active project's chroma dir
-    every time it is called, and returns a cached instance for that dir.
+    Public accessor that looks up the CURRENT active project's index settings
+    every time it is called, and returns a cached instance for them.
     """
-    chroma_dir = str(resolve_chroma_dir())
+    s = get_index_settings()
     # Using the cached factory by directory keeps switching fast without leaks.
     return _vectordb_for_dir(
-        persist_directory=chroma_dir,
+        persist_directory=s.chroma_dir,
         base_url=OLLAMA_BASE_URL,
-        embed_model=OLLAMA_EMBED_MODEL,
+        embed_model=s.embed_model,
+        embed_dim=s.embed_dim,
+        collection_name=s.collection_name,
+        hnsw=s.hnsw,
     )
+
+def reset_vectordb_cache() -> None:
+    """Drop cached vector stores (call after an index is rebuilt or swapped)."""
+    _vectordb_for_dir.cache_clear()
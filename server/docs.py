@@ -1,7 +1,18 @@
 # server/docs.py
-from fastapi import APIRouter, Query
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
 from pathlib import Path
 from .deps import get_vectordb
+from .config import PROJECTS_DIR
+from .services.quiz_store import delete_quizzes_for_doc
+from .services.quizpool import quiz_pool
+from .services.question_bank import delete_bank_for_doc
+from .services import attempts as attempt_store
+from .services.brainrot import delete_media_for_doc
+from .services.projects import get_active_manifest
+from .services.reindex import INDEX_WRITE_LOCK
+from .services.summary_store import delete_summaries_for_doc
+from .services.vectorstore import delete_doc_vectors
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -32,3 +43,59 @@ def list_documents(debug: bool = Query(False)):
         sample = col.get(include=["metadatas"], limit=3).get("metadatas") or []
         return {"docs": docs, "debug": {"count": count, "sample": sample}}
     return docs
+
+def _owned_resource(src: str) -> bool:
+    """Only delete files that live inside a Siraj project folder."""
+    p = Path(src).resolve()
+    roots = [PROJECTS_DIR.resolve()]
+    active = get_active_manifest()
+    if active:
+        roots.append(active[0].resolve())
+    return p.is_file() and any(p.is_relative_to(r) for r in roots)
+
+@router.delete("/{doc_id}")
+async def delete_document(doc_id: str):
+    """
+    Remove a document and everything derived from it: its chunks in the
+    vector store, the uploaded file, quizzes + attempts, banked questions,
+    its stored summary and brainrot media.
+    """
+    # on the loop: cancels pool refills for the doc before its bank is deleted
+    quiz_pool.drop(doc_id)
+    return await asyncio.to_thread(_delete_document, doc_id)
+
+def _delete_document(doc_id: str) -> dict:
+    with INDEX_WRITE_LOCK:
+        col = get_vectordb()._collection
+        chunks, sources = delete_doc_vectors(col, doc_id)
+
+    files = 0
+    for src in sources:
+        # the same file may back a newer ingest of the document; keep it then
+        still_used = col.get(where={"source": src}, limit=1, include=[]).get("ids")
+        if not still_used and _owned_resource(src):
+            Path(src).unlink()
+            files += 1
+
+    quiz = delete_quizzes_for_doc(doc_id)
+    banked = delete_bank_for_doc(doc_id)
+    attempts = attempt_store.delete_attempts_for_doc(doc_id)
+    media = delete_media_for_doc(doc_id)
+    summaries = delete_summaries_for_doc(doc_id)
+
+    if not (chunks or quiz["quizzes"] or quiz["quiz_attempts"] or attempts or media or summaries or banked):
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id={doc_id}")
+
+    print(f"[/documents] deleted {doc_id}: chunks={chunks} files={files} {quiz} attempts={attempts} media={media} summaries={summaries} banked={banked}")
+    return {
+        "doc_id": doc_id,
+        "deleted": {
+            "chunks": chunks,
+            "resource_files": files,
+            **quiz,
+            "attempt_records": attempts,
+            "media_files": media,
+            "summaries": summaries,
+            "banked_questions": banked,
+        },
+    }
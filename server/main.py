@@ -1,13 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .routes.files import router as files_router
 from .docs import router as documents_router
 from .routes import api as api_router
-
-
-
-app = FastAPI(title="Siraj API")
+from .deps import close_http_clients, get_async_http_client, get_index_settings
+from .config import OLLAMA_WARMUP, OLLAMA_LLM_MODEL, OLLAMA_EMBED_MODEL
+from .services.warmup import get_keeper
+from .services.quizpool import quiz_pool
+from .services.telemetry import RouteLabelMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    keeper = get_keeper()
+    if OLLAMA_WARMUP:
+        # the open project may pin an older embedding model than the configured one
+        embed_models = list(dict.fromkeys([get_index_settings().embed_model, OLLAMA_EMBED_MODEL]))
+        keeper.start(get_async_http_client(), [OLLAMA_LLM_MODEL], embed_models)
+    else:
+        keeper.skip()
+    yield
+    await quiz_pool.stop()
+    await keeper.stop()
+    await close_http_clients()
+
+
+app = FastAPI(title="Siraj API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +39,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RouteLabelMiddleware)
+
 app.include_router(api_router)
 app.include_router(files_router)
 app.include_router(documents_router)
@@ -25,3 +49,9 @@ app.include_router(documents_router)
 def health():
     return {"ok": True}
 
+@app.get("/ready")
+def ready():
+    """503 until the LLM and embedding models have been loaded into Ollama."""
+    status = get_keeper().status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
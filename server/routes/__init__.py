@@ -9,6 +9,8 @@ from .suggest import router as suggest_router
 from .progress import router as progress_router
 from .brainrot import router as brainrot_router
 from .projects import router as projects_router
+from .index import router as index_router
+from .metrics import router as metrics_router
 
 api = APIRouter()
 api.include_router(files_router)
@@ -21,6 +23,8 @@ api.include_router(suggest_router)
 api.include_router(progress_router)
 api.include_router(brainrot_router)
 api.include_router(projects_router)
+api.include_router(index_router)
+api.include_router(metrics_router)
 
 #  choco install -y ffmpeg
 # choco install -y espeak
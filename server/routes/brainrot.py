@@ -18,9 +18,9 @@ class SummaryReq(BaseModel):
     duration_sec: int | None = 30
 
 @router.post("/summary")
-def brainrot_summary(req: SummaryReq):
+async def brainrot_summary(req: SummaryReq):
     job_id = uuid.uuid4().hex
-    script_text, sections = build_script_with_llm(req.doc_id, req.style or "memetic", req.duration_sec or 30)
+    script_text, sections = await build_script_with_llm(req.doc_id, req.style or "memetic", req.duration_sec or 30)
     m = BrainrotManifest(job_id=job_id, doc_id=req.doc_id, style=req.style or "memetic",
                          summary_text=script_text, sections=sections)
     save_manifest(m)
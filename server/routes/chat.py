@@ -1,11 +1,16 @@
 # server/routes/chat.py
+import time
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Literal, Dict, Any
-from ..deps import get_vectordb
-from ..services.llm import OllamaGenerateClient
+from typing import List, Literal, Dict, Any, Tuple
+from ..deps import get_vectordb, get_async_llm
 from ..services.sentiment import classify_sentiment, sentiment_emoji
-from ..config import OLLAMA_BASE_URL, OLLAMA_LLM_MODEL
+from ..services.querylog import submit_query
+from ..services.vectorstore import asimilarity_search_with_score
+from ..services.prompt_packer import PackedPrompt, Section, pack_prompt, prompt_budget
+from ..utils.sse import sse_event
+from ..config import CHAT_TOPK
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -26,33 +31,47 @@ class ChatResponse(BaseModel):
     citations: List[Citation] = []
     sentiment: Literal["positive", "neutral", "negative"] = "neutral"
     emoji: str = "🙂"
+    prompt_tokens: Dict[str, Any] | None = None   # packer report: budget, tokens per section
 
-def _build_prompt(context_blocks: List[Dict[str, Any]], history: List[Message], mood: str) -> str:
-    context_text = "\n\n".join(
-        f"[p.{m.get('page', '?')}] {m.get('text','')}" for m in context_blocks
-    )
-    history_text = "\n".join(f"{m.role.upper()}: {m.content}" for m in history[-6:])  # small window
-    tone_line = {
-        "positive": "Be concise and encouraging.",
-        "neutral":  "Be clear and direct.",
-        "negative": "Be extra gentle, simplify concepts, and offer a short analogy.",
-    }[mood]
+NUM_PREDICT = 512
 
-    return f"""You are Siraj, a helpful tutor. Use ONLY the context to answer.
+PROMPT_TEMPLATE = """You are Siraj, a helpful tutor. Use ONLY the context to answer.
 If something is unknown or outside the context, say you don't know.
 
 {tone_line}
 
 # CONTEXT
-{context_text}
+{context}
 
 # CHAT (latest last)
-{history_text}
+{history}
 
 ASSISTANT:"""
 
-@router.post("", response_model=ChatResponse)
-def chat(req: ChatRequest):
+def _build_prompt(context_blocks: List[Dict[str, Any]], history: List[Message], mood: str) -> PackedPrompt:
+    """
+    Pack within the model's context: the latest turn is always kept, then the
+    ranked chunks (best first), then as much earlier history as still fits.
+    """
+    tone_line = {
+        "positive": "Be concise and encouraging.",
+        "neutral":  "Be clear and direct.",
+        "negative": "Be extra gentle, simplify concepts, and offer a short analogy.",
+    }[mood]
+
+    return pack_prompt(
+        PROMPT_TEMPLATE.replace("{tone_line}", tone_line),
+        [
+            Section("context", [f"[p.{m.get('page', '?')}] {m.get('text','')}" for m in context_blocks]),
+            Section("history", [f"{m.role.upper()}: {m.content}" for m in history],
+                    separator="\n", keep="tail", min_items=1),
+        ],
+        budget=prompt_budget(NUM_PREDICT),
+        estimator=get_async_llm().tokens,
+    )
+
+async def _prepare(req: ChatRequest) -> Tuple[str, str, List[Citation], PackedPrompt]:
+    """Sentiment + retrieval + prompt. Returns (mood, emoji, citations, prompt)."""
     if not req.messages:
         raise HTTPException(status_code=400, detail="messages is empty")
 
@@ -65,7 +84,8 @@ def chat(req: ChatRequest):
     # 2) Retrieve context from Chroma
     db = get_vectordb()
     query_text = user_text or req.messages[-1].content
-    results = db.similarity_search_with_score(query_text, k=4, filter={"doc_id": req.doc_id})
+    submit_query(query_text, req.doc_id)
+    results = await asimilarity_search_with_score(db, query_text, k=CHAT_TOPK, filter={"doc_id": req.doc_id})
 
     context_blocks = []
     citations: List[Citation] = []
@@ -78,10 +98,14 @@ def chat(req: ChatRequest):
         context_blocks.append({"page": page, "text": text})
         citations.append(Citation(page=page, snippet=snippet))
 
+    return mood, emoji, citations, _build_prompt(context_blocks, req.messages, mood)
+
+@router.post("", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    mood, emoji, citations, prompt = await _prepare(req)
+
     # 3) Generate with tone adapted to sentiment
-    llm = OllamaGenerateClient(model=OLLAMA_LLM_MODEL, host=OLLAMA_BASE_URL)
-    prompt = _build_prompt(context_blocks, req.messages, mood)
-    raw_answer = llm.generate(prompt, temperature=0.2, num_predict=512)
+    raw_answer = await get_async_llm().generate(prompt.text, temperature=0.2, num_predict=NUM_PREDICT, route="chat")
 
     # 4) Add small empathetic lead-in emoji (non-intrusive)
     friendly_answer = f"{emoji} {raw_answer}".strip()
@@ -91,4 +115,51 @@ def chat(req: ChatRequest):
         citations=citations,
         sentiment=mood,
         emoji=emoji,
+        prompt_tokens=prompt.report(),
+    )
+
+@router.post("/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-Sent Events version of /chat:
+      event: meta   -> {citations, sentiment, emoji, prompt_tokens} (before generation starts)
+      event: token  -> {delta}                               (as Ollama produces text)
+      event: done   -> {answer, ttft_ms, total_ms, chunks}   (full answer + timings)
+      event: error  -> {detail}                              (generation failed mid-stream)
+    """
+    t0 = time.perf_counter()
+    mood, emoji, citations, prompt = await _prepare(req)
+    llm = get_async_llm()
+
+    async def events():
+        yield sse_event("meta", {
+            "citations": [c.dict() for c in citations],
+            "sentiment": mood,
+            "emoji": emoji,
+            "prompt_tokens": prompt.report(),
+        })
+        parts: List[str] = []
+        ttft_ms = None
+        try:
+            async for delta in llm.generate_stream(prompt.text, temperature=0.2, num_predict=NUM_PREDICT, route="chat"):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+                parts.append(delta)
+                yield sse_event("token", {"delta": delta})
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+            return
+        total_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        print(f"[/chat/stream] doc={req.doc_id} ttft_ms={ttft_ms} total_ms={total_ms} chunks={len(parts)}")
+        yield sse_event("done", {
+            "answer": f"{emoji} {''.join(parts).strip()}".strip(),
+            "ttft_ms": ttft_ms,
+            "total_ms": total_ms,
+            "chunks": len(parts),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
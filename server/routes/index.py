@@ -0,0 +1,106 @@
+# server/routes/index.py
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+from ..deps import get_index_settings, get_vectordb
+from ..services import jobs
+from ..services.projects import get_active_manifest
+from ..config import OLLAMA_EMBED_MODEL, EMBED_MIGRATION_BATCH, EMBED_MIGRATION_MAX_CHUNKS_PER_S
+from ..services.reindex import migrate_embed_dim, migrate_embed_model, migrate_hnsw, compact_project
+
+router = APIRouter(prefix="/index", tags=["index"])
+
+def _require_project():
+    active = get_active_manifest()
+    if not active:
+        raise HTTPException(400, "No active project. Open or save a project first.")
+    return active
+
+def _submit(kind: str, fn, project_id: str) -> dict:
+    try:
+        job = jobs.submit(kind, fn, project_id=project_id)
+    except jobs.JobConflict as e:
+        raise HTTPException(409, str(e))
+    return job.to_dict()
+
+@router.get("", summary="Vector index settings of the active project")
+def get_index():
+    s = get_index_settings()
+    count = get_vectordb()._collection.count()
+    active = get_active_manifest()
+    # a legacy manifest whose vectors didn't match the configured model: model unknown
+    unknown = bool(active and not active[1].embed_model and count)
+    return {
+        "chroma_dir": s.chroma_dir,
+        "collection": s.collection_name,
+        "embed_model": None if unknown else s.embed_model,
+        "configured_embed_model": OLLAMA_EMBED_MODEL,
+        "needs_migration": unknown or s.embed_model != OLLAMA_EMBED_MODEL,
+        "embed_dim": s.embed_dim,
+        "hnsw": dict(s.hnsw) or None,
+        "count": count,
+    }
+
+class EmbedDimReq(BaseModel):
+    dim: Optional[int] = Field(default=None, ge=32, description="Truncated dimension; null = full model size")
+
+@router.post("/embed-dim", status_code=202, summary="Re-index the active project at a Matryoshka dimension")
+def set_embed_dim(req: EmbedDimReq):
+    project_dir, m = _require_project()
+    if m.embed_dim == req.dim:
+        return {"status": "unchanged", "embed_dim": m.embed_dim}
+    return _submit("embed-dim", lambda job: migrate_embed_dim(project_dir, m, req.dim, job), m.id)
+
+class EmbedModelReq(BaseModel):
+    model: str = Field(default=OLLAMA_EMBED_MODEL, min_length=1)
+    dim: Optional[int] = Field(default=None, ge=32, description="Matryoshka truncation for the new model")
+    batch_size: int = Field(default=EMBED_MIGRATION_BATCH, ge=1, le=512)
+    max_chunks_per_s: float = Field(default=EMBED_MIGRATION_MAX_CHUNKS_PER_S, ge=0,
+                                    description="Throttle on Ollama embed load (0 = unthrottled)")
+
+@router.post("/embed-model", status_code=202, summary="Re-embed the active project with another embedding model")
+def set_embed_model(req: EmbedModelReq):
+    project_dir, m = _require_project()
+    if m.embed_model == req.model and m.embed_dim == req.dim:
+        return {"status": "unchanged", "embed_model": req.model}
+    return _submit(
+        "embed-model",
+        lambda job: migrate_embed_model(
+            project_dir, m, req.model, job,
+            dim=req.dim, batch_size=req.batch_size, max_chunks_per_s=req.max_chunks_per_s,
+        ),
+        m.id,
+    )
+
+class HnswReq(BaseModel):
+    space: Optional[Literal["l2", "cosine", "ip"]] = None
+    M: Optional[int] = Field(default=None, ge=2, le=128)
+    construction_ef: Optional[int] = Field(default=None, ge=8, le=2000)
+    search_ef: Optional[int] = Field(default=None, ge=1, le=2000)
+    reset: bool = Field(default=False, description="Go back to Chroma's defaults")
+
+@router.post("/hnsw", status_code=202, summary="Rebuild the active project's index with new HNSW parameters")
+def set_hnsw(req: HnswReq):
+    project_dir, m = _require_project()
+    given = {k: v for k, v in req.dict(exclude={"reset"}).items() if v is not None}
+    params = None if req.reset else ({**(m.hnsw or {}), **given} or None)
+    if params == m.hnsw:
+        return {"status": "unchanged", "hnsw": m.hnsw}
+    return _submit("hnsw", lambda job: migrate_hnsw(project_dir, m, params, job), m.id)
+
+@router.post("/compact", status_code=202, summary="Rebuild the index and VACUUM SQLite to reclaim space")
+def compact():
+    project_dir, m = _require_project()
+    return _submit("compact", lambda job: compact_project(project_dir, m, job), m.id)
+
+@router.get("/jobs", summary="Recent index jobs")
+def get_jobs():
+    return {"jobs": [j.to_dict() for j in jobs.list_jobs()]}
+
+@router.get("/jobs/{job_id}", summary="Progress of one index job")
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, f"Unknown job {job_id}")
+    return job.to_dict()
@@ -1,20 +1,31 @@
 # server/routes/ingest.py
+import hashlib
 import uuid
-from typing import List
 from pathlib import Path
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from pypdf import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from starlette.concurrency import run_in_threadpool
 
 from ..schemas import IngestResponse
-from ..deps import get_vectordb
+from ..deps import get_vectordb, get_async_llm
+from ..services.projects import get_active_manifest
+from ..services.reindex import INDEX_WRITE_LOCK
+from ..services.sections import start_section_summaries
+from ..services.chunking import extract_pages, chunk_pages
 from ..config import (
     PROJECTS_DIR, DEFAULT_PROJECT,
-    OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL,
+    OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL, SECTION_SUMMARIES,
 )
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
+def _store_chunks(docs) -> None:
+    """Embed + add under the write lock (blocking; run it off the event loop)."""
+    with INDEX_WRITE_LOCK:
+        get_vectordb().add_texts(
+            [d.page_content for d in docs],
+            metadatas=[d.metadata for d in docs],
+        )
+
 @router.post("", response_model=IngestResponse)
 async def ingest(file: UploadFile = File(...)):
     name = file.filename or "uploaded.pdf"
@@ -26,56 +37,51 @@ async def ingest(file: UploadFile = File(...)):
     proj_dir.mkdir(parents=True, exist_ok=True)
     save_path = proj_dir / name
     try:
+        data = await file.read()
         with open(save_path, "wb") as f:
-            f.write(await file.read())
+            f.write(data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
     # 2) Extract text
     try:
-        reader = PdfReader(str(save_path))
+        pages_text = extract_pages(str(save_path))
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"PDF parse error: {e}")
 
-    pages_text: List[str] = []
-    for page in reader.pages:
-        pages_text.append(page.extract_text() or "")
-    full_text = "\n".join(pages_text).strip()
-    total_pages = len(reader.pages)
-    if not full_text:
+    total_pages = len(pages_text)
+    if not "".join(pages_text).strip():
         raise HTTPException(status_code=422, detail="No extractable text in PDF.")
 
-    # 3) Chunk
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1200, chunk_overlap=150, separators=["\n\n", "\n", " ", ""]
-    )
-    # seed metadata with source, title now
-    docs = splitter.create_documents(
-        [full_text],
-        metadatas=[{"source": str(save_path), "title": name}],
+    # 3) Chunk (CHUNK_SIZE / CHUNK_OVERLAP; every chunk knows its page + chunk_index)
+    doc_id = f"doc_{uuid.uuid4().hex[:8]}"
+    docs = chunk_pages(
+        pages_text,
+        # keep title in every chunk so /docs can find it reliably
+        # content_hash keys the persisted summary (services/summary_store.py)
+        metadata={
+            "source": str(save_path), "title": name, "doc_id": doc_id,
+            "content_hash": hashlib.sha256(data).hexdigest(),
+        },
     )
 
-    # 4) Vector store
-    vectordb = get_vectordb()
+    # 4) Vector store (lock so an index rebuild can't switch collections mid-write);
+    #    embedding blocks, and a rebuild may hold the lock, so keep it off the event loop
+    await run_in_threadpool(_store_chunks, docs)
 
-    # 5) Add texts with doc_id + chunk_index
-    doc_id = f"doc_{uuid.uuid4().hex[:8]}"
-    for i, d in enumerate(docs):
-        d.metadata.update({
-            "doc_id": doc_id,
-            "chunk_index": i,
-            # keep title in every chunk so /docs can find it reliably
-            "title": name,
-        })
-
-    vectordb.add_texts(
-        [d.page_content for d in docs],
-        metadatas=[d.metadata for d in docs],
-    )
+    # 5) Optional: chapter summaries in the background (low priority, doesn't block the response)
+    sections_job = None
+    if SECTION_SUMMARIES:
+        active = get_active_manifest()
+        sections_job = start_section_summaries(
+            get_async_llm(), doc_id, str(save_path), total_pages,
+            project_id=active[1].id if active else None,
+        )
 
     return IngestResponse(
         doc_id=doc_id,
         title=name,
         pages=total_pages,
         chunks=len(docs),
+        sections_job_id=sections_job.id if sections_job else None,
     )
@@ -0,0 +1,41 @@
+# server/routes/metrics.py
+from fastapi import APIRouter, Query
+
+from ..services.llm_cache import get_llm_cache
+from ..services.scheduler import get_scheduler
+from ..services.quizgen import quiz_stats
+from ..services.quizpool import quiz_pool
+from ..services.singleflight import flights
+from ..services.telemetry import telemetry
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/llm-cache", summary="LLM response cache size and per-route hit rates")
+def llm_cache_stats():
+    return get_llm_cache().stats()
+
+@router.delete("/llm-cache", summary="Drop every cached LLM response")
+def llm_cache_clear():
+    return {"deleted": get_llm_cache().clear()}
+
+@router.get("/scheduler", summary="LLM scheduler queue depth, in-flight calls and wait times per priority class")
+async def scheduler_stats():
+    # async: the scheduler's queues are owned by the event loop, read them there
+    return get_scheduler().stats()
+
+@router.get("/quiz", summary="Quiz generation parse-failure rate, repairs and wasted tokens")
+async def quiz_generation_stats():
+    return {**quiz_stats.snapshot(), "pool": quiz_pool.stats()}
+
+@router.get("/coalescing", summary="Calls executed vs coalesced onto an identical in-flight request, per operation")
+async def coalescing_stats():
+    return flights.stats()
+
+@router.get("/llm", summary="Per-route Ollama telemetry: tokens/s, prompt cost, load time, reloads + recent calls")
+def llm_telemetry(recent: int = Query(50, ge=0, le=1000)):
+    return telemetry.snapshot(recent=recent)
+
+@router.delete("/llm", summary="Reset LLM telemetry")
+def llm_telemetry_reset():
+    telemetry.reset()
+    return {"ok": True}
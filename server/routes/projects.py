@@ -6,6 +6,7 @@ from ..services.projects import (
     ProjectManifest, PROJECTS_ROOT, read_manifest, write_manifest,
     ensure_structure, set_active_paths, list_projects
 )
+from ..services.reindex import infer_embed_model
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -44,7 +45,21 @@ def save_project(req: SaveReq):
         description=req.description,
         brainrot_enabled=req.brainrot_enabled,
     )
+    # keep the index settings of an existing project (its vectors depend on them)
+    existing = project_dir / f"{req.id}.sirajproj"
+    if existing.exists():
+        try:
+            old = read_manifest(existing)
+            m.created_at = old.created_at
+            m.collection_name = old.collection_name
+            m.embed_dim = old.embed_dim
+            m.hnsw = old.hnsw
+            m.embed_model = old.embed_model
+        except Exception:
+            pass
     ensure_structure(project_dir, m)
+    # pin the embedding model so a later OLLAMA_EMBED_MODEL change can't break queries
+    m.embed_model = m.embed_model or infer_embed_model(project_dir, m)
     mp = write_manifest(project_dir, m)
     set_active_paths(project_dir, m)
     return {"ok": True, "manifest_path": str(mp.resolve()), "project": m}
@@ -57,5 +72,10 @@ def open_project(body: OpenReq):
     m = read_manifest(p)
     project_dir = p.parent
     ensure_structure(project_dir, m)
+    if not m.embed_model:
+        # legacy manifest: pin only what the stored vectors can confirm
+        m.embed_model = infer_embed_model(project_dir, m)
+        if m.embed_model:
+            write_manifest(project_dir, m)
     set_active_paths(project_dir, m)
     return {"ok": True, "project": m}
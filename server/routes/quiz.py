@@ -1,9 +1,8 @@
 from __future__ import annotations
 
 from datetime import datetime
-from pathlib import Path
+import asyncio
 import json
-import sqlite3
 from typing import List, Optional, Dict, Any
 
 from fastapi import APIRouter, HTTPException
@@ -11,61 +10,13 @@ from pydantic import BaseModel, Field
 
 
 from ..services.quizgen import generate_quiz_from_doc
+from ..services.quizpool import quiz_pool
+from ..services.question_bank import assemble_quiz, bank_quiz, mark_served
+from ..services.singleflight import flights
 from ..services import attempts as attempt_store
+from ..services import quiz_store
 import uuid
 
-# ---- SQLite helpers ---------------------------------------------------------
-
-def _db_path() -> Path:
-    # Prefer config if you have it; otherwise default to server/store/sqlite.db
-    try:
-        from ..config import SQLITE_DB  # type: ignore
-        if SQLITE_DB:
-            return Path(SQLITE_DB)
-    except Exception:
-        pass
-    return Path(__file__).resolve().parents[1] / "store" / "sqlite.db"
-
-
-def _connect():
-    dbp = _db_path()
-    dbp.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(dbp)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def _ensure_tables():
-    with _connect() as con:
-        cur = con.cursor()
-        # quizzes table keeps the generated spec so we can grade later
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS quizzes (
-                id TEXT PRIMARY KEY,
-                doc_id TEXT NOT NULL,
-                spec_json TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            );
-            """
-        )
-        # attempts table stores performance + full feedback
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS quiz_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                quiz_id TEXT NOT NULL,
-                doc_id TEXT NOT NULL,
-                score REAL NOT NULL,
-                answers_json TEXT NOT NULL,
-                feedback_json TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            );
-            """
-        )
-        con.commit()
-
-
 # ---- Schemas (aligned to your frontend types) -------------------------------
 
 class QuizOption(BaseModel):
@@ -126,30 +77,48 @@ class GradeResponse(BaseModel):
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 
 
+async def _generate_and_store(doc_id: str, n_questions: int):
+    # 1) a pre-generated quiz (fresh questions, banked at refill) when one is ready
+    spec = quiz_pool.take(doc_id, n_questions)
+    if spec is not None:
+        await asyncio.to_thread(mark_served, doc_id, [q.stem for q in spec.questions])
+        quiz_pool.note_use(doc_id, n_questions)
+    else:
+        # 2) sampled from the question bank once it is big enough (no LLM call);
+        #    background generation keeps adding new questions to it meanwhile
+        spec = await asyncio.to_thread(assemble_quiz, doc_id, n_questions)
+        if spec is not None:
+            quiz_pool.grow_bank(doc_id, n_questions)
+        else:
+            quiz_pool.note_use(doc_id, n_questions)
+    if spec is None:
+        # 3) live generation; near-duplicates of banked questions are swapped out
+        try:
+            spec = await generate_quiz_from_doc(doc_id, n_questions=n_questions)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Generate failed: {e}")
+        spec = await bank_quiz(spec, served=True)
+
+    # Persist spec JSON so the grader can retrieve it deterministically
+    await asyncio.to_thread(
+        quiz_store.save_quiz, spec.quiz_id, spec.doc_id, json.dumps(spec.dict(), ensure_ascii=False)
+    )
+    return spec
+
+
 @router.post("/generate", response_model=GenerateQuizResponse)
-def generate(req: GenerateQuizRequest):
+async def generate(req: GenerateQuizRequest):
     """
     Generates a quiz *and* persists the quiz spec into SQLite (quizzes table).
     """
-    _ensure_tables()
-
-    try:
-        spec = generate_quiz_from_doc(req.doc_id, n_questions=req.n_questions)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Generate failed: {e}")
+    await asyncio.to_thread(quiz_store.ensure_tables)
 
-    # Persist spec JSON so the grader can retrieve it deterministically
-    with _connect() as con:
-        con.execute(
-            "INSERT OR REPLACE INTO quizzes (id, doc_id, spec_json, created_at) VALUES (?, ?, ?, ?)",
-            (
-                spec.quiz_id,
-                spec.doc_id,
-                json.dumps(spec.dict(), ensure_ascii=False),
-                datetime.utcnow().isoformat(),
-            ),
-        )
-        con.commit()
+    # identical concurrent requests (double click, second tab) share one quiz
+    spec = await flights.do(
+        "quiz",
+        {"doc_id": req.doc_id, "n_questions": req.n_questions},
+        lambda: _generate_and_store(req.doc_id, req.n_questions),
+    )
 
     # Map to frontend shape (multi: true for checkbox)
     out_questions = [
@@ -171,10 +140,10 @@ def grade(req: GradeRequest):
     Grades a submission against the stored quiz spec.
     Stores the attempt & feedback in SQLite (quiz_attempts table).
     """
-    _ensure_tables()
+    quiz_store.ensure_tables()
 
     # 1) Fetch quiz spec
-    with _connect() as con:
+    with quiz_store.connect() as con:
         row = con.execute("SELECT spec_json FROM quizzes WHERE id = ?", (req.quiz_id,)).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Quiz not found.")
@@ -264,7 +233,7 @@ def grade(req: GradeRequest):
         "per_question": [r.dict() for r in per_q_results],
     }
 
-    with _connect() as con:
+    with quiz_store.connect() as con:
         con.execute(
             """
             INSERT INTO quiz_attempts (quiz_id, doc_id, score, answers_json, feedback_json, created_at)
@@ -295,8 +264,8 @@ class AttemptDTO(BaseModel):
 
 @router.get("/attempts", response_model=List[AttemptDTO])
 def list_attempts(doc_id: Optional[str] = None, limit: int = 25):
-    _ensure_tables()
-    with _connect() as con:
+    quiz_store.ensure_tables()
+    with quiz_store.connect() as con:
         if doc_id:
             rows = con.execute(
                 """
@@ -3,7 +3,9 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
-from server.services.llm import OllamaGenerateClient
+from starlette.concurrency import run_in_threadpool
+from server.services.llm import AsyncOllamaGenerateClient
+from server.deps import get_async_llm
 from server.services import attempts as attempt_store
 from ddgs import DDGS  # pip install ddgs
 
@@ -47,7 +49,7 @@ def _pdf_embed(url: str) -> Optional[str]:
     return url if url.lower().endswith(".pdf") else None
 
 # server/routes/suggest.py
-def _mine_gaps_from_attempts(limit:int=10) -> list[str]:
+async def _mine_gaps_from_attempts(limit:int=10) -> list[str]:
     atts = attempt_store.get_attempts(limit=limit)
     topics, wrong_texts = [], []
     for a in atts:
@@ -73,25 +75,24 @@ def _mine_gaps_from_attempts(limit:int=10) -> list[str]:
             seen.add(tl); out.append(t)
         return out[:8]
     if wrong_texts:
-        llm = OllamaGenerateClient(model="llama3.1")
-        return _condense_topics_with_llm(llm, wrong_texts)
+        return await _condense_topics_with_llm(get_async_llm(), wrong_texts)
     return []
 
 
-def _condense_topics_with_llm(llm: OllamaGenerateClient, texts: list[str]) -> list[str]:
+async def _condense_topics_with_llm(llm: AsyncOllamaGenerateClient, texts: list[str]) -> list[str]:
     joined = "\n".join(f"- {t}" for t in texts) or "None."
     prompt = f"""You are a strict topic normalizer for study gaps.
 Input list (possibly noisy/duplicated):
 {joined}
 
 Return 5-8 normalized, distinct core topics (one per line), no numbering, concise."""
-    out = llm.generate(prompt, temperature=0.2, num_predict=256)
+    out = await llm.generate(prompt, temperature=0.2, num_predict=256, route="suggest")
     topics = [line.strip("- ").strip() for line in out.splitlines() if line.strip()]
     # keep short phrases only
     topics = [t for t in topics if 2 <= len(t) <= 80][:8]
     return topics or texts[:6]
 
-def _make_tasks_with_llm(llm: OllamaGenerateClient, topics: list[str], time_per_day: int, horizon_weeks: int) -> list[Task]:
+async def _make_tasks_with_llm(llm: AsyncOllamaGenerateClient, topics: list[str], time_per_day: int, horizon_weeks: int) -> list[Task]:
     # Ask LLM for atomic to-dos (not weekly plan—just a backlog)
     prompt = f"""Create a focused backlog of 8–14 atomic study tasks from these weak topics:
 {chr(10).join(f"- {t}" for t in topics)}
@@ -103,7 +104,7 @@ Constraints:
 Return as lines: task — reason — effort_min.
 Example: "Solve 5 kinematics graph questions — solidify slope/area intuition — 25"
 """
-    out = llm.generate(prompt, temperature=0.2, num_predict=512)
+    out = await llm.generate(prompt, temperature=0.2, num_predict=512, route="suggest")
     tasks: list[Task] = []
     for line in out.splitlines():
         line = line.strip(" -\t")
@@ -163,22 +164,22 @@ def _search_resources(topics: list[str], max_per_kind: int = 2) -> list[Resource
 
 # ---------- Route ----------
 @router.post("/suggest", response_model=SuggestResp)
-def suggest(req: SuggestReq):
+async def suggest(req: SuggestReq):
     # 1) Gather/normalize gaps
-    llm = OllamaGenerateClient(model="llama3.1")
+    llm = get_async_llm()
     topics = req.gaps[:]
     if not topics:
-        mined = _mine_gaps_from_attempts(limit=20)
+        mined = await _mine_gaps_from_attempts(limit=20)
         if mined:
-            topics = _condense_topics_with_llm(llm, mined)
+            topics = await _condense_topics_with_llm(llm, mined)
     if not topics:
         raise HTTPException(status_code=400, detail="No gaps provided and none inferred from attempts.")
 
     # 2) Make atomic to-dos
-    tasks = _make_tasks_with_llm(llm, topics, req.time_per_day, req.horizon_weeks)
+    tasks = await _make_tasks_with_llm(llm, topics, req.time_per_day, req.horizon_weeks)
 
-    # 3) Find resources
-    resources = _search_resources(topics)
+    # 3) Find resources (DDGS is blocking: keep it off the event loop)
+    resources = await run_in_threadpool(_search_resources, topics)
 
     # 4) Fill cheap pricing hints
     for r in resources:
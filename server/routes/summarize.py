@@ -1,72 +1,235 @@
 # server/routes/summarize.py
-from fastapi import APIRouter, HTTPException
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from ..deps import get_vectordb, get_embedding_fn
-from server.services.llm import OllamaGenerateClient
-import time
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+from contextlib import aclosing
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ..deps import get_vectordb, get_async_llm
+from ..services.summarizer import PROMPT_VERSION, is_complete, summarize_document, summarize_events
+from ..services.sections import page_label, tile_range
+from ..services.extractive import extractive_summary
+from ..services.scheduler import get_scheduler
+from ..services.singleflight import flights
+from ..services.summary_store import (
+    doc_content_hash, get_summary, put_summary, get_section_summaries, put_section_summary,
+)
+from ..utils.sse import sse_event
 
 router = APIRouter()
 
-# Use the model you actually pulled. You pulled "llama3.1", so use that.
-ollama = OllamaGenerateClient(model="llama3.1", host="http://127.0.0.1:11434")
+def _lookup(body: dict) -> Tuple[str, Optional[str], str, Optional[Dict[str, Any]]]:
+    """(doc_id, content_hash, model, stored summary unless refresh=true)"""
+    doc_id = body.get("doc_id")
+    if not doc_id:
+        raise HTTPException(400, "doc_id required")
+    model = get_async_llm().model
+    content_hash = doc_content_hash(get_vectordb()._collection, doc_id)
+    stored = None
+    if content_hash and not body.get("refresh"):
+        stored = get_summary(doc_id, content_hash, model, PROMPT_VERSION)
+    return doc_id, content_hash, model, ({**stored, "cached": True} if stored else None)
+
+def _result(final: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "summary_sections": [{"title": "Summary", "bullets": final["bullets"]}],
+        "mode": "abstractive",
+        "coverage": final["coverage"],
+        "stats": final["stats"],
+    }
+
+def _store(doc_id: str, content_hash: Optional[str], model: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    # a run cut short by the deadline or a failed call is returned but not kept, so the next request can do better
+    if not content_hash or not is_complete(result):
+        return {**result, "cached": False}
+    generated_at = put_summary(doc_id, content_hash, model, PROMPT_VERSION, result)
+    return {**result, "generated_at": generated_at, "cached": False}
+
+def _page_range(body: dict) -> Optional[Tuple[int, int]]:
+    start, end = body.get("start_page"), body.get("end_page")
+    if start is None and end is None:
+        return None
+    try:
+        start = int(start if start is not None else 1)
+        end = int(end if end is not None else start)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "start_page/end_page must be integers")
+    if start < 1 or end < start:
+        raise HTTPException(400, "need 1 <= start_page <= end_page")
+    return start, end
 
-MAP_PROMPT = """You are a teaching assistant. Read the excerpt and produce 2-3 tight bullets capturing the *essential* facts. No fluff, no repetition.
-Excerpt:
----
-{chunk}
----
-Bullets:"""
+def _section_result(sections: list) -> Dict[str, Any]:
+    return {
+        "summary_sections": [
+            {"title": s["title"], "start_page": s["start_page"], "end_page": s["end_page"], "bullets": s["bullets"]}
+            for s in sections
+        ],
+        "generated_at": max(s["generated_at"] for s in sections),
+        "cached": True,
+    }
+
+MODES = ("auto", "abstractive", "extractive")
 
-REDUCE_PROMPT = """Combine the following mini-bullets into a single concise summary with 3-5 bullets total. Merge duplicates, keep it high-level and factual.
-Mini-bullets:
----
-{points}
----
-Final 3-5 bullets:"""
+def _mode(body: dict) -> str:
+    mode = body.get("mode") or "auto"
+    if mode not in MODES:
+        raise HTTPException(400, f"mode must be one of {', '.join(MODES)}")
+    return mode
+
+def _degraded(mode: str) -> bool:
+    """auto mode falls back to the extractive path while the LLM queue is saturated."""
+    return mode == "auto" and get_scheduler().saturated()
+
+async def _extractive(body: dict, pages: Optional[Tuple[int, int]], reason: str) -> Dict[str, Any]:
+    doc_id = body.get("doc_id")
+    if not doc_id:
+        raise HTTPException(400, "doc_id required")
+    res = await asyncio.to_thread(extractive_summary, get_vectordb()._collection, doc_id, pages)
+    if not res["bullets"]:
+        raise HTTPException(404, f"No content for doc_id={doc_id}")
+    title = "Key points" if not pages else f"Key points, {page_label(*pages).lower()}"
+    print(f"[/summarize] doc={doc_id} extractive ({reason}) {res['stats']}")
+    return {
+        "summary_sections": [{"title": title, "bullets": res["bullets"], "pages": res["pages"]}],
+        "mode": "extractive",
+        "reason": reason,
+        "stats": res["stats"],
+        "cached": False,
+    }
 
 @router.post("/summarize")
-def summarize(body: dict):
+async def summarize(body: dict):
+    """
+    {"doc_id", "refresh"?: bool, "start_page"?: int, "end_page"?: int,
+     "mode"?: "auto" | "abstractive" | "extractive"}
+    A page range is answered from the precomputed chapter summaries when they
+    cover it exactly, otherwise summarized live and stored for next time.
+    mode=extractive needs no LLM call; auto (default) also takes that path,
+    unless a stored summary exists, while the LLM scheduler is saturated.
+    """
+    mode = _mode(body)
+    pages = _page_range(body)
+    if mode == "extractive":
+        return await _extractive(body, pages, "requested")
+    if pages:
+        return await _summarize_pages(body, pages, mode)
+    doc_id, content_hash, model, stored = await asyncio.to_thread(_lookup, body)
+    if stored:
+        return stored
+    if _degraded(mode):
+        return await _extractive(body, None, "llm saturated")
+    # identical concurrent requests (double click, second tab) share one run
+    return await flights.do("summarize", {"doc_id": doc_id}, lambda: _summarize_and_store(doc_id, content_hash, model))
+
+async def _summarize_and_store(doc_id: str, content_hash: Optional[str], model: str) -> dict:
+    final = await summarize_document(get_async_llm(), get_vectordb()._collection, doc_id)
+    return await asyncio.to_thread(_store, doc_id, content_hash, model, _result(final))
+
+def _lookup_pages(body: dict, pages: Tuple[int, int]) -> Tuple[str, Optional[str], str, Optional[Dict[str, Any]]]:
+    """_lookup() for a page range: stored section summaries that tile it exactly."""
     doc_id = body.get("doc_id")
     if not doc_id:
         raise HTTPException(400, "doc_id required")
+    model = get_async_llm().model
+    content_hash = doc_content_hash(get_vectordb()._collection, doc_id)
+    if content_hash and not body.get("refresh"):
+        tiles = tile_range(get_section_summaries(doc_id, content_hash, model, PROMPT_VERSION), *pages)
+        if tiles:
+            return doc_id, content_hash, model, _section_result(tiles)
+    return doc_id, content_hash, model, None
 
-    t0 = time.time()
-
-    seed = "high level summary of this document"
-    top_k = 18
-    chunks = get_vectordb().similarity_search(seed, k=top_k, filter={"doc_id": doc_id})
-
-    if not chunks:
-        return {"summary_sections": [{"title": "Summary", "bullets": ["No content found."]}]}
-
-    bullets = []
-    with ThreadPoolExecutor(max_workers=6) as ex:
-        futures = [
-            ex.submit(
-                ollama.generate,
-                MAP_PROMPT.format(chunk=c.page_content[:1200]),
-                0.2,
-                220,
-            )
-            for c in chunks
-        ]
-        for f in as_completed(futures):
-            try:
-                bullets.append(f.result())
-            except Exception:
-                pass
-
-    if time.time() - t0 > 25 and bullets:
-        bullets = bullets[:12]
-
-    reduce_text = "\n".join(bullets) if bullets else "No points."
-    final = ollama.generate(REDUCE_PROMPT.format(points=reduce_text), 0.2, 260)
+def _page_result(doc_id: str, content_hash: Optional[str], model: str, pages: Tuple[int, int],
+                 final: Dict[str, Any]) -> Dict[str, Any]:
+    if not final.get("coverage"):
+        raise HTTPException(404, f"No text on pages {pages[0]}-{pages[1]} of {doc_id}")
+    title = page_label(*pages)
+    result = {"bullets": final["bullets"], "stats": final["stats"]}
+    if not content_hash or not is_complete(final):
+        return {"summary_sections": [{"title": title, "start_page": pages[0], "end_page": pages[1], **result}],
+                "coverage": final["coverage"], "cached": False}
+    put_section_summary(doc_id, content_hash, model, PROMPT_VERSION, title, *pages, result)
+    out = _section_result([s for s in get_section_summaries(doc_id, content_hash, model, PROMPT_VERSION)
+                           if (s["start_page"], s["end_page"]) == pages])
+    return {**out, "coverage": final["coverage"], "cached": False}
 
-    return {
-        "summary_sections": [
-            {
-                "title": "Summary",
-                "bullets": [b.strip("-• ").strip() for b in final.split("\n") if b.strip()][:5],
-            }
-        ]
-    }
+async def _summarize_pages(body: dict, pages: Tuple[int, int], mode: str = "auto") -> Dict[str, Any]:
+    doc_id, content_hash, model, stored = await asyncio.to_thread(_lookup_pages, body, pages)
+    if stored:
+        return stored
+    if _degraded(mode):
+        return await _extractive(body, pages, "llm saturated")
+
+    async def run():
+        final = await summarize_document(get_async_llm(), get_vectordb()._collection, doc_id, pages=pages)
+        return await asyncio.to_thread(_page_result, doc_id, content_hash, model, pages, final)
+
+    return await flights.do("summarize", {"doc_id": doc_id, "pages": list(pages)}, run)
+
+@router.get("/summarize/sections")
+def list_sections(doc_id: str):
+    """Chapter / page-range summaries stored for a document (precomputed or requested)."""
+    content_hash = doc_content_hash(get_vectordb()._collection, doc_id)
+    if not content_hash:
+        raise HTTPException(404, f"Unknown doc_id={doc_id}")
+    sections = get_section_summaries(doc_id, content_hash, get_async_llm().model, PROMPT_VERSION)
+    return {"doc_id": doc_id, "sections": sections}
+
+@router.post("/summarize/stream")
+async def summarize_stream(body: dict, request: Request):
+    """
+    Server-Sent Events version of /summarize (same body: refresh, start_page /
+    end_page, mode):
+      event: start   -> {chunks_total, chunks_used, map_calls}
+      event: bullets -> {index, bullets, done, total}   (as each map call finishes)
+      event: level   -> {level, kind, calls, done, failed, cancelled, ...}
+      event: done    -> the /summarize response         (stored / extractive: only this)
+      event: error   -> {detail}
+    A client that disconnects cancels the map/reduce calls still running.
+    """
+    mode = _mode(body)
+    pages = _page_range(body)
+    if not body.get("doc_id"):
+        raise HTTPException(400, "doc_id required")
+    llm, col = get_async_llm(), get_vectordb()._collection
+
+    async def events():
+        try:
+            if mode == "extractive":
+                yield sse_event("done", await _extractive(body, pages, "requested"))
+                return
+            if pages:
+                doc_id, content_hash, model, stored = await asyncio.to_thread(_lookup_pages, body, pages)
+            else:
+                doc_id, content_hash, model, stored = await asyncio.to_thread(_lookup, body)
+            if stored:
+                yield sse_event("done", stored)
+                return
+            if _degraded(mode):
+                yield sse_event("done", await _extractive(body, pages, "llm saturated"))
+                return
+            # aclosing: leaving early (disconnect, error) cancels the summarizer's calls
+            async with aclosing(summarize_events(llm, col, doc_id, pages=pages)) as run:
+                async for ev in run:
+                    kind = ev.pop("event")
+                    if kind == "final":
+                        print(f"[/summarize/stream] doc={doc_id} calls={ev['stats'].get('llm_calls')} "
+                              f"seconds={ev['stats'].get('seconds')} coverage={ev['coverage']}")
+                        if pages:
+                            yield sse_event("done", await asyncio.to_thread(_page_result, doc_id, content_hash, model, pages, ev))
+                        else:
+                            yield sse_event("done", await asyncio.to_thread(_store, doc_id, content_hash, model, _result(ev)))
+                    else:
+                        yield sse_event("bullets" if kind == "map" else kind, ev)
+                    if await request.is_disconnected():
+                        print(f"[/summarize/stream] doc={doc_id} client disconnected, cancelling")
+                        return
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            print(f"[/summarize/stream] doc={body.get('doc_id')} failed: {e}")
+            yield sse_event("error", {"detail": f"summarize failed: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class IngestResponse(BaseModel):
@@ -6,6 +6,7 @@ class IngestResponse(BaseModel):
     title: str
     pages: int
     chunks: int
+    sections_job_id: Optional[str] = None  # background section summaries (GET /index/jobs/{id})
 
 class SummarizeRequest(BaseModel):
     doc_id: str = Field(..., description="Document ID returned by /ingest")
@@ -39,6 +39,15 @@ def save_quiz_attempt(attempt_id: str, quiz_id: str, doc_id: str, score: float,
     finally:
         con.close()
 
+def delete_attempts_for_doc(doc_id: str) -> int:
+    con = _conn()
+    try:
+        n = con.execute("DELETE FROM quiz_attempts WHERE doc_id = ?", (doc_id,)).rowcount
+        con.commit()
+        return n
+    finally:
+        con.close()
+
 def get_attempts(limit: int = 20) -> list[Dict[str, Any]]:
     con = _conn()
     try:
@@ -88,10 +88,34 @@ def load_manifest(job_id: str) -> BrainrotManifest:
     return BrainrotManifest(**data)
 
 
+def delete_media_for_doc(doc_id: str) -> int:
+    """
+    Remove every brainrot job of a document: its audio, captions, video,
+    thumbnail and manifest. Returns the number of files deleted.
+    """
+    _ensure_dirs()
+    removed = 0
+    for name in os.listdir(DIRS["manifests"]):
+        if not name.endswith(".json"):
+            continue
+        try:
+            m = load_manifest(name[:-5])
+        except Exception:
+            continue
+        if m.doc_id != doc_id:
+            continue
+        paths = [m.audio_path, m.vtt_path, m.srt_path, m.video_path, m.thumbnail_path, manifest_path(m.job_id)]
+        for p in paths:
+            if p and os.path.isfile(p):
+                os.remove(p)
+                removed += 1
+    return removed
+
+
 # -------- SUMMARY (script) -------
 
-def build_script_with_llm(doc_id: str, style: str, duration_sec: int):
-    return _brainrot_summary(doc_id=doc_id, style=style, duration_sec=duration_sec)
+async def build_script_with_llm(doc_id: str, style: str, duration_sec: int):
+    return await _brainrot_summary(doc_id=doc_id, style=style, duration_sec=duration_sec)
 
 
 # -------- TTS (pyttsx3 - offline) --------
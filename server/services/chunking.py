@@ -0,0 +1,69 @@
+# server/services/chunking.py
+"""
+PDF text extraction + chunking shared by /ingest and the retrieval benchmark,
+so what we measure is exactly what we serve.
+"""
+from __future__ import annotations
+from bisect import bisect_right
+from typing import Any, Dict, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from ..config import CHUNK_SIZE, CHUNK_OVERLAP
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+def extract_pages(path: str) -> List[str]:
+    """Text of every page (empty string for image-only pages)."""
+    reader = PdfReader(str(path))
+    return [page.extract_text() or "" for page in reader.pages]
+
+def extract_outline(path: str) -> List[Tuple[str, int]]:
+    """Top-level bookmarks as (title, 1-based page), in page order; [] if none."""
+    reader = PdfReader(str(path))
+    out: List[Tuple[str, int]] = []
+    try:
+        items = reader.outline
+    except Exception:
+        return []
+    for item in items:
+        if isinstance(item, list):  # children of the previous entry
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page is not None and page >= 0:
+            out.append(((getattr(item, "title", None) or "").strip(), page + 1))
+    return sorted(out, key=lambda t: t[1])
+
+def chunk_pages(
+    pages_text: List[str],
+    metadata: Dict[str, Any] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> List[Document]:
+    """
+    Split the joined page texts into overlapping chunks. Every chunk gets the
+    1-based `page` its first character came from, plus a `chunk_index`.
+    """
+    starts, pos = [], 0
+    for t in pages_text:
+        starts.append(pos)
+        pos += len(t) + 1  # "\n" joiner
+    full_text = "\n".join(pages_text)
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+        add_start_index=True,
+    )
+    docs = splitter.create_documents([full_text], metadatas=[dict(metadata or {})])
+    for i, d in enumerate(docs):
+        start = d.metadata.pop("start_index", 0)
+        d.metadata["page"] = max(1, bisect_right(starts, max(start, 0)))
+        d.metadata["chunk_index"] = i
+    return docs
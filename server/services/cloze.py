@@ -0,0 +1,177 @@
+# server/services/cloze.py
+"""
+Offline cloze quizzes: the no-LLM degraded mode of quiz generation.
+
+Key terms (unigrams and bigrams) are ranked by TF-IDF with the document's
+chunks as the corpus. Each question blanks a key term out of a sentence
+that uses it; the three distractors are the key terms whose distribution
+over the chunks is most similar to the answer's (same topic, different
+term), so they are plausible rather than random. A full quiz takes a few
+milliseconds.
+"""
+from __future__ import annotations
+import math
+import random
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAX_CHUNKS = 200      # larger documents are sampled evenly
+VOCAB = 300           # candidate key terms kept after ranking
+OPTION_IDS = ("A", "B", "C", "D")
+
+_SENT = re.compile(r"(?<=[.!?])\s+")
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z\-]+")
+# markup, code and links make poor stems: HTML/markdown syntax, URLs, code punctuation
+_MARKUP = re.compile(r"[<>{}\[\]|`#*=_\\]|https?://|www\.|\w\(|;\s*$|::|->")
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each either few for from further had has
+have having he her here hers herself him himself his how however i if in into is it its itself just
+may me might more most must my myself no nor not now of off on once only or other our ours ourselves
+out over own same shall she should so some such than that the their theirs them themselves then there
+these they this those through thus to too under until up upon very was we were what when where which
+while who whom why will with within without would you your yours yourself yourselves one two three
+first second new use used using uses many much well also often example figure table chapter section
+page pages et al ie eg etc
+""".split())
+
+def _terms(text: str) -> List[str]:
+    words = [w.lower().strip("-") for w in _TOKEN.findall(text)]
+    out = [w for w in words if len(w) >= 4 and w not in STOPWORDS]
+    out += [
+        f"{a} {b}" for a, b in zip(words, words[1:])
+        if len(a) >= 3 and len(b) >= 3 and a not in STOPWORDS and b not in STOPWORDS
+    ]
+    return out
+
+def load_chunks(col, doc_id: str) -> List[Tuple[int, str]]:
+    """(page, text) of every chunk of a document, in document order."""
+    res = col.get(where={"doc_id": doc_id}, include=["documents", "metadatas"])
+    rows = sorted(
+        ((m or {}).get("page", 0), (m or {}).get("chunk_index", 0), t)
+        for m, t in zip(res.get("metadatas") or [], res.get("documents") or [])
+        if t and t.strip()
+    )
+    if len(rows) > MAX_CHUNKS:
+        rows = [rows[round(i * (len(rows) - 1) / (MAX_CHUNKS - 1))] for i in range(MAX_CHUNKS)]
+    return [(p, t) for p, _, t in rows]
+
+def key_terms(texts: List[str], vocab: int = VOCAB) -> Tuple[List[str], np.ndarray]:
+    """Top terms by TF-IDF and their L2-normalized (terms x chunks) TF-IDF rows."""
+    counts = [Counter(_terms(t)) for t in texts]
+    df = Counter(term for c in counts for term in c)
+    n = len(texts)
+    # a term must repeat somewhere to be "key"; bigrams must occur twice overall
+    total = Counter()
+    for c in counts:
+        total.update(c)
+    idf = {t: math.log((1 + n) / (1 + d)) + 1.0 for t, d in df.items()}
+    cand = [t for t, f in total.items() if f >= 2 and (n == 1 or df[t] < n)]
+    # cheap pre-ranking (corpus count x idf) so the matrix stays small on big documents
+    cand = sorted(cand, key=lambda t: -total[t] * idf[t])[:vocab * 4]
+    if not cand:
+        return [], np.zeros((0, n), dtype=np.float32)
+    idx = {t: i for i, t in enumerate(cand)}
+    mat = np.zeros((len(cand), n), dtype=np.float32)
+    for j, c in enumerate(counts):
+        size = sum(c.values()) or 1
+        for t, f in c.items():
+            i = idx.get(t)
+            if i is not None:
+                mat[i, j] = (f / size) * idf[t]
+    score = mat.max(axis=1)
+    top = np.argsort(-score)[:vocab]
+    terms = [cand[i] for i in top]
+    rows = mat[top]
+    rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+    return terms, rows
+
+def _prose(sentence: str) -> bool:
+    """Plain prose: mostly words, no markup or code."""
+    if _MARKUP.search(sentence):
+        return False
+    words = sentence.split()
+    return sum(1 for w in words if w.strip(".,;:!?()\"'").isalpha()) >= 0.7 * len(words)
+
+def _blank(term: str, sentence: str) -> str:
+    # every occurrence, so a sentence that repeats the term doesn't give it away
+    return re.sub(rf"\b{re.escape(term)}\b", "_____", sentence, flags=re.IGNORECASE)
+
+def _leaks(term: str, stem: str) -> bool:
+    """Another form of the answer (plural, shared stem) is still visible."""
+    parts = [p for p in term.split() if len(p) >= 4]
+    return any(_related(p, w.lower()) for w in _TOKEN.findall(stem) if len(w) >= 4 for p in parts)
+
+def _candidate_sentences(text: str) -> List[str]:
+    return [s for s in _SENT.split(" ".join(text.split())) if 8 <= len(s.split()) <= 45 and _prose(s)]
+
+def _sentence_with(term: str, pages: List[int], sents: List[List[str]], order) -> Optional[Tuple[int, str, str]]:
+    """(page, sentence, stem) of the first usable sentence containing the term, best chunks first."""
+    pat = re.compile(rf"\b{re.escape(term)}\b", re.IGNORECASE)
+    for j in order:
+        for s in sents[j]:
+            if pat.search(s):
+                stem = _blank(term, s)
+                if not _leaks(term, stem):
+                    return pages[j], s, stem
+    return None
+
+def _related(a: str, b: str) -> bool:
+    """Same term in another form (plural, part of a bigram, shared stem)."""
+    return a in b or b in a or a[:5] == b[:5]
+
+def cloze_questions(chunks: List[Tuple[int, str]], n_questions: int, seed: Optional[int] = None) -> List[Dict]:
+    """
+    Up to n questions as {stem, options: [{id, text}], correct_option_ids,
+    rationale} (fewer when the document has too few key terms).
+    """
+    if not chunks:
+        return []
+    rng = random.Random(seed)
+    terms, rows = key_terms([t for _, t in chunks])
+    if len(terms) < 4:
+        return []
+    sims = rows @ rows.T
+    pages = [p for p, _ in chunks]
+    sents = [_candidate_sentences(t) for _, t in chunks]  # split once, not once per term
+
+    questions: List[Dict] = []
+    used_terms: List[str] = []
+    used_sents = set()
+    for i, term in enumerate(terms):
+        if len(questions) >= n_questions:
+            break
+        if any(_related(term, u) for u in used_terms):
+            continue
+        order = [j for j in np.argsort(-rows[i]) if rows[i, j] > 0]  # chunks using the term
+        found = _sentence_with(term, pages, sents, order)
+        if not found or found[1] in used_sents:
+            continue
+        page, sentence, stem = found
+        distractors: List[str] = []
+        for k in np.argsort(-sims[i]):
+            cand = terms[k]
+            if k == i or _related(term, cand) or any(_related(cand, d) for d in distractors):
+                continue
+            if re.search(rf"\b{re.escape(cand)}\b", sentence, re.IGNORECASE):
+                continue  # visible in the stem
+            distractors.append(cand)
+            if len(distractors) == 3:
+                break
+        if len(distractors) < 3:
+            continue
+        options = [term] + distractors
+        rng.shuffle(options)
+        questions.append({
+            "stem": f"Fill in the blank: {stem}",
+            "options": [{"id": OPTION_IDS[j], "text": o} for j, o in enumerate(options)],
+            "correct_option_ids": [OPTION_IDS[options.index(term)]],
+            "rationale": f"p.{page}: “{sentence}”",
+        })
+        used_terms.append(term)
+        used_sents.add(sentence)
+    return questions
@@ -1,31 +1,100 @@
-from typing import List
+import time
+from typing import List, Optional
+import httpx
+import numpy as np
 import requests
 from fastapi import HTTPException
 
+from .warmup import note_use
+from .telemetry import telemetry
+
+
+def truncate_embeddings(vectors, dim: Optional[int]) -> List[List[float]]:
+    """
+    Matryoshka-style truncation: keep the first `dim` components and
+    re-normalize to unit length. `dim=None` (or >= native size) only normalizes.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr[None, :]
+    if dim is not None and dim < arr.shape[1]:
+        arr = arr[:, :dim]
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).tolist()
+
+
 class OllamaEmbedViaEmbedRoute:
     """
     Minimal embeddings client compatible with LangChain's Embeddings interface.
     Uses Ollama /api/embed directly.
+
+    If `dim` is set, vectors are truncated to that many dimensions and
+    re-normalized (nomic-embed-text is trained Matryoshka-style, so prefixes
+    stay meaningful).
+
+    The a* methods are asyncio-native and go through `ahttp` (a shared
+    httpx.AsyncClient, see server.deps.get_async_http_client()).
     """
-    def __init__(self, model: str, base_url: str):
+    def __init__(
+        self,
+        model: str,
+        base_url: str,
+        dim: Optional[int] = None,
+        ahttp: Optional[httpx.AsyncClient] = None,
+        keep_alive: Optional[str] = None,
+    ):
         self.model = model
         self.base_url = base_url.rstrip("/")
+        self.dim = dim
+        self.ahttp = ahttp
+        self.keep_alive = keep_alive
+
+    def _body(self, inputs: List[str]) -> dict:
+        body = {"model": self.model, "input": inputs}
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        return body
+
+    def _finish(self, data: dict, t0: float) -> List[List[float]]:
+        embeddings = data.get("embeddings", [])
+        if not embeddings or not isinstance(embeddings, list):
+            raise RuntimeError("No embeddings returned from /api/embed")
+        note_use(self.model, "embed")
+        telemetry.record("embed", self.model, None, data, wall_ms=(time.perf_counter() - t0) * 1000.0)
+        if self.dim is not None:
+            embeddings = truncate_embeddings(embeddings, self.dim)
+        return embeddings
 
     def _post_embed(self, inputs: List[str]) -> List[List[float]]:
+        t0 = time.perf_counter()
         try:
             r = requests.post(
                 f"{self.base_url}/api/embed",
-                json={"model": self.model, "input": inputs},
+                json=self._body(inputs),
                 timeout=60,
                 headers={"Content-Type": "application/json"},
             )
             r.raise_for_status()
-            data = r.json()
-            embeddings = data.get("embeddings", [])
-            if not embeddings or not isinstance(embeddings, list):
-                raise RuntimeError("No embeddings returned from /api/embed")
-            return embeddings
+            return self._finish(r.json(), t0)
+        except Exception as e:
+            telemetry.record("embed", self.model, None, error=type(e).__name__)
+            raise HTTPException(status_code=502, detail=f"Embedding error: {e}")
+
+    async def _apost_embed(self, inputs: List[str]) -> List[List[float]]:
+        if self.ahttp is None:
+            self.ahttp = httpx.AsyncClient(timeout=60)
+        t0 = time.perf_counter()
+        try:
+            r = await self.ahttp.post(
+                f"{self.base_url}/api/embed",
+                json=self._body(inputs),
+                timeout=60,
+            )
+            r.raise_for_status()
+            return self._finish(r.json(), t0)
         except Exception as e:
+            telemetry.record("embed", self.model, None, error=type(e).__name__)
             raise HTTPException(status_code=502, detail=f"Embedding error: {e}")
 
     # LangChain interface
@@ -36,3 +105,11 @@ class OllamaEmbedViaEmbedRoute:
 
     def embed_query(self, text: str) -> List[float]:
         return self._post_embed([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return await self._apost_embed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._apost_embed([text]))[0]
@@ -0,0 +1,98 @@
+# server/services/extractive.py
+"""
+Extractive summaries without LLM calls: the degraded mode of /summarize.
+
+Chunks are ranked by TextRank-style centrality over the embeddings already
+stored in Chroma (cosine similarity graph, PageRank power iteration, all in
+NumPy), near-duplicates of a chosen chunk are skipped, and each winner
+contributes its most representative sentence. Points come back in document
+order. A few thousand chunks take well under a second.
+"""
+from __future__ import annotations
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAX_POINTS = 6
+MAX_CHUNKS = 2000        # larger documents are sampled evenly first
+DAMPING = 0.85
+DUPLICATE_SIM = 0.92     # skip chunks this similar to one already chosen
+
+_SENT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+def _load(col, doc_id: str, pages: Optional[Tuple[int, int]]):
+    where: Dict[str, Any] = {"doc_id": doc_id}
+    if pages:
+        where = {"$and": [{"doc_id": doc_id}, {"page": {"$gte": pages[0]}}, {"page": {"$lte": pages[1]}}]}
+    res = col.get(where=where, include=["documents", "metadatas", "embeddings"])
+    embs = res.get("embeddings")  # may be a NumPy array: no truthiness test
+    rows = [
+        ((m or {}).get("page", 0), (m or {}).get("chunk_index", 0), t, e)
+        for m, t, e in zip(res.get("metadatas") or [], res.get("documents") or [], embs if embs is not None else [])
+        if t and t.strip()
+    ]
+    rows.sort(key=lambda r: (r[0], r[1]))
+    return rows
+
+def centrality(emb: np.ndarray, damping: float = DAMPING, iters: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank over the cosine-similarity graph of the rows of `emb`."""
+    n = emb.shape[0]
+    if n == 1:
+        return np.ones(1)
+    x = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    sim = np.clip(x @ x.T, 0.0, None)
+    np.fill_diagonal(sim, 0.0)
+    rows = sim.sum(axis=1, keepdims=True)
+    trans = np.divide(sim, rows, out=np.full_like(sim, 1.0 / n), where=rows > 0)
+    score = np.full(n, 1.0 / n)
+    for _ in range(iters):
+        nxt = (1.0 - damping) / n + damping * (score @ trans)
+        if np.abs(nxt - score).sum() < tol:
+            return nxt
+        score = nxt
+    return score
+
+def best_sentence(text: str, max_words: int = 60) -> str:
+    """The sentence sharing the most vocabulary with the rest of the chunk."""
+    sents = [s.strip() for s in _SENT.split(" ".join(text.split())) if len(s.split()) >= 6]
+    if not sents:
+        return " ".join(text.split()[:max_words])
+    bags = [set(w.lower() for w in _WORD.findall(s)) for s in sents]
+    scores = [
+        sum(len(b & o) / (len(b | o) or 1) for j, o in enumerate(bags) if j != i)
+        for i, b in enumerate(bags)
+    ]
+    words = sents[int(np.argmax(scores))].split()
+    return " ".join(words[:max_words]) + ("…" if len(words) > max_words else "")
+
+def extractive_summary(col, doc_id: str, pages: Optional[Tuple[int, int]] = None,
+                       max_points: int = MAX_POINTS) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    rows = _load(col, doc_id, pages)
+    if not rows:
+        return {"bullets": [], "stats": {"chunks": 0, "ms": 0.0}}
+    if len(rows) > MAX_CHUNKS:
+        idx = np.linspace(0, len(rows) - 1, MAX_CHUNKS).round().astype(int)
+        rows = [rows[i] for i in idx]
+
+    emb = np.asarray([r[3] for r in rows], dtype=np.float32)
+    score = centrality(emb)
+    x = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+
+    chosen: List[int] = []
+    for i in np.argsort(-score):
+        if len(chosen) >= max_points:
+            break
+        if chosen and float(np.max(x[chosen] @ x[i])) >= DUPLICATE_SIM:
+            continue
+        chosen.append(int(i))
+
+    bullets = [best_sentence(rows[i][2]) for i in sorted(chosen)]  # document order
+    return {
+        "bullets": bullets,
+        "pages": [rows[i][0] for i in sorted(chosen)],
+        "stats": {"chunks": len(rows), "ms": round((time.perf_counter() - t0) * 1000.0, 1)},
+    }
@@ -0,0 +1,149 @@
+# server/services/jobs.py
+"""
+Tiny in-process background job registry.
+
+Long index maintenance tasks (re-indexing, migrations, compaction) run in a
+daemon thread so the API keeps serving; clients poll the job for progress.
+LLM work built on the async clients (section summaries) runs as a task on the
+server's event loop instead (submit_async). Jobs are not persisted: a server
+restart forgets them.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    project_id: Optional[str] = None
+    exclusive: bool = True            # holds the project's index: conflicts only with other exclusive jobs
+    status: str = "queued"            # queued | running | done | error
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def eta_s(self) -> Optional[float]:
+        if self.status != "running" or not self.started_at or not self.total or self.done <= 0:
+            return None
+        elapsed = time.time() - self.started_at
+        rate = self.done / max(elapsed, 1e-6)
+        return round(max(0, self.total - self.done) / rate, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "percent": round(100.0 * self.done / self.total, 1) if self.total else None,
+            "eta_s": self.eta_s(),
+            "message": self.message,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobConflict(RuntimeError):
+    """Raised when a job of the same kind is already running for a project."""
+
+_JOBS: Dict[str, Job] = {}
+_LOCK = threading.Lock()
+_TASKS: Set[asyncio.Task] = set()  # strong refs so running async jobs aren't garbage-collected
+_MAX_FINISHED = 50
+
+def _prune() -> None:
+    finished = [j for j in _JOBS.values() if j.finished_at]
+    finished.sort(key=lambda j: j.finished_at or 0)
+    for j in finished[:-_MAX_FINISHED]:
+        _JOBS.pop(j.id, None)
+
+def _register(kind: str, project_id: Optional[str], exclusive: bool) -> Job:
+    with _LOCK:
+        if exclusive:
+            for j in _JOBS.values():
+                if j.exclusive and j.project_id == project_id and j.status in ("queued", "running"):
+                    raise JobConflict(f"Job {j.id} ({j.kind}) is already running for this project")
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, project_id=project_id, exclusive=exclusive)
+        _JOBS[job.id] = job
+        _prune()
+    return job
+
+def submit(kind: str, fn: Callable[[Job], Optional[Dict[str, Any]]], project_id: Optional[str] = None,
+           exclusive: bool = True) -> Job:
+    """
+    Run fn(job) in a daemon thread. fn reports progress via job.progress()
+    and returns an optional result dict. With exclusive=True, a second job
+    touching the same project's index while one is running raises JobConflict.
+    """
+    job = _register(kind, project_id, exclusive)
+
+    def _run():
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job) or {}
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{e}"
+            job.status = "error"
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+
+    threading.Thread(target=_run, name=f"siraj-job-{kind}", daemon=True).start()
+    return job
+
+def submit_async(kind: str, fn: Callable[[Job], Awaitable[Optional[Dict[str, Any]]]],
+                 project_id: Optional[str] = None, exclusive: bool = False) -> Job:
+    """Like submit(), but `await fn(job)` runs as a task on the running event loop."""
+    job = _register(kind, project_id, exclusive)
+
+    async def _run():
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = (await fn(job)) or {}
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.error = "cancelled"
+            job.status = "error"
+            raise
+        except Exception as e:
+            job.error = f"{e}"
+            job.status = "error"
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+
+    task = asyncio.get_running_loop().create_task(_run())
+    _TASKS.add(task)
+    task.add_done_callback(_TASKS.discard)
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _JOBS.get(job_id)
+
+def list_jobs() -> List[Job]:
+    return sorted(_JOBS.values(), key=lambda j: j.created_at, reverse=True)
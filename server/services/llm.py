@@ -1,33 +1,211 @@
 # server/services/llm.py
+import contextlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+import httpx
 from fastapi import HTTPException
-from ollama import Client
 
-class OllamaGenerateClient:
-    def __init__(self, model: str, host: str | None = None):
+from .llm_cache import cache_enabled, get_llm_cache, make_key
+from .scheduler import LLMScheduler, priority_for
+from .prompt_packer import get_estimator
+from .warmup import note_use
+from .telemetry import telemetry
+
+DEFAULT_HOST = "http://localhost:11434"
+
+@dataclass
+class GenerateResult:
+    text: str
+    prompt_eval_count: int = 0   # prompt tokens Ollama evaluated (0 on cache hits)
+    eval_count: int = 0          # tokens generated
+    cached: bool = False
+
+class _OllamaGenerateBase:
+    """Request building, timeouts, cache keys and telemetry."""
+    def __init__(
+        self,
+        model: str,
+        host: str | None = None,
+        timeout: float | None = 120.0,
+        num_ctx: int | None = None,
+        keep_alive: str | None = None,
+    ):
         self.model = model
-        # If host is None, Client() uses OLLAMA_HOST env or the default localhost:11434
-        self.client = Client(host=host) if host else Client()
+        self.host = (host or DEFAULT_HOST).rstrip("/")
+        self.timeout = timeout
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.tokens = get_estimator(model)
+
+    def _payload(
+        self, prompt: str, temperature: float, num_predict: int, options: dict | None, stream: bool, fmt: Any = None,
+    ) -> dict:
+        base_opts = {
+            "temperature": temperature,
+            "num_predict": num_predict,
+        }
+        if self.num_ctx:
+            base_opts["num_ctx"] = self.num_ctx
+        if options:
+            base_opts.update(options)
+        payload = {"model": self.model, "prompt": prompt, "options": base_opts, "stream": stream}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if fmt is not None:
+            payload["format"] = fmt  # "json" or a JSON schema (structured outputs)
+        return payload
+
+    def _timeout(self, timeout: float | None) -> float | None:
+        return self.timeout if timeout is None else timeout
+
+    def _cache_key(self, prompt, temperature, num_predict, options, route, cache, fmt=None) -> str | None:
+        use_cache = cache_enabled(route) if cache is None else cache
+        return make_key(self.model, prompt, temperature, num_predict, options, fmt) if use_cache else None
+
+    @staticmethod
+    def _error(e: Exception) -> HTTPException:
+        if isinstance(e, HTTPException):
+            return e
+        if isinstance(e, httpx.TimeoutException):
+            return HTTPException(status_code=504, detail=f"LLM generate timed out: {e}")
+        return HTTPException(status_code=502, detail=f"LLM generate error: {e}")
+
+    def _done(self, prompt: str, data: dict, route: str | None, t0: float) -> None:
+        """Bookkeeping on Ollama's final object: token calibration, keep-alive, telemetry."""
+        self.tokens.observe(prompt, data.get("prompt_eval_count"))
+        note_use(self.model)
+        telemetry.record("generate", self.model, route, data, wall_ms=(time.perf_counter() - t0) * 1000.0)
+
+    def _failed(self, route: str | None, t0: float, e: Exception) -> None:
+        telemetry.record("generate", self.model, route, wall_ms=(time.perf_counter() - t0) * 1000.0,
+                         error=type(e).__name__)
+
+    def _delta(self, line: str, prompt: str, route: str | None, t0: float) -> str:
+        part = json.loads(line)
+        if part.get("error"):
+            raise RuntimeError(part["error"])
+        if part.get("done"):
+            self._done(prompt, part, route, t0)
+        return part.get("response") or ""
+
+
+class AsyncOllamaGenerateClient(_OllamaGenerateBase):
+    """
+    asyncio-native client for Ollama's /api/generate: an in-flight
+    generation costs a coroutine, not a threadpool thread.
+    Get one from server.deps.get_async_llm() (shared httpx.AsyncClient pool).
+
+    With a `scheduler`, every call (cache hits excepted) waits for a slot in
+    its priority class first: `priority=` overrides the class implied by
+    `route`, `project=` is the fair-share key (defaults to the active project).
+    """
+    def __init__(
+        self,
+        model: str,
+        host: str | None = None,
+        http: httpx.AsyncClient | None = None,
+        timeout: float | None = 120.0,
+        scheduler: LLMScheduler | None = None,
+        num_ctx: int | None = None,
+        keep_alive: str | None = None,
+    ):
+        super().__init__(model, host, timeout, num_ctx, keep_alive)
+        self.http = http or httpx.AsyncClient(base_url=self.host, timeout=timeout)
+        self.scheduler = scheduler
 
-    def generate(
+    def _slot(self, route: str | None, priority: str | None, project: str | None):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(priority_for(route, priority), project)
+
+    async def generate(
         self,
         prompt: str,
         temperature: float = 0.2,
         num_predict: int = 512,
         options: dict | None = None,
+        timeout: float | None = None,
+        route: str | None = None,
+        cache: bool | None = None,
+        priority: str | None = None,
+        project: str | None = None,
+        format: Any = None,
     ) -> str:
+        return (await self.generate_full(
+            prompt, temperature, num_predict, options, timeout,
+            route=route, cache=cache, priority=priority, project=project, format=format,
+        )).text
+
+    async def generate_full(
+        self,
+        prompt: str,
+        temperature: float = 0.2,
+        num_predict: int = 512,
+        options: dict | None = None,
+        timeout: float | None = None,
+        route: str | None = None,
+        cache: bool | None = None,
+        priority: str | None = None,
+        project: str | None = None,
+        format: Any = None,
+    ) -> GenerateResult:
+        """generate() plus Ollama's token counts, for callers that account for them."""
+        key = self._cache_key(prompt, temperature, num_predict, options, route, cache, format)
+        if key:
+            hit = await get_llm_cache().aget(key, route)
+            if hit is not None:
+                telemetry.record("generate", self.model, route, cached=True)
+                return GenerateResult(text=hit, cached=True)
+        t0 = time.perf_counter()
+        try:
+            async with self._slot(route, priority, project):
+                r = await self.http.post(
+                    f"{self.host}/api/generate",
+                    json=self._payload(prompt, temperature, num_predict, options, stream=False, fmt=format),
+                    timeout=self._timeout(timeout),
+                )
+            r.raise_for_status()
+            data = r.json()
+            self._done(prompt, data, route, t0)
+            text = (data.get("response") or "").strip()
+        except Exception as e:
+            self._failed(route, t0, e)
+            raise self._error(e)
+        if key and text:
+            await get_llm_cache().aput(key, self.model, text, route)
+        return GenerateResult(
+            text=text,
+            prompt_eval_count=int(data.get("prompt_eval_count") or 0),
+            eval_count=int(data.get("eval_count") or 0),
+        )
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.2,
+        num_predict: int = 512,
+        options: dict | None = None,
+        timeout: float | None = None,
+        route: str | None = None,
+        priority: str | None = None,
+        project: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Yields text deltas; closing the iterator aborts the Ollama stream."""
+        t0 = time.perf_counter()
         try:
-            base_opts = {
-                "temperature": temperature,
-                "num_predict": num_predict,
-            }
-            if options:
-                base_opts.update(options)
-            result = self.client.generate(
-                model=self.model,
-                prompt=prompt,
-                options=base_opts,
-                stream=False,
-            )
-            return (result.get("response") or "").strip()
+            async with self._slot(route, priority, project), self.http.stream(
+                "POST",
+                f"{self.host}/api/generate",
+                json=self._payload(prompt, temperature, num_predict, options, stream=True),
+                timeout=self._timeout(timeout),
+            ) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    delta = self._delta(line, prompt, route, t0) if line else ""
+                    if delta:
+                        yield delta
         except Exception as e:
-            raise HTTPException(status_code=502, detail=f"LLM generate error: {e}")
+            self._failed(route, t0, e)
+            raise self._error(e)
@@ -2,10 +2,8 @@
 from __future__ import annotations
 from typing import List, Tuple
 import re
-from server.services.llm import OllamaGenerateClient
-from server.deps import get_vectordb
-
-OLLAMA = OllamaGenerateClient(model="llama3.1", host="http://127.0.0.1:11434")
+from server.deps import get_vectordb, get_async_llm
+from server.services.vectorstore import asimilarity_search
 
 def _build_prompt(context: str, style: str, duration_sec: int) -> str:
     # cap words ~140 per 30s
@@ -115,15 +113,15 @@ def _generate_organic_sections(lines: List[str]) -> List[dict]:
     return sections
 
 
-def brainrot_summary(doc_id: str, style: str = "memetic", duration_sec: int = 30) -> Tuple[str, List[dict]]:
+async def brainrot_summary(doc_id: str, style: str = "memetic", duration_sec: int = 30) -> Tuple[str, List[dict]]:
     # pull a few top chunks from this doc for context
     seed = "high level summary of this document"
-    chunks = get_vectordb().similarity_search(seed, k=8, filter={"doc_id": doc_id}) or []
+    chunks = await asimilarity_search(get_vectordb(), seed, k=8, filter={"doc_id": doc_id}) or []
     context = "\n\n".join(c.page_content[:800] for c in chunks)
 
     prompt = _build_prompt(context, style, duration_sec)
     # NOTE: positional args like in summarize.py → (text, temperature, max_tokens)
-    raw_script = OLLAMA.generate(prompt, 0.25, 320)
+    raw_script = await get_async_llm().generate(prompt, 0.25, 320, route="brainrot")
     
     # Clean and process the script
     script_text = _clean_script(raw_script)
@@ -0,0 +1,169 @@
+# server/services/llm_cache.py
+"""
+Persistent cache of LLM responses, keyed by a hash of
+(model, prompt, temperature, num_predict, options).
+
+Opt-in per route: only routes listed in LLM_CACHE_ROUTES are cached, e.g.
+LLM_CACHE_ROUTES=summarize,suggest. Entries expire after LLM_CACHE_TTL_S
+and the least recently used ones are evicted beyond LLM_CACHE_MAX_ENTRIES.
+Caching `quiz` makes every regeneration for a document return the same
+questions, so the quiz pool and question bank stop getting new ones.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from ..config import LLM_CACHE_PATH, LLM_CACHE_ROUTES, LLM_CACHE_TTL_S, LLM_CACHE_MAX_ENTRIES
+
+_EVICT_EVERY = 50  # puts between size checks
+
+def cache_enabled(route: Optional[str]) -> bool:
+    return bool(route) and (route in LLM_CACHE_ROUTES or "*" in LLM_CACHE_ROUTES)
+
+def make_key(
+    model: str, prompt: str, temperature: float, num_predict: int, options: Optional[dict], fmt: Any = None,
+) -> str:
+    body = {"model": model, "prompt": prompt, "temperature": temperature,
+            "num_predict": num_predict, "options": options or {}}
+    if fmt is not None:
+        body["format"] = fmt  # only when set, so older keys stay valid
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, path: str, ttl_s: float, max_entries: int):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        con = self._conn()
+        try:
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+              key        TEXT PRIMARY KEY,
+              model      TEXT NOT NULL,
+              route      TEXT,
+              response   TEXT NOT NULL,
+              created_at REAL NOT NULL,
+              last_hit   REAL NOT NULL,
+              hits       INTEGER NOT NULL DEFAULT 0
+            );
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_hit ON llm_cache(last_hit);")
+            con.commit()
+        finally:
+            con.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=10)
+        con.execute("PRAGMA journal_mode=WAL;")
+        return con
+
+    def get(self, key: str, route: Optional[str] = None) -> Optional[str]:
+        now = time.time()
+        con = self._conn()
+        try:
+            row = con.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_s:
+                con.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                con.commit()
+                row = None
+            if row:
+                con.execute("UPDATE llm_cache SET last_hit = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                con.commit()
+        finally:
+            con.close()
+        with self._lock:
+            (self._hits if row else self._misses)[route or "-"] += 1
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, response: str, route: Optional[str] = None) -> None:
+        now = time.time()
+        con = self._conn()
+        try:
+            con.execute(
+                "INSERT OR REPLACE INTO llm_cache(key, model, route, response, created_at, last_hit, hits) "
+                "VALUES (?,?,?,?,?,?,0)",
+                (key, model, route, response, now, now),
+            )
+            con.commit()
+            with self._lock:
+                self._puts += 1
+                check = self._puts % _EVICT_EVERY == 1
+            if check:
+                self._evict(con, now)
+        finally:
+            con.close()
+
+    async def aget(self, key: str, route: Optional[str] = None) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key, route)
+
+    async def aput(self, key: str, model: str, response: str, route: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.put, key, model, response, route)
+
+    def _evict(self, con: sqlite3.Connection, now: float) -> None:
+        con.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_s,))
+        n = con.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if n > self.max_entries:
+            con.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_hit ASC LIMIT ?)",
+                (n - self.max_entries,),
+            )
+        con.commit()
+
+    def clear(self) -> int:
+        con = self._conn()
+        try:
+            n = con.execute("DELETE FROM llm_cache").rowcount
+            con.commit()
+            return n
+        finally:
+            con.close()
+
+    def stats(self) -> Dict[str, Any]:
+        con = self._conn()
+        try:
+            entries = con.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        finally:
+            con.close()
+        with self._lock:
+            routes = sorted(set(self._hits) | set(self._misses))
+            per_route = {
+                r: {
+                    "hits": self._hits[r],
+                    "misses": self._misses[r],
+                    "hit_rate": round(self._hits[r] / max(1, self._hits[r] + self._misses[r]), 3),
+                }
+                for r in routes
+            }
+        return {
+            "enabled_routes": sorted(LLM_CACHE_ROUTES),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "routes": per_route,
+        }
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(str(LLM_CACHE_PATH), LLM_CACHE_TTL_S, LLM_CACHE_MAX_ENTRIES)
+    return _cache
@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import json
+import os
 import time
 
 PROJECTS_ROOT = Path("SirajProjects")
@@ -24,6 +25,11 @@ class ProjectManifest:
     resources_dir: str       # "resources"
     # optional convenience fields
     last_doc_id: str | None = None
+    # vector index settings (older manifests fall back to these defaults)
+    collection_name: str = "siraj_docs"
+    embed_dim: int | None = None     # Matryoshka truncation; None = full model dim
+    hnsw: dict | None = None         # {"space", "M", "construction_ef", "search_ef"}; None = Chroma defaults
+    embed_model: str | None = None   # model the collection was embedded with; None = OLLAMA_EMBED_MODEL
 
     @staticmethod
     def default(pid: str, title: str, description: str | None = None, brainrot_enabled=False):
@@ -61,7 +67,10 @@ def write_manifest(project_dir: Path, manifest: ProjectManifest) -> Path:
     p = manifest_path(project_dir / manifest.id).with_suffix(".sirajproj")
     p.parent.mkdir(parents=True, exist_ok=True)
     manifest.updated_at = time.time()
-    p.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+    # write-then-rename so readers never see a half-written manifest
+    tmp = p.with_suffix(".sirajproj.tmp")
+    tmp.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+    os.replace(tmp, p)
     return p
 
 def ensure_structure(project_dir: Path, manifest: ProjectManifest):
@@ -87,6 +96,17 @@ def get_active_paths() -> dict | None:
         return None
     return json.loads(ACTIVE_PATHS_FILE.read_text(encoding="utf-8"))
 
+def get_active_manifest() -> tuple[Path, ProjectManifest] | None:
+    """(project_dir, manifest) of the active project, or None if none is open."""
+    active = get_active_paths()
+    if not active or "manifest_path" not in active:
+        return None
+    mp = Path(active["manifest_path"])
+    try:
+        return mp.parent, read_manifest(mp)
+    except Exception:
+        return None
+
 def list_projects() -> list[dict]:
     # scan SirajProjects/*/*.sirajproj
     items = []
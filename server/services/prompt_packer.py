@@ -0,0 +1,148 @@
+# server/services/prompt_packer.py
+"""
+Token-budget prompt packing.
+
+Prompts are a template with `{placeholders}` filled from sections of items
+(retrieved chunks, chat turns, map bullets…). pack_prompt() counts the fixed
+template text first, then fills the remaining budget section by section in
+priority order, keeping whole items and trimming only the last one that
+does not fit. The budget is the model's num_ctx minus the generation
+budget, so nothing is silently cut off inside Ollama.
+
+Ollama has no tokenize endpoint, so tokens are estimated from characters
+with a per-model ratio that is re-calibrated from the `prompt_eval_count`
+Ollama reports after each call (see TokenEstimator.observe).
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+from ..config import LLM_NUM_CTX, PROMPT_CHARS_PER_TOKEN, PROMPT_SAFETY_TOKENS
+
+class TokenEstimator:
+    """chars/token ratio, moved towards observed counts with an EMA."""
+    def __init__(self, chars_per_token: float = PROMPT_CHARS_PER_TOKEN, alpha: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return int(len(text) / self.chars_per_token) + 1
+
+    def chars_for(self, tokens: int) -> int:
+        return max(0, int(tokens * self.chars_per_token))
+
+    def observe(self, text: str, prompt_eval_count: Optional[int]) -> None:
+        # Ollama reports fewer tokens when it reuses a cached prompt prefix;
+        # ratios outside a plausible range are ignored rather than learned.
+        if not prompt_eval_count or len(text) < 200:
+            return
+        ratio = len(text) / prompt_eval_count
+        if not 1.5 <= ratio <= 8.0:
+            return
+        with self._lock:
+            self.chars_per_token += self.alpha * (ratio - self.chars_per_token)
+            self.samples += 1
+
+_estimators: Dict[str, TokenEstimator] = {}
+_estimators_lock = threading.Lock()
+
+def get_estimator(model: str) -> TokenEstimator:
+    with _estimators_lock:
+        est = _estimators.get(model)
+        if est is None:
+            est = _estimators[model] = TokenEstimator()
+        return est
+
+def prompt_budget(num_predict: int, num_ctx: int = LLM_NUM_CTX) -> int:
+    """Tokens available to the prompt once the answer's budget is set aside."""
+    return max(256, num_ctx - num_predict - PROMPT_SAFETY_TOKENS)
+
+@dataclass
+class Section:
+    """
+    One placeholder of the template.
+
+    `items` are packed in order for keep="head" (best first: ranked chunks)
+    or from the end for keep="tail" (most recent first: chat history), and
+    rendered in their original order. `min_items` are reserved before any
+    section is filled, so e.g. the latest chat turn survives a large context.
+    """
+    name: str
+    items: List[str]
+    separator: str = "\n\n"
+    keep: Literal["head", "tail"] = "head"
+    min_items: int = 0
+    max_tokens: Optional[int] = None
+
+@dataclass
+class PackedPrompt:
+    text: str
+    budget: int
+    tokens: int
+    sections: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def report(self) -> Dict[str, object]:
+        return {"budget": self.budget, "tokens": self.tokens, "sections": self.sections}
+
+def _trim(text: str, tokens: int, est: TokenEstimator, keep: str) -> str:
+    chars = est.chars_for(tokens)
+    if chars <= 0:
+        return ""
+    return text[:chars].rstrip() + "…" if keep == "head" else "…" + text[-chars:].lstrip()
+
+def pack_prompt(
+    template: str,
+    sections: List[Section],
+    budget: int,
+    estimator: Optional[TokenEstimator] = None,
+) -> PackedPrompt:
+    """Fill `template` ({name} per section) within `budget` tokens, sections in priority order."""
+    est = estimator or TokenEstimator()
+    fixed = est.count(template.format(**{s.name: "" for s in sections}))
+    left = budget - fixed
+
+    def order(s: Section) -> List[int]:
+        idx = list(range(len(s.items)))
+        return idx if s.keep == "head" else idx[::-1]
+
+    chosen: Dict[str, Dict[int, str]] = {s.name: {} for s in sections}
+    used: Dict[str, int] = {s.name: 0 for s in sections}
+    sep_cost = {s.name: est.count(s.separator) for s in sections}
+
+    def take(s: Section, i: int, allow_trim: bool) -> bool:
+        nonlocal left
+        cap = left if s.max_tokens is None else min(left, s.max_tokens - used[s.name])
+        cost = est.count(s.items[i]) + (sep_cost[s.name] if chosen[s.name] else 0)
+        if cost <= cap:
+            chosen[s.name][i] = s.items[i]
+        elif allow_trim and cap > 16:
+            chosen[s.name][i] = _trim(s.items[i], cap - sep_cost[s.name], est, s.keep)
+            cost = cap
+        else:
+            return False
+        used[s.name] += cost
+        left -= cost
+        return True
+
+    # 1) reservations, 2) greedy fill by priority
+    for s in sections:
+        for i in order(s)[:s.min_items]:
+            take(s, i, allow_trim=True)
+    for s in sections:
+        for i in order(s):
+            if i in chosen[s.name]:
+                continue
+            if not take(s, i, allow_trim=not chosen[s.name]):
+                break
+
+    values = {s.name: s.separator.join(chosen[s.name][i] for i in sorted(chosen[s.name])) for s in sections}
+    text = template.format(**values)
+    report = {"instructions": {"tokens": fixed}}
+    for s in sections:
+        report[s.name] = {"tokens": used[s.name], "items": len(chosen[s.name]), "dropped": len(s.items) - len(chosen[s.name])}
+    return PackedPrompt(text=text, budget=budget, tokens=budget - left, sections=report)
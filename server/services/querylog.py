@@ -0,0 +1,60 @@
+# server/services/querylog.py
+"""
+Append-only log of real user queries per project (queries.jsonl next to the
+manifest). Benchmarks replay it to tune retrieval on realistic traffic.
+Off unless LOG_QUERIES=1; writes happen on a worker thread.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+from ..config import LOG_QUERIES
+from .projects import get_active_manifest
+
+QUERY_LOG = "queries.jsonl"
+MAX_BYTES = 1_000_000        # trim to the newer half once the log grows past this
+
+_lock = threading.Lock()
+
+def record_query(text: str, doc_id: str | None = None) -> None:
+    text = (text or "").strip()
+    active = get_active_manifest()
+    if not text or not active:
+        return
+    path = active[0] / QUERY_LOG
+    line = json.dumps({"ts": time.time(), "doc_id": doc_id, "q": text[:500]}, ensure_ascii=False)
+    try:
+        with _lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            if path.stat().st_size > MAX_BYTES:
+                lines = path.read_text(encoding="utf-8").splitlines()
+                path.write_text("\n".join(lines[len(lines) // 2:]) + "\n", encoding="utf-8")
+    except OSError:
+        pass  # logging must never break a request
+
+def submit_query(text: str, doc_id: str | None = None) -> None:
+    """record_query() without blocking the event loop (fire and forget)."""
+    if LOG_QUERIES:
+        asyncio.get_running_loop().run_in_executor(None, record_query, text, doc_id)
+
+def load_queries(project_dir: Path, limit: int = 500) -> List[str]:
+    path = project_dir / QUERY_LOG
+    if not path.exists():
+        return []
+    out, seen = [], set()
+    for ln in reversed(path.read_text(encoding="utf-8").splitlines()):
+        try:
+            q = json.loads(ln).get("q", "")
+        except Exception:
+            continue
+        if q and q not in seen:
+            seen.add(q)
+            out.append(q)
+        if len(out) >= limit:
+            break
+    return out
@@ -0,0 +1,192 @@
+# server/services/question_bank.py
+"""
+Per-document question bank in the active project's SQLite database.
+
+Every LLM-written quiz question is stored on its own with the embedding of
+its stem (the project's embedding model). A new question whose stem has
+cosine similarity >= QUIZ_BANK_DUPLICATE_SIM with a banked one of the same
+document is rejected as a duplicate, and in the quiz being served it is
+swapped for the least-served banked question (or dropped if there is none).
+Once a document has QUIZ_BANK_MIN_RATIO times the requested number of
+questions, quizzes are assembled from the bank (least-served questions
+first, random among equals) without any LLM call; background generations
+(quiz pool refills) keep adding new questions meanwhile.
+"""
+from __future__ import annotations
+import asyncio
+import datetime
+import json
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from ..config import resolve_sqlite_path, QUIZ_BANK_DUPLICATE_SIM, QUIZ_BANK_MIN_RATIO
+from ..deps import get_vectordb
+from .quizgen import QuizQuestion, QuizSpec, quiz_stats
+
+def _conn():
+    path = resolve_sqlite_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS question_bank (
+      id             TEXT PRIMARY KEY,
+      doc_id         TEXT NOT NULL,
+      stem           TEXT NOT NULL,
+      question_json  TEXT NOT NULL,
+      embedding      BLOB NOT NULL,   -- float32, L2-normalized
+      embed_model    TEXT NOT NULL,
+      served         INTEGER NOT NULL DEFAULT 0,
+      created_at     TEXT NOT NULL
+    );
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_question_bank_doc ON question_bank(doc_id)")
+    return con
+
+def _normalize(vecs) -> np.ndarray:
+    m = np.asarray(vecs, dtype=np.float32)
+    if m.ndim == 1:
+        m = m[None, :]
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+def _embedder():
+    emb = get_vectordb().embeddings
+    return emb, getattr(emb, "model", "")
+
+def _banked(con, doc_id: str, embed_model: str) -> Tuple[List[str], np.ndarray]:
+    rows = con.execute(
+        "SELECT id, embedding FROM question_bank WHERE doc_id = ? AND embed_model = ?", (doc_id, embed_model)
+    ).fetchall()
+    if not rows:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return [r[0] for r in rows], np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+
+async def bank_quiz(spec: QuizSpec, served: bool = False) -> QuizSpec:
+    """
+    add_questions() for a freshly generated quiz (`served`: it is being shown
+    now). Returns the quiz with near-duplicates of banked questions replaced;
+    a banking failure only costs the banking.
+    """
+    try:
+        added, dupes = await add_questions(spec.doc_id, spec.questions, served)
+    except Exception as e:
+        print(f"[bank] doc={spec.doc_id} banking failed: {e}")
+        return spec
+    print(f"[bank] doc={spec.doc_id} added={added} duplicates={len(dupes)}")
+    if not dupes:
+        return spec
+    return await asyncio.to_thread(_replace_duplicates, spec, dupes)
+
+async def add_questions(doc_id: str, questions: List[QuizQuestion],
+                        served: bool = False) -> Tuple[int, Dict[int, str]]:
+    """
+    Bank the LLM-written questions that aren't near-duplicates; returns
+    (added, {index into `questions` of a duplicate: id of the row it matched}).
+    """
+    idx = [i for i, q in enumerate(questions) if q.source == "llm"]
+    if not idx:
+        return 0, {}
+    emb, embed_model = _embedder()
+    new = _normalize(await emb.aembed_documents([questions[i].stem for i in idx]))
+    dupes = await asyncio.to_thread(
+        _insert, doc_id, [questions[i] for i in idx], new, embed_model, int(served)
+    )
+    quiz_stats.add(bank_added=len(idx) - len(dupes), bank_duplicates=len(dupes))
+    return len(idx) - len(dupes), {idx[j]: row for j, row in dupes.items()}
+
+def _insert(doc_id: str, questions: List[QuizQuestion], vecs: np.ndarray, embed_model: str,
+            served: int) -> Dict[int, str]:
+    now = datetime.datetime.utcnow().isoformat() + "Z"
+    dupes: Dict[int, str] = {}
+    con = _conn()
+    try:
+        ids, known = _banked(con, doc_id, embed_model)
+        if not known.size or known.shape[1] != vecs.shape[1]:
+            ids, known = [], np.zeros((0, vecs.shape[1]), dtype=np.float32)
+        for j, (q, v) in enumerate(zip(questions, vecs)):
+            if known.shape[0]:
+                best = int(np.argmax(known @ v))
+                if float(known[best] @ v) >= QUIZ_BANK_DUPLICATE_SIM:
+                    dupes[j] = ids[best]
+                    continue
+            row = uuid4().hex
+            con.execute(
+                "INSERT INTO question_bank(id, doc_id, stem, question_json, embedding, embed_model, served, created_at) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                (row, doc_id, q.stem, json.dumps(q.dict(), ensure_ascii=False),
+                 v.astype(np.float32).tobytes(), embed_model, served, now),
+            )
+            ids.append(row)
+            known = np.vstack([known, v[None, :]])
+        con.commit()
+    finally:
+        con.close()
+    return dupes
+
+def _take_least_served(con, doc_id: str, n: int, exclude_ids: Sequence[str] = (),
+                       exclude_stems: Sequence[str] = ()) -> List[QuizQuestion]:
+    ids_in = ",".join("?" * len(exclude_ids)) or "''"
+    stems_in = ",".join("?" * len(exclude_stems)) or "''"
+    rows = con.execute(
+        f"SELECT id, question_json FROM question_bank WHERE doc_id = ? AND id NOT IN ({ids_in}) "
+        f"AND stem NOT IN ({stems_in}) ORDER BY served, RANDOM() LIMIT ?",
+        (doc_id, *exclude_ids, *exclude_stems, n),
+    ).fetchall()
+    con.executemany("UPDATE question_bank SET served = served + 1 WHERE id = ?", [(r[0],) for r in rows])
+    con.commit()
+    return [QuizQuestion(**json.loads(r[1])) for r in rows]
+
+def _renumber(questions: List[QuizQuestion]) -> List[QuizQuestion]:
+    for i, q in enumerate(questions, start=1):
+        q.id = f"Q{i}"
+    return questions
+
+def _replace_duplicates(spec: QuizSpec, dupes: Dict[int, str]) -> QuizSpec:
+    """Swap the duplicates for other banked questions (not their twins, not already in the quiz)."""
+    keep = [q for i, q in enumerate(spec.questions) if i not in dupes]
+    con = _conn()
+    try:
+        extra = _take_least_served(con, spec.doc_id, len(dupes), list(dupes.values()), [q.stem for q in keep])
+    finally:
+        con.close()
+    return QuizSpec(quiz_id=spec.quiz_id, doc_id=spec.doc_id, questions=_renumber(keep + extra))
+
+def mark_served(doc_id: str, stems: List[str]) -> None:
+    """Count banked questions as served (a pooled quiz, banked at refill, is being shown)."""
+    if not stems:
+        return
+    con = _conn()
+    try:
+        con.executemany(
+            "UPDATE question_bank SET served = served + 1 WHERE doc_id = ? AND stem = ?",
+            [(doc_id, s) for s in stems],
+        )
+        con.commit()
+    finally:
+        con.close()
+
+def assemble_quiz(doc_id: str, n_questions: int) -> Optional[QuizSpec]:
+    """A quiz sampled from the bank, or None while the bank is too small (or disabled). Blocking."""
+    if QUIZ_BANK_MIN_RATIO <= 0:
+        return None
+    con = _conn()
+    try:
+        have = con.execute("SELECT COUNT(*) FROM question_bank WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+        if have < n_questions * QUIZ_BANK_MIN_RATIO:
+            return None
+        questions = _take_least_served(con, doc_id, n_questions)
+    finally:
+        con.close()
+    quiz_stats.add(bank_quizzes=1)
+    return QuizSpec(quiz_id=str(uuid4()), doc_id=doc_id, questions=_renumber(questions))
+
+def delete_bank_for_doc(doc_id: str) -> int:
+    con = _conn()
+    try:
+        n = con.execute("DELETE FROM question_bank WHERE doc_id = ?", (doc_id,)).rowcount
+        con.commit()
+        return n
+    finally:
+        con.close()
@@ -0,0 +1,84 @@
+# server/services/quiz_store.py
+"""
+Quiz specs and graded attempts (quizzes / quiz_attempts tables), shared by
+routes/quiz.py and the document delete cascade in docs.py.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+from typing import Dict
+
+
+def _db_path() -> Path:
+    # Prefer config if you have it; otherwise default to server/store/sqlite.db
+    try:
+        from ..config import SQLITE_DB  # type: ignore
+        if SQLITE_DB:
+            return Path(SQLITE_DB)
+    except Exception:
+        pass
+    return Path(__file__).resolve().parents[1] / "store" / "sqlite.db"
+
+
+def connect():
+    dbp = _db_path()
+    dbp.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(dbp)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def ensure_tables():
+    with connect() as con:
+        cur = con.cursor()
+        # quizzes table keeps the generated spec so we can grade later
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quizzes (
+                id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                spec_json TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            """
+        )
+        # attempts table stores performance + full feedback
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                quiz_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                score REAL NOT NULL,
+                answers_json TEXT NOT NULL,
+                feedback_json TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            """
+        )
+        con.commit()
+
+
+def save_quiz(quiz_id: str, doc_id: str, spec_json: str) -> None:
+    """Persist a served quiz spec so the grader can retrieve it deterministically."""
+    with connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO quizzes (id, doc_id, spec_json, created_at) VALUES (?, ?, ?, ?)",
+            (quiz_id, doc_id, spec_json, datetime.utcnow().isoformat()),
+        )
+        con.commit()
+
+
+def delete_quizzes_for_doc(doc_id: str) -> Dict[str, int]:
+    """
+    Drop every quiz spec and graded attempt of a document (one transaction).
+    Used by DELETE /documents/{doc_id}.
+    """
+    ensure_tables()
+    with connect() as con:
+        attempts = con.execute("DELETE FROM quiz_attempts WHERE doc_id = ?", (doc_id,)).rowcount
+        quizzes = con.execute("DELETE FROM quizzes WHERE doc_id = ?", (doc_id,)).rowcount
+        con.commit()
+    return {"quizzes": quizzes, "quiz_attempts": attempts}
@@ -1,19 +1,21 @@
 # server/services/quizgen.py
 from __future__ import annotations
 
+import asyncio
 import json
 import re
-from typing import List
+import threading
+from typing import List, Optional
 from uuid import uuid4
 
 from pydantic import BaseModel, Field
 
-from ..deps import get_vectordb
-from ..services.llm import OllamaGenerateClient
-from ..config import (
-    OLLAMA_BASE_URL,
-    OLLAMA_LLM_MODEL,
-)
+from ..deps import get_vectordb, get_async_llm
+from ..services.vectorstore import asimilarity_search_with_score
+from ..services.prompt_packer import PackedPrompt, Section, pack_prompt, prompt_budget
+from ..services.cloze import cloze_questions, load_chunks
+from ..services.scheduler import get_scheduler
+from ..config import LLM_QUIZ_TIMEOUT_S, QUIZ_SHARD_SIZE, QUIZ_CHUNKS_PER_SHARD
 
 # -----------------------------
 # Models
@@ -29,6 +31,7 @@ class QuizQuestion(BaseModel):
     options: List[QuizOption]
     correct_option_ids: List[str] = Field(default_factory=list)
     rationale: str = ""
+    source: str = "llm"  # "llm" | "cloze" | "fallback"; only LLM questions go into the question bank
 
 class QuizSpec(BaseModel):
     quiz_id: str
@@ -40,9 +43,10 @@ class QuizSpec(BaseModel):
 # Prompt
 # -----------------------------
 
-def _prompt_for_quiz(context: str, n_questions: int = 10) -> str:
-    # Keep it strict but short; model-agnostic.
-    return f"""
+QUIZ_NUM_PREDICT = 2048  # bigger budget to avoid cutoffs
+
+# Keep it strict but short; model-agnostic. {context} is filled by the packer.
+QUIZ_PROMPT = """
 You are Siraj, generating a QUIZ from the CONTEXT below.
 
 Return STRICT JSON and NOTHING ELSE, exactly with this shape:
@@ -76,65 +80,207 @@ RULES:
 {context}
 """.strip()
 
+def _prompt_for_quiz(chunks: List[str], n_questions: int, estimator, num_predict: int = QUIZ_NUM_PREDICT) -> PackedPrompt:
+    """Ranked chunks fill whatever num_ctx leaves after instructions and the answer budget."""
+    return pack_prompt(
+        QUIZ_PROMPT.replace("{n_questions}", str(n_questions)),
+        [Section("context", chunks)],
+        budget=prompt_budget(num_predict),
+        estimator=estimator,
+    )
+
 
 # -----------------------------
-# JSON extraction / repair
+# Structured output (Ollama `format` = JSON schema)
 # -----------------------------
 
-def _extract_json_block(text: str) -> dict:
-    """
-    Extract a JSON object from model output robustly.
+OPTION_IDS = ("A", "B", "C", "D")
+
+class QuizDraft(BaseModel):
+    """What the model returns: the questions of a QuizSpec (ids are ours)."""
+    questions: List[QuizQuestion]
+
+def _json_schema(model) -> dict:
+    # pydantic v2 / v1
+    return model.model_json_schema() if hasattr(model, "model_json_schema") else model.schema()
 
-    Strategy:
-    1) Prefer fenced ```json blocks
-    2) Try to find a balanced {...} region by brace counting
-    3) Fallback to first {...} and try to "repair" by trimming to last balanced brace
+def _inline_refs(node, defs: dict):
+    if isinstance(node, dict):
+        if "$ref" in node:
+            return _inline_refs(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items() if k not in ("$defs", "definitions", "title", "default")}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    return node
+
+def quiz_json_schema(n_questions: int) -> dict:
     """
-    # 1) Fenced block
-    m = re.search(r"```json\s*(\{.*?\})\s*```", text, flags=re.S | re.I)
-    if m:
-        return json.loads(m.group(1))
-
-    # 2) Balanced scan
-    j = _find_balanced_json(text)
-    if j is not None:
-        return json.loads(j)
-
-    # 3) First object + trim to last }
-    m = re.search(r"\{.*", text, flags=re.S)
-    if m:
-        candidate = m.group(0)
-        last_brace = candidate.rfind("}")
-        if last_brace != -1:
-            candidate = candidate[: last_brace + 1]
-            return json.loads(candidate)
-
-    # last-resort: try raw (will likely fail, but surfaces a clean error)
-    return json.loads(text)
-
-def _find_balanced_json(s: str) -> str | None:
+    JSON schema for QuizDraft with refs inlined (Ollama compiles it to a
+    grammar) and the quiz rules as constraints: n questions, 4 options A-D,
+    1-3 correct ids.
     """
-    Find the longest balanced JSON object starting from the first '{' via brace counting.
+    raw = _json_schema(QuizDraft)
+    schema = _inline_refs(raw, {**raw.get("definitions", {}), **raw.get("$defs", {})})
+    questions = schema["properties"]["questions"]
+    questions["minItems"] = questions["maxItems"] = n_questions
+    q = questions["items"]
+    q["properties"].pop("source", None)  # bookkeeping, set by us after parsing
+    q["required"] = ["id", "stem", "options", "correct_option_ids", "rationale"]
+    options = q["properties"]["options"]
+    options["minItems"] = options["maxItems"] = 4
+    options["items"]["properties"]["id"]["enum"] = list(OPTION_IDS)
+    correct = q["properties"]["correct_option_ids"]
+    correct["items"]["enum"] = list(OPTION_IDS)
+    correct["minItems"], correct["maxItems"] = 1, 3
+    return schema
+
+
+# -----------------------------
+# Parsing / per-question validation
+# -----------------------------
+
+def _salvage_question_objects(s: str) -> List[dict]:
     """
-    start = s.find("{")
+    Pull every complete object out of the "questions" array of a broken
+    document (typically cut off by num_predict), skipping the damaged ones.
+    """
+    start = s.find("[", max(0, s.find('"questions"')))
     if start == -1:
-        return None
-    depth = 0
-    for i in range(start, len(s)):
+        return []
+    out: List[dict] = []
+    depth, obj_start, in_str, esc = 0, None, False, False
+    for i in range(start + 1, len(s)):
         ch = s[i]
-        if ch == "{":
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch == "{":
+            if depth == 0:
+                obj_start = i
             depth += 1
-        elif ch == "}":
+        elif ch == "}" and depth:
             depth -= 1
-            if depth == 0:
-                return s[start : i + 1]
-    return None  # never closed
+            if depth == 0 and obj_start is not None:
+                try:
+                    out.append(json.loads(s[obj_start : i + 1]))
+                except ValueError:
+                    pass
+                obj_start = None
+        elif ch == "]" and depth == 0:
+            break
+    return out
+
+def _parse_questions(raw: str) -> tuple[List[dict], bool]:
+    """(question objects, parsed_cleanly)."""
+    try:
+        data = json.loads(raw)
+        items = data.get("questions") if isinstance(data, dict) else None
+        if isinstance(items, list):
+            return items, True
+    except ValueError:
+        pass
+    return _salvage_question_objects(raw), False
+
+def _validate_question(q, i: int) -> tuple[QuizQuestion | None, str | None]:
+    """
+    Coerce one model question to our schema. Cosmetic problems are fixed in
+    place (ids, order, missing rationale); a question with no stem, fewer
+    than 4 distinct options or no correct answer is rejected with a reason.
+    """
+    if not isinstance(q, dict):
+        return None, "not an object"
+    stem = str(q.get("stem") or "").strip()
+    if not stem:
+        return None, "empty stem"
+    raw_opts = [o for o in (q.get("options") or []) if isinstance(o, dict)][:4]
+    texts = [str(o.get("text") or "").strip() for o in raw_opts]
+    if len(texts) < 4 or not all(texts) or len({t.lower() for t in texts}) < 4:
+        return None, "needs 4 distinct non-empty options"
+    # map the model's option ids onto A-D by position
+    remap = {str(o.get("id") or "").strip().upper(): OPTION_IDS[j] for j, o in enumerate(raw_opts)}
+    correct = sorted({remap[c] for c in (str(x).strip().upper() for x in q.get("correct_option_ids") or []) if c in remap})
+    if not correct or len(correct) == 4:
+        return None, "needs 1-3 correct options"
+    return QuizQuestion(
+        id=f"Q{i}",
+        stem=stem,
+        options=[QuizOption(id=OPTION_IDS[j], text=t) for j, t in enumerate(texts)],
+        correct_option_ids=correct,
+        rationale=str(q.get("rationale") or "").strip() or "Based on the provided context.",
+    ), None
+
+
+# -----------------------------
+# Generation stats (GET /metrics/quiz)
+# -----------------------------
+
+class QuizGenStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.c = {
+            "llm_calls": 0,
+            "parse_failures": 0,          # responses that were not one valid JSON document
+            "questions_requested": 0,
+            "questions_valid": 0,
+            "questions_rejected": 0,
+            "repair_calls": 0,
+            "questions_repaired": 0,
+            "cloze_questions": 0,         # offline fill-in-the-blank questions (services/cloze.py)
+            "cloze_quizzes": 0,           # whole quizzes served offline while the scheduler was saturated
+            "fallback_questions": 0,
+            "shards": 0,
+            "duplicates_dropped": 0,      # near-identical stems merged away across shards
+            "tokens_generated": 0,
+            "tokens_wasted": 0,           # generated tokens that ended up discarded
+            "bank_added": 0,              # questions stored in the question bank
+            "bank_duplicates": 0,         # rejected as near-duplicates of banked questions
+            "bank_quizzes": 0,            # quizzes assembled from the bank (no LLM call)
+        }
+
+    def add(self, **kw: int) -> None:
+        with self._lock:
+            for k, v in kw.items():
+                self.c[k] += v
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            c = dict(self.c)
+        c["parse_failure_rate"] = round(c["parse_failures"] / c["llm_calls"], 3) if c["llm_calls"] else None
+        c["wasted_token_ratio"] = round(c["tokens_wasted"] / c["tokens_generated"], 3) if c["tokens_generated"] else None
+        return c
+
+quiz_stats = QuizGenStats()
 
 
 # -----------------------------
-# Fallback quiz (no-LLM safety net)
+# Offline quizzes (no-LLM safety net)
 # -----------------------------
 
+def _offline_questions(doc_id: str, n_questions: int) -> List[QuizQuestion]:
+    chunks = load_chunks(get_vectordb()._collection, doc_id)
+    out: List[QuizQuestion] = []
+    for i, q in enumerate(cloze_questions(chunks, n_questions), start=1):
+        ok, _reason = _validate_question(q, i)
+        if ok is not None:
+            ok.source = "cloze"
+            out.append(ok)
+    return out
+
+async def _cloze_questions(doc_id: str, n_questions: int) -> List[QuizQuestion]:
+    """Up to n cloze questions from the document's own text; [] if that fails."""
+    try:
+        return await asyncio.to_thread(_offline_questions, doc_id, n_questions)
+    except Exception as e:
+        print(f"[quiz] doc={doc_id} cloze failed: {e}")
+        return []
+
 def _fallback_quiz(context: str, doc_id: str, n_questions: int = 10) -> QuizSpec:
     import textwrap
 
@@ -153,6 +299,7 @@ def _fallback_quiz(context: str, doc_id: str, n_questions: int = 10) -> QuizSpec
             options=options,
             correct_option_ids=["A"],
             rationale="Based on the provided context.",
+            source="fallback",
         )
 
     return QuizSpec(
@@ -166,93 +313,195 @@ def _fallback_quiz(context: str, doc_id: str, n_questions: int = 10) -> QuizSpec
 # Main entry
 # -----------------------------
 
-def generate_quiz_from_doc(doc_id: str, n_questions: int = 10) -> QuizSpec:
-    # 1) Gather RAG context
+QUESTION_TOKENS = 220  # generation budget per question for repair calls
+
+REPAIR_PROMPT = """
+You are Siraj, writing {k} more quiz question(s) from the CONTEXT below.
+
+RULES:
+- Exactly {k} NEW questions; do not repeat or rephrase the existing ones.
+- Each question has EXACTLY 4 distinct options with IDs "A","B","C","D".
+- Checkbox style: 1 to 3 correct options per question.
+- Keep stems concise and grounded ONLY in CONTEXT.
+- Rationale: 1–2 sentences, grounded in CONTEXT.
+
+# EXISTING QUESTIONS
+{existing}
+
+# CONTEXT
+{context}
+""".strip()
+
+async def _generate_questions(llm, prompt: str, k: int, num_predict: int, repair: bool,
+                              priority: Optional[str] = None) -> List[QuizQuestion]:
+    """One schema-constrained call; returns its valid questions and books the stats."""
+    res = await llm.generate_full(
+        prompt,
+        temperature=0.2,
+        num_predict=num_predict,
+        timeout=LLM_QUIZ_TIMEOUT_S,
+        route="quiz",
+        priority=priority,
+        format=quiz_json_schema(k),
+    )
+    items, clean = _parse_questions(res.text)
+    valid: List[QuizQuestion] = []
+    for i, q in enumerate(items, start=1):
+        ok, _reason = _validate_question(q, i)
+        if ok is not None:
+            valid.append(ok)
+    used = min(len(valid), k)
+    wasted = res.eval_count if not items else round(res.eval_count * (1 - used / len(items)))
+    quiz_stats.add(
+        llm_calls=1,
+        parse_failures=0 if clean else 1,
+        questions_valid=len(valid),
+        questions_rejected=len(items) - len(valid),
+        repair_calls=1 if repair else 0,
+        questions_repaired=used if repair else 0,
+        tokens_generated=res.eval_count,
+        tokens_wasted=max(0, wasted),
+    )
+    return valid[:k]
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def _stem_tokens(stem: str) -> set:
+    return set(_WORD.findall(stem.lower()))
+
+def _dedupe_questions(questions: List[QuizQuestion], threshold: float = 0.8) -> List[QuizQuestion]:
+    """Drop questions whose stem shares >= threshold of its words (Jaccard) with an earlier one."""
+    kept: List[QuizQuestion] = []
+    seen: List[set] = []
+    for q in questions:
+        toks = _stem_tokens(q.stem)
+        if any(toks and len(toks & s) / len(toks | s) >= threshold for s in seen):
+            continue
+        kept.append(q)
+        seen.append(toks)
+    return kept
+
+def _shard_plan(n_questions: int, shard_size: int) -> List[int]:
+    """Questions per shard, as even as possible: 10 by 4 -> [4, 3, 3]."""
+    n_shards = -(-n_questions // shard_size)
+    base, extra = divmod(n_questions, n_shards)
+    return [base + (1 if i < extra else 0) for i in range(n_shards)]
+
+def _chunk_groups(chunks: List[str], n_groups: int) -> List[List[str]]:
+    """Deal ranked chunks round-robin so every group mixes strong and weaker hits."""
+    if len(chunks) < n_groups:
+        return [[chunks[i % len(chunks)]] for i in range(n_groups)]
+    return [chunks[i::n_groups] for i in range(n_groups)]
+
+async def _sharded_questions(llm, chunks: List[str], n_questions: int, shard_size: int,
+                             priority: Optional[str] = None) -> List[QuizQuestion]:
+    """Shards run concurrently; the LLM scheduler bounds how many reach Ollama at once."""
+    plan = _shard_plan(n_questions, shard_size)
+    groups = _chunk_groups(chunks, len(plan))
+    calls = []
+    for k, group in zip(plan, groups):
+        budget = k * QUESTION_TOKENS + 64
+        prompt = _prompt_for_quiz(group, k, llm.tokens, budget).text
+        calls.append(_generate_questions(llm, prompt, k, budget, repair=False, priority=priority))
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    merged = [q for r in results if isinstance(r, list) for q in r]
+    deduped = _dedupe_questions(merged)
+    quiz_stats.add(shards=len(plan), duplicates_dropped=len(merged) - len(deduped))
+    errors = [r for r in results if isinstance(r, Exception)]
+    if not merged and errors:
+        raise errors[0]
+    return deduped
+
+async def generate_quiz_from_doc(doc_id: str, n_questions: int = 10, shard_size: Optional[int] = None,
+                                 priority: Optional[str] = None, allow_fallback: bool = True) -> QuizSpec:
+    """
+    `shard_size` questions per parallel shard (default QUIZ_SHARD_SIZE);
+    0, or a quiz no larger than one shard, uses a single generation.
+    `priority` overrides the scheduler class; with allow_fallback=False an
+    incomplete quiz raises instead of being topped up (the quiz pool uses both).
+    """
+    shard_size = QUIZ_SHARD_SIZE if shard_size is None else shard_size
+    sharded = 0 < shard_size < n_questions
+
+    # 0) LLM queue saturated: serve a cloze quiz now rather than queueing behind it
+    if allow_fallback and get_scheduler().saturated():
+        cloze = await _cloze_questions(doc_id, n_questions)
+        if len(cloze) == n_questions:
+            quiz_stats.add(cloze_questions=n_questions, cloze_quizzes=1)
+            print(f"[quiz] doc={doc_id} scheduler saturated, served {n_questions} cloze questions")
+            return QuizSpec(quiz_id=str(uuid4()), doc_id=doc_id, questions=cloze)
+
+    # 1) Gather RAG context (one group of chunks per shard)
     db = get_vectordb()
+    k = max(8, len(_shard_plan(n_questions, shard_size)) * QUIZ_CHUNKS_PER_SHARD) if sharded else 8
 
     # Pull a diverse slate of chunks; widen if empty
-    hits = db.similarity_search_with_score(
-        f"overview of {doc_id}", k=8, filter={"doc_id": doc_id}
+    hits = await asimilarity_search_with_score(
+        db, f"overview of {doc_id}", k=k, filter={"doc_id": doc_id}
     )
     if not hits:
-        hits = db.similarity_search_with_score(doc_id, k=8, filter={"doc_id": doc_id})
+        hits = await asimilarity_search_with_score(db, doc_id, k=k, filter={"doc_id": doc_id})
 
-    context = "\n\n".join(
+    chunks = [
         f"[p.{int((d.metadata or {}).get('page', 0))}] {(d.page_content or '').strip()}"
         for d, _ in hits
-    )[:12000]  # safety cut
+    ]
+    context = "\n\n".join(chunks)
 
     if not context.strip():
+        if not allow_fallback:
+            raise RuntimeError(f"no chunks for {doc_id}")
         # No chunks? Keep the demo green.
         return _fallback_quiz(context, doc_id, n_questions)
 
-    # 2) Generate with more headroom (avoid truncation)
-    llm = OllamaGenerateClient(model=OLLAMA_LLM_MODEL, host=OLLAMA_BASE_URL)
-
-    prompt = _prompt_for_quiz(context, n_questions=n_questions)
-
-    # Try up to 2 attempts (2nd adds a stricter reminder)
-    attempts_errors: List[str] = []
-    for attempt in range(2):
-        try:
-            raw = llm.generate(
-                prompt if attempt == 0 else prompt + "\n\nReturn ONLY valid JSON (no prose).",
-                temperature=0.2,
-                num_predict=2048,  # bigger budget to avoid cutoffs
-            )
-
-            data = _extract_json_block(raw)
-
-            # 3) Normalize and coerce to our schema
-            questions: List[QuizQuestion] = []
-            for i, q in enumerate(data.get("questions", []), start=1):
-                qid = (q.get("id") or f"Q{i}").strip()
-                stem = (q.get("stem") or "").strip()
-
-                # Normalize options to A-D, pad if needed
-                raw_opts = q.get("options", [])[:4]
-                options: List[QuizOption] = []
-                for j in range(4):
-                    if j < len(raw_opts):
-                        oid = (raw_opts[j].get("id") or chr(65 + j)).strip() or chr(65 + j)
-                        otext = (raw_opts[j].get("text") or "").strip() or f"Option {chr(65 + j)}"
-                    else:
-                        oid = chr(65 + j)
-                        otext = f"(missing)"
-                    # Coerce IDs to A-D
-                    oid = chr(65 + j)
-                    options.append(QuizOption(id=oid, text=otext))
-
-                # Corrects: keep only A-D, at least one
-                correct = [c for c in (q.get("correct_option_ids") or []) if c in {"A","B","C","D"}]
-                if not correct:
-                    correct = ["A"]
-
-                rationale = (q.get("rationale") or "").strip() or "Based on the provided context."
-
-                questions.append(
-                    QuizQuestion(
-                        id=qid,
-                        stem=stem,
-                        options=options,
-                        correct_option_ids=correct,
-                        rationale=rationale,
-                    )
-                )
-
-            # Top up with fallback if the model returned < n_questions
-            if len(questions) < n_questions:
-                fb = _fallback_quiz(context, doc_id, n_questions)
-                questions.extend(fb.questions[len(questions):])
-
-            return QuizSpec(
-                quiz_id=str(uuid4()),
-                doc_id=doc_id,
-                questions=questions[:n_questions],
+    # 2) Structured generation: Ollama constrains the output to the schema
+    llm = get_async_llm()
+    quiz_stats.add(questions_requested=n_questions)
+
+    questions: List[QuizQuestion] = []
+    try:
+        if sharded:
+            questions = (await _sharded_questions(llm, chunks, n_questions, shard_size, priority))[:n_questions]
+        else:
+            packed = _prompt_for_quiz(chunks, n_questions, llm.tokens)
+            print(f"[quiz] doc={doc_id} prompt_tokens={packed.report()}")
+            questions = await _generate_questions(llm, packed.text, n_questions, QUIZ_NUM_PREDICT, repair=False,
+                                                  priority=priority)
+
+        # 3) Repair: only the missing/rejected questions are asked for again
+        missing = n_questions - len(questions)
+        if missing > 0:
+            repair = pack_prompt(
+                REPAIR_PROMPT.replace("{k}", str(missing)),
+                [
+                    Section("existing", [f"- {q.stem}" for q in questions] or ["(none)"], separator="\n"),
+                    Section("context", chunks),
+                ],
+                budget=prompt_budget(missing * QUESTION_TOKENS + 64),
+                estimator=llm.tokens,
             )
-
-        except Exception as e:
-            attempts_errors.append(str(e))
-
-    # 4) Last-resort fallback (keeps API responsive)
-    return _fallback_quiz(context, doc_id, n_questions)
+            extra = await _generate_questions(llm, repair.text, missing, missing * QUESTION_TOKENS + 64, repair=True,
+                                              priority=priority)
+            questions = _dedupe_questions(questions + extra)[:n_questions]
+    except Exception as e:
+        print(f"[quiz] doc={doc_id} generation failed, using fallback: {e}")
+
+    # 4) Top up only what is still missing: cloze questions, then placeholders as a last resort
+    if len(questions) < n_questions and not allow_fallback:
+        raise RuntimeError(f"only {len(questions)}/{n_questions} questions generated for {doc_id}")
+    if len(questions) < n_questions:
+        cloze = (await _cloze_questions(doc_id, n_questions))[:n_questions - len(questions)]
+        quiz_stats.add(cloze_questions=len(cloze))
+        questions.extend(cloze)
+    if len(questions) < n_questions:
+        fb = _fallback_quiz(context, doc_id, n_questions)
+        quiz_stats.add(fallback_questions=n_questions - len(questions))
+        questions.extend(fb.questions[len(questions):])
+
+    for i, q in enumerate(questions, start=1):
+        q.id = f"Q{i}"
+    return QuizSpec(
+        quiz_id=str(uuid4()),
+        doc_id=doc_id,
+        questions=questions[:n_questions],
+    )
@@ -0,0 +1,153 @@
+# server/services/quizpool.py
+"""
+Buffer of ready, unseen quizzes per recently used document.
+
+/quiz/generate takes a pooled quiz when one of the requested size is ready
+(and returns at once) and otherwise generates live; either way the document
+is marked as used and a background refill tops its buffer back up to
+QUIZ_POOL_SIZE. Refilled questions also go into the question bank, which
+is how a document served from the bank keeps getting new questions (with
+the pool off, grow_bank() does one background generation instead). Refills
+run at background scheduler priority and keep only complete quizzes (no
+placeholder fallback). Each project keeps buffers for at
+most QUIZ_POOL_DOCS documents, least recently used dropped first. Quizzes are
+removed from the buffer when served, so a pooled quiz is never shown twice;
+the pool is in memory and starts empty after a restart.
+"""
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from ..config import QUIZ_POOL_SIZE, QUIZ_POOL_DOCS
+from .projects import get_active_manifest
+from .question_bank import bank_quiz
+from .quizgen import QuizSpec, generate_quiz_from_doc
+from .scheduler import BACKGROUND
+
+Key = Tuple[str, int]  # (doc_id, n_questions)
+
+def _project_id() -> str:
+    active = get_active_manifest()
+    return active[1].id if active else "default"
+
+class QuizPool:
+    def __init__(self, size: int = QUIZ_POOL_SIZE, max_docs: int = QUIZ_POOL_DOCS):
+        self.size = size
+        self.max_docs = max_docs
+        # project -> LRU of (doc_id, n) -> ready quizzes
+        self._buffers: Dict[str, "OrderedDict[Key, Deque[QuizSpec]]"] = {}
+        self._refills: Dict[Tuple[str, Key], asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.c = {"hits": 0, "misses": 0, "generated": 0, "refill_failures": 0, "evicted": 0}
+
+    def _lru(self, project: str) -> "OrderedDict[Key, Deque[QuizSpec]]":
+        return self._buffers.setdefault(project, OrderedDict())
+
+    def take(self, doc_id: str, n_questions: int) -> Optional[QuizSpec]:
+        """A ready quiz (removed from the buffer), or None."""
+        if self.size <= 0:
+            return None
+        buf = self._lru(_project_id()).get((doc_id, n_questions))
+        if buf:
+            self.c["hits"] += 1
+            return buf.popleft()
+        self.c["misses"] += 1
+        return None
+
+    def note_use(self, doc_id: str, n_questions: int) -> None:
+        """Mark the document recently used and refill its buffer in the background."""
+        if self.size <= 0:
+            return
+        project = _project_id()
+        lru = self._lru(project)
+        key = (doc_id, n_questions)
+        lru.setdefault(key, deque())
+        lru.move_to_end(key)
+        while len(lru) > self.max_docs:
+            old, _ = lru.popitem(last=False)
+            self.c["evicted"] += 1
+            task = self._refills.pop((project, old), None)
+            if task:
+                task.cancel()
+        if (project, key) not in self._refills:
+            task = asyncio.get_running_loop().create_task(self._refill(project, key))
+            self._refills[(project, key)] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def grow_bank(self, doc_id: str, n_questions: int) -> None:
+        """With the pool off: one background generation that only feeds the question bank."""
+        if self.size > 0:
+            self.note_use(doc_id, n_questions)
+            return
+        project, key = _project_id(), (doc_id, n_questions)
+        if (project, key) not in self._refills:
+            task = asyncio.get_running_loop().create_task(self._refill(project, key, bank_only=True))
+            self._refills[(project, key)] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, project: str, key: Key, bank_only: bool = False) -> None:
+        doc_id, n = key
+        try:
+            while True:
+                buf = self._lru(project).get(key)
+                # stop if evicted, full, or the user switched projects meanwhile
+                if not bank_only and (buf is None or len(buf) >= self.size) or _project_id() != project:
+                    return
+                t0 = time.perf_counter()
+                try:
+                    spec = await generate_quiz_from_doc(doc_id, n, priority=BACKGROUND, allow_fallback=False)
+                except Exception as e:
+                    self.c["refill_failures"] += 1
+                    print(f"[quizpool] doc={doc_id} n={n} refill failed: {e}")
+                    return
+                spec = await bank_quiz(spec)
+                if bank_only:
+                    return
+                buf = self._lru(project).get(key)
+                if buf is None:
+                    return
+                if len(spec.questions) < n:
+                    # mostly duplicates of banked questions: the document is saturated for now
+                    print(f"[quizpool] doc={doc_id} n={n} refill came back short after dedupe; stopping")
+                    return
+                buf.append(spec)
+                self.c["generated"] += 1
+                print(f"[quizpool] doc={doc_id} n={n} buffered={len(buf)} in {time.perf_counter() - t0:.1f}s")
+        finally:
+            if self._refills.get((project, key)) is asyncio.current_task():
+                del self._refills[(project, key)]
+
+    def drop(self, doc_id: str) -> int:
+        """Forget every buffered quiz of a document (DELETE /documents/{doc_id})."""
+        dropped = 0
+        for lru in self._buffers.values():
+            for key in [k for k in lru if k[0] == doc_id]:
+                dropped += len(lru.pop(key))
+        for pk in [pk for pk in self._refills if pk[1][0] == doc_id]:
+            self._refills.pop(pk).cancel()
+        return dropped
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.c["hits"] + self.c["misses"]
+        return {
+            **self.c,
+            "hit_rate": round(self.c["hits"] / lookups, 3) if lookups else None,
+            "size": self.size,
+            "max_docs": self.max_docs,
+            "refilling": len(self._refills),
+            "buffered": {
+                project: {f"{d}:{n}": len(buf) for (d, n), buf in lru.items()}
+                for project, lru in self._buffers.items()
+            },
+        }
+
+quiz_pool = QuizPool()
@@ -0,0 +1,336 @@
+# server/services/reindex.py
+"""
+Rebuild a project's Chroma collection into a fresh collection, then switch the
+project manifest over to it.
+
+Reads keep hitting the old collection while the copy runs (the manifest still
+points at it). The final catch-up + manifest swap happens under
+INDEX_WRITE_LOCK, which writers (ingest) also hold, so nothing is lost between
+the last copied batch and the switch.
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .embedder import OllamaEmbedViaEmbedRoute, truncate_embeddings
+from .jobs import Job
+from .projects import ProjectManifest, write_manifest
+from .vectorstore import _get_client, hnsw_metadata, DEFAULT_COLLECTION
+from ..config import (
+    OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL,
+    EMBED_MIGRATION_BATCH, EMBED_MIGRATION_MAX_CHUNKS_PER_S,
+)
+
+# Held by anything that writes vectors into the active collection.
+INDEX_WRITE_LOCK = threading.RLock()
+
+# (documents, embeddings) -> new embeddings
+Transform = Callable[[List[str], np.ndarray], List[List[float]]]
+
+COPY_BATCH = 256
+
+STORE_DIR = Path(__file__).resolve().parents[1] / "store"
+
+def chroma_dir_for(project_dir: Path, manifest: ProjectManifest) -> str:
+    return str((project_dir / manifest.chroma_dir).resolve())
+
+def new_collection_name() -> str:
+    return f"{DEFAULT_COLLECTION}_{uuid.uuid4().hex[:8]}"
+
+def stored_dim(collection) -> Optional[int]:
+    """Dimensionality of vectors already in the collection (None if empty)."""
+    page = collection.get(limit=1, include=["embeddings"])
+    embs = page.get("embeddings")
+    if embs is None or len(embs) == 0:
+        return None
+    return len(embs[0])
+
+def infer_embed_model(project_dir: Path, manifest: ProjectManifest) -> Optional[str]:
+    """
+    Model to pin in a manifest that doesn't record one. An empty collection
+    takes the configured model; stored vectors only when their dimension
+    matches what that model produces. Otherwise None: unknown, the project
+    needs /index/embed-model before its vectors can be trusted.
+    """
+    col = _get_client(chroma_dir_for(project_dir, manifest)).get_or_create_collection(
+        manifest.collection_name or DEFAULT_COLLECTION
+    )
+    have = stored_dim(col)
+    if have is None:
+        return OLLAMA_EMBED_MODEL
+    try:
+        probe = len(OllamaEmbedViaEmbedRoute(model=OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL).embed_query("dimension probe"))
+    except Exception as e:
+        print(f"[index] could not probe {OLLAMA_EMBED_MODEL} ({e}); leaving embed_model unpinned")
+        return None
+    # Matryoshka-truncated collections store a prefix of the model's vectors
+    fits = probe == have if manifest.embed_dim is None else probe >= have == manifest.embed_dim
+    if not fits:
+        print(f"[index] stored vectors are {have}-d, {OLLAMA_EMBED_MODEL} gives {probe}-d; embed_model unknown")
+        return None
+    return OLLAMA_EMBED_MODEL
+
+def _copy_ids(src, dst, ids: List[str], transform: Optional[Transform]) -> int:
+    if not ids:
+        return 0
+    page = src.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    return _add_page(dst, page, transform)
+
+def _add_page(dst, page: Dict[str, Any], transform: Optional[Transform]) -> int:
+    ids = page["ids"]
+    if not ids:
+        return 0
+    embs = np.asarray(page["embeddings"], dtype=np.float32)
+    docs = page.get("documents") or [""] * len(ids)
+    new_embs = transform(docs, embs) if transform else embs.tolist()
+    dst.add(ids=ids, embeddings=new_embs, documents=docs, metadatas=page.get("metadatas"))
+    return len(ids)
+
+def copy_collection(
+    client,
+    src_name: str,
+    dst_name: str,
+    *,
+    transform: Optional[Transform] = None,
+    dst_metadata: Optional[Dict[str, Any]] = None,
+    batch_size: int = COPY_BATCH,
+    job: Optional[Job] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Copy every record of src into a brand-new dst collection in batches."""
+    src = client.get_collection(src_name)
+    try:
+        client.delete_collection(dst_name)  # leftover from an aborted run
+    except Exception:
+        pass
+    dst = client.create_collection(dst_name, metadata=dst_metadata or None)
+
+    total = src.count()
+    copied = 0
+    if job:
+        job.progress(0, total, f"copying {src_name} -> {dst_name}")
+    while True:
+        page = src.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=copied,
+        )
+        n = _add_page(dst, page, transform)
+        if n == 0:
+            break
+        copied += n
+        if job:
+            job.progress(copied, max(total, copied))
+        if on_batch:
+            on_batch(n)
+    return copied
+
+def _catch_up(src, dst, transform: Optional[Transform]) -> Dict[str, int]:
+    """Mirror writes/deletes that landed in src while the bulk copy ran."""
+    src_ids = set(src.get(include=[])["ids"])
+    dst_ids = set(dst.get(include=[])["ids"])
+    missing = sorted(src_ids - dst_ids)
+    stale = sorted(dst_ids - src_ids)
+    added = 0
+    for i in range(0, len(missing), COPY_BATCH):
+        added += _copy_ids(src, dst, missing[i:i + COPY_BATCH], transform)
+    for i in range(0, len(stale), COPY_BATCH):
+        dst.delete(ids=stale[i:i + COPY_BATCH])
+    return {"caught_up": added, "dropped": len(stale)}
+
+def rebuild_index(
+    project_dir: Path,
+    manifest: ProjectManifest,
+    job: Optional[Job] = None,
+    *,
+    transform: Optional[Transform] = None,
+    dst_metadata: Optional[Dict[str, Any]] = None,
+    manifest_changes: Optional[Dict[str, Any]] = None,
+    batch_size: int = COPY_BATCH,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Copy the project's collection into a new one (optionally transforming
+    vectors), switch the manifest to it atomically, then drop the old one.
+    The new collection keeps the project's HNSW settings unless
+    dst_metadata overrides them.
+    """
+    from ..deps import reset_vectordb_cache
+
+    if dst_metadata is None:
+        dst_metadata = hnsw_metadata(manifest.hnsw)
+
+    client = _get_client(chroma_dir_for(project_dir, manifest))
+    old_name = manifest.collection_name or DEFAULT_COLLECTION
+    new_name = new_collection_name()
+
+    copied = copy_collection(
+        client, old_name, new_name,
+        transform=transform, dst_metadata=dst_metadata,
+        batch_size=batch_size, job=job, on_batch=on_batch,
+    )
+
+    with INDEX_WRITE_LOCK:
+        if job:
+            job.progress(job.done, message="switching collection")
+        sync = _catch_up(client.get_collection(old_name), client.get_collection(new_name), transform)
+        manifest.collection_name = new_name
+        for k, v in (manifest_changes or {}).items():
+            setattr(manifest, k, v)
+        write_manifest(project_dir, manifest)
+        reset_vectordb_cache()
+
+    try:
+        client.delete_collection(old_name)
+    except Exception:
+        pass
+
+    return {"collection": new_name, "previous_collection": old_name, "copied": copied, **sync}
+
+# ---------- Matryoshka dimension migration ----------
+
+def migrate_embed_dim(project_dir: Path, manifest: ProjectManifest, dim: Optional[int], job: Optional[Job] = None) -> Dict[str, Any]:
+    """
+    Re-index the project at `dim` dimensions (None = full model size).
+    Shrinking only truncates + re-normalizes stored vectors (no Ollama calls);
+    growing past what is stored has to re-embed the chunk texts.
+    """
+    client = _get_client(chroma_dir_for(project_dir, manifest))
+    current = stored_dim(client.get_or_create_collection(manifest.collection_name or DEFAULT_COLLECTION))
+
+    if manifest.embed_dim is not None and (dim is None or dim > manifest.embed_dim):
+        model = manifest.embed_model or OLLAMA_EMBED_MODEL
+        embedder = OllamaEmbedViaEmbedRoute(model=model, base_url=OLLAMA_BASE_URL, dim=dim)
+
+        def transform(docs, _embs):
+            return embedder.embed_documents(list(docs))
+        mode = "re-embed"
+    else:
+        def transform(_docs, embs):
+            return truncate_embeddings(embs, dim)
+        mode = "truncate"
+
+    out = rebuild_index(project_dir, manifest, job, transform=transform, manifest_changes={"embed_dim": dim})
+    return {**out, "mode": mode, "from_dim": current, "to_dim": dim}
+
+# ---------- Embedding model migration ----------
+
+class _Throttle:
+    """Keeps a single-threaded loop under `rate` items per second."""
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.t0 = time.monotonic()
+        self.n = 0
+
+    def wait(self, n: int) -> None:
+        self.n += n
+        if self.rate <= 0:
+            return
+        ahead = self.n / self.rate - (time.monotonic() - self.t0)
+        if ahead > 0:
+            time.sleep(ahead)
+
+def migrate_embed_model(
+    project_dir: Path,
+    manifest: ProjectManifest,
+    model: str,
+    job: Optional[Job] = None,
+    *,
+    dim: Optional[int] = None,
+    batch_size: int = EMBED_MIGRATION_BATCH,
+    max_chunks_per_s: float = EMBED_MIGRATION_MAX_CHUNKS_PER_S,
+) -> Dict[str, Any]:
+    """
+    Re-embed every chunk with `model` into a new collection. Queries keep
+    using the old model + collection until the copy is done; the manifest then
+    switches both at once. Ollama sees one batch at a time, capped at
+    max_chunks_per_s, so interactive traffic keeps its share.
+    """
+    _get_client(chroma_dir_for(project_dir, manifest)).get_or_create_collection(
+        manifest.collection_name or DEFAULT_COLLECTION
+    )
+    embedder = OllamaEmbedViaEmbedRoute(model=model, base_url=OLLAMA_BASE_URL, dim=dim)
+    throttle = _Throttle(max_chunks_per_s)
+
+    def transform(docs, _embs):
+        throttle.wait(len(docs))
+        return embedder.embed_documents(list(docs))
+
+    previous = manifest.embed_model or "unknown"
+    out = rebuild_index(
+        project_dir, manifest, job,
+        transform=transform,
+        batch_size=batch_size,
+        manifest_changes={"embed_model": model, "embed_dim": dim},
+    )
+    return {**out, "from_model": previous, "to_model": model, "embed_dim": dim}
+
+# ---------- HNSW parameters ----------
+
+def migrate_hnsw(project_dir: Path, manifest: ProjectManifest, params: Dict[str, Any], job: Optional[Job] = None) -> Dict[str, Any]:
+    """Rebuild the project's HNSW graph with new parameters (vectors are reused as-is)."""
+    _get_client(chroma_dir_for(project_dir, manifest)).get_or_create_collection(
+        manifest.collection_name or DEFAULT_COLLECTION
+    )
+    out = rebuild_index(
+        project_dir, manifest, job,
+        dst_metadata=hnsw_metadata(params),
+        manifest_changes={"hnsw": params},
+    )
+    return {**out, "hnsw": params}
+
+# ---------- Compaction ----------
+
+def _dir_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.exists() else 0
+
+def _sqlite_files(project_dir: Path, manifest: ProjectManifest) -> List[Path]:
+    files = [p for pat in ("*.db", "*.sqlite3") for p in STORE_DIR.glob(pat)]
+    files.append(project_dir / manifest.sqlite_path)
+    files.append(Path(chroma_dir_for(project_dir, manifest)) / "chroma.sqlite3")
+    return [p for p in files if p.is_file()]
+
+def vacuum_sqlite(path: Path) -> None:
+    con = sqlite3.connect(path, timeout=30)
+    try:
+        con.execute("VACUUM")
+    finally:
+        con.close()
+
+def compact_project(project_dir: Path, manifest: ProjectManifest, job: Optional[Job] = None) -> Dict[str, Any]:
+    """
+    Rebuild the project's collection (HNSW segments never shrink after
+    deletes) and VACUUM the SQLite databases. Reports the bytes reclaimed.
+    """
+    chroma = Path(chroma_dir_for(project_dir, manifest))
+    dbs = _sqlite_files(project_dir, manifest)
+    before = _dir_bytes(chroma) + sum(_dir_bytes(p) for p in dbs if not p.is_relative_to(chroma))
+
+    _get_client(str(chroma)).get_or_create_collection(manifest.collection_name or DEFAULT_COLLECTION)
+    out = rebuild_index(project_dir, manifest, job)
+
+    vacuumed, errors = [], {}
+    for p in dbs:
+        try:
+            vacuum_sqlite(p)
+            vacuumed.append(str(p))
+        except Exception as e:
+            errors[str(p)] = str(e)
+
+    after = _dir_bytes(chroma) + sum(_dir_bytes(p) for p in dbs if not p.is_relative_to(chroma))
+    return {
+        **out,
+        "bytes_before": before,
+        "bytes_after": after,
+        "bytes_reclaimed": max(0, before - after),
+        "vacuumed": vacuumed,
+        "vacuum_errors": errors,
+    }
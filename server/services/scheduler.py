@@ -0,0 +1,198 @@
+# server/services/scheduler.py
+"""
+Priority scheduler in front of the local Ollama.
+
+Every async generate call takes a slot here first. At most
+LLM_MAX_INFLIGHT calls run at once; the rest wait in one queue per priority
+class (interactive > batch > background). Within a class, waiters are served
+round-robin per project so one project's 18-way summary fan-out cannot starve
+another's. LLM_INTERACTIVE_RESERVED slots are only usable by interactive
+calls, so chat always has a lane even while batch work saturates the rest.
+
+A class whose queue is full (LLM_QUEUE_LIMITS) rejects new work with a 503
+instead of growing latency without bound. Lives on the server's event loop.
+"""
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..config import LLM_MAX_INFLIGHT, LLM_INTERACTIVE_RESERVED, LLM_QUEUE_LIMITS
+
+INTERACTIVE, BATCH, BACKGROUND = "interactive", "batch", "background"
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)   # highest first
+
+# default class per calling route (see the `route=` label on generate())
+ROUTE_PRIORITY = {
+    "chat": INTERACTIVE,
+    "summarize": BATCH,
+    "quiz": BATCH,
+    "suggest": BATCH,
+    "brainrot": BATCH,
+}
+
+_WAIT_SAMPLES = 512  # recent wait times kept per class for percentiles
+
+def priority_for(route: Optional[str], priority: Optional[str] = None) -> str:
+    if priority is not None:
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority!r}")
+        return priority
+    return ROUTE_PRIORITY.get(route or "", BATCH)
+
+def _default_project() -> str:
+    from .projects import get_active_manifest
+    active = get_active_manifest()
+    return active[1].id if active else "default"
+
+def _pct(values, p: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))], 1)
+
+class _Waiter:
+    __slots__ = ("future", "enqueued")
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+class LLMScheduler:
+    def __init__(self, max_inflight: int, interactive_reserved: int, queue_limits: Dict[str, int]):
+        self.max_inflight = max(1, max_inflight)
+        self.reserved = min(max(0, interactive_reserved), self.max_inflight - 1)
+        self.queue_limits = {p: queue_limits.get(p, 64) for p in PRIORITIES}
+        self.inflight: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        # class -> project -> FIFO of waiters; OrderedDict order is the round-robin
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._depth: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._waits: Dict[str, Deque[float]] = {p: deque(maxlen=_WAIT_SAMPLES) for p in PRIORITIES}
+        self._stats: Dict[str, Dict[str, int]] = {p: {"admitted": 0, "rejected": 0, "cancelled": 0} for p in PRIORITIES}
+
+    # ---------- admission ----------
+    def _total_inflight(self) -> int:
+        return sum(self.inflight.values())
+
+    def _can_run(self, priority: str) -> bool:
+        limit = self.max_inflight if priority == INTERACTIVE else self.max_inflight - self.reserved
+        return self._total_inflight() < limit
+
+    def _higher_waiting(self, priority: str) -> bool:
+        """True if someone of this class or above is already queued (no barging)."""
+        for p in PRIORITIES:
+            if self._depth[p]:
+                return True
+            if p == priority:
+                return False
+        return False
+
+    def _admit(self, priority: str, waited_ms: float) -> None:
+        self.inflight[priority] += 1
+        self._stats[priority]["admitted"] += 1
+        self._waits[priority].append(waited_ms)
+
+    def _pop_next(self, priority: str) -> Optional[_Waiter]:
+        q = self._queues[priority]
+        while q:
+            project, waiters = next(iter(q.items()))
+            w = waiters.popleft()
+            self._depth[priority] -= 1
+            del q[project]
+            if waiters:
+                q[project] = waiters  # back of the round-robin
+            if not w.future.done():
+                return w
+        return None
+
+    def _dispatch(self) -> None:
+        for p in PRIORITIES:
+            while self._depth[p] and self._can_run(p):
+                w = self._pop_next(p)
+                if w is None:
+                    break
+                self._admit(p, (time.perf_counter() - w.enqueued) * 1000.0)
+                w.future.set_result(None)
+
+    async def acquire(self, priority: str, project: Optional[str] = None) -> None:
+        if self._can_run(priority) and not self._higher_waiting(priority):
+            self._admit(priority, 0.0)
+            return
+        if self._depth[priority] >= self.queue_limits[priority]:
+            self._stats[priority]["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"LLM queue full for {priority} requests, retry shortly",
+                headers={"Retry-After": "5"},
+            )
+        w = _Waiter(asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(project or _default_project(), deque()).append(w)
+        self._depth[priority] += 1
+        try:
+            await w.future
+        except asyncio.CancelledError:
+            if w.future.done() and not w.future.cancelled():
+                # admitted just as we were cancelled: hand the slot on
+                self.release(priority)
+            else:
+                self._drop(priority, w)
+            self._stats[priority]["cancelled"] += 1
+            raise
+
+    def _drop(self, priority: str, w: _Waiter) -> None:
+        for project, waiters in list(self._queues[priority].items()):
+            if w in waiters:
+                waiters.remove(w)
+                self._depth[priority] -= 1
+                if not waiters:
+                    del self._queues[priority][project]
+                return
+
+    def release(self, priority: str) -> None:
+        self.inflight[priority] = max(0, self.inflight[priority] - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, project: Optional[str] = None):
+        await self.acquire(priority, project)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    # ---------- introspection ----------
+    def saturated(self, priority: str = BATCH) -> bool:
+        """No free slot for `priority` and work already queued for it."""
+        return not self._can_run(priority) and self._depth[priority] > 0
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for p in PRIORITIES:
+            waits = list(self._waits[p])
+            classes[p] = {
+                "inflight": self.inflight[p],
+                "queued": self._depth[p],
+                "queue_limit": self.queue_limits[p],
+                "queued_by_project": {k: len(v) for k, v in self._queues[p].items()},
+                **self._stats[p],
+                "wait_ms_p50": _pct(waits, 50),
+                "wait_ms_p95": _pct(waits, 95),
+                "wait_ms_max": round(max(waits), 1) if waits else None,
+            }
+        return {
+            "max_inflight": self.max_inflight,
+            "interactive_reserved": self.reserved,
+            "inflight": self._total_inflight(),
+            "classes": classes,
+        }
+
+_scheduler: Optional[LLMScheduler] = None
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(LLM_MAX_INFLIGHT, LLM_INTERACTIVE_RESERVED, LLM_QUEUE_LIMITS)
+    return _scheduler
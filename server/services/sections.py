@@ -0,0 +1,116 @@
+# server/services/sections.py
+"""
+Section (chapter / page-window) summaries, precomputed after ingest.
+
+Sections come from the PDF's top-level outline; without one the document is
+cut into SECTION_WINDOW_PAGES-page windows. Each section goes through the
+hierarchical summarizer at background priority, so it only uses LLM slots
+that chat and batch work leave free, and lands in section_summaries, from
+where /summarize answers chapter and page-range requests instantly.
+Opt-in (SECTION_SUMMARIES=1): it costs an LLM pass over every new document.
+"""
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import SECTION_WINDOW_PAGES
+from ..deps import get_vectordb
+from .chunking import extract_outline
+from .jobs import Job, submit_async
+from .scheduler import BACKGROUND
+from .summarizer import PROMPT_VERSION, is_complete, summarize_document
+from .summary_store import doc_content_hash, get_section_summaries, put_section_summary
+
+@dataclass
+class SectionSpec:
+    title: str
+    start_page: int
+    end_page: int
+
+def page_label(start: int, end: int) -> str:
+    return f"Page {start}" if start == end else f"Pages {start}–{end}"
+
+def plan_sections(outline: List[Tuple[str, int]], total_pages: int,
+                  window: int = SECTION_WINDOW_PAGES) -> List[SectionSpec]:
+    """Outline entries -> contiguous sections covering every page; page windows without an outline."""
+    starts: Dict[int, str] = {}
+    for title, page in outline:
+        if 1 <= page <= total_pages:
+            starts.setdefault(page, title)
+    if len(starts) < 2:
+        step = max(1, window)
+        return [
+            SectionSpec(page_label(p, min(p + step - 1, total_pages)), p, min(p + step - 1, total_pages))
+            for p in range(1, total_pages + 1, step)
+        ]
+    if 1 not in starts:
+        starts[1] = "Front matter"
+    pages = sorted(starts)
+    ends = [p - 1 for p in pages[1:]] + [total_pages]
+    return [
+        SectionSpec(starts[p] or page_label(p, e), p, e)
+        for p, e in zip(pages, ends)
+    ]
+
+def detect_sections(path: str, total_pages: int) -> List[SectionSpec]:
+    try:
+        outline = extract_outline(path)
+    except Exception as e:
+        print(f"[sections] outline unreadable ({e}); using page windows")
+        outline = []
+    return plan_sections(outline, total_pages)
+
+def tile_range(stored: List[Dict[str, Any]], start: int, end: int) -> Optional[List[Dict[str, Any]]]:
+    """Stored sections that exactly cover [start, end] back to back, or None."""
+    inside = [s for s in stored if start <= s["start_page"] and s["end_page"] <= end]
+    out: List[Dict[str, Any]] = []
+    cur = start
+    while cur <= end:
+        nxt = [s for s in inside if s["start_page"] == cur]
+        if not nxt:
+            return None
+        best = max(nxt, key=lambda s: s["end_page"])
+        out.append(best)
+        cur = best["end_page"] + 1
+    return out
+
+async def summarize_sections(llm, doc_id: str, sections: List[SectionSpec], job: Job) -> Dict[str, Any]:
+    # the active collection is resolved per step: an index rebuild may swap it mid-job
+    content_hash = await asyncio.to_thread(doc_content_hash, get_vectordb()._collection, doc_id)
+    if not content_hash:
+        return {"sections": 0, "stored": 0}
+    existing = await asyncio.to_thread(get_section_summaries, doc_id, content_hash, llm.model, PROMPT_VERSION)
+    done = {(s["start_page"], s["end_page"]) for s in existing}
+    stored = failed = 0
+    job.progress(0, len(sections), "summarizing sections")
+    for i, sec in enumerate(sections):
+        if (sec.start_page, sec.end_page) not in done:
+            try:
+                final = await summarize_document(
+                    llm, get_vectordb()._collection, doc_id,
+                    pages=(sec.start_page, sec.end_page), priority=BACKGROUND, deadline_s=0,
+                )
+                if is_complete(final):  # no coverage: no text on these pages
+                    await asyncio.to_thread(
+                        put_section_summary, doc_id, content_hash, llm.model, PROMPT_VERSION,
+                        sec.title, sec.start_page, sec.end_page,
+                        {"bullets": final["bullets"], "stats": final["stats"]},
+                    )
+                    stored += 1
+            except Exception as e:
+                failed += 1
+                print(f"[sections] doc={doc_id} {sec.title!r} failed: {e}")
+        job.progress(i + 1, message=sec.title)
+    print(f"[sections] doc={doc_id} sections={len(sections)} stored={stored} failed={failed}")
+    return {"sections": len(sections), "stored": stored, "failed": failed}
+
+def start_section_summaries(llm, doc_id: str, path: str, total_pages: int,
+                            project_id: Optional[str] = None) -> Job:
+    """Queue the background job (call from a request handler, on the event loop)."""
+    sections = detect_sections(path, total_pages)
+    return submit_async(
+        "section-summaries",
+        lambda job: summarize_sections(llm, doc_id, sections, job),
+        project_id=project_id,
+    )
@@ -0,0 +1,73 @@
+# server/services/singleflight.py
+"""
+Request coalescing for expensive LLM-backed operations.
+
+`await flights.do(op, inputs, fn)` runs `fn()` once per (op, normalized
+inputs) at a time: callers arriving while it is in flight wait for the same
+result (or exception) instead of starting a duplicate pipeline. The work runs
+in its own task, so one caller disconnecting does not cancel it for the
+others; it is cancelled only when every waiter has gone.
+"""
+from __future__ import annotations
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def _normalize(inputs: Any) -> str:
+    def norm(v):
+        if isinstance(v, str):
+            return v.strip()
+        if isinstance(v, dict):
+            return {k: norm(x) for k, x in v.items() if x is not None}
+        if isinstance(v, (list, tuple)):
+            return [norm(x) for x in v]
+        return v
+    return json.dumps(norm(inputs), sort_keys=True, ensure_ascii=False, default=str)
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, op: str, field: str) -> None:
+        s = self._stats.setdefault(op, {"calls": 0, "executed": 0, "coalesced": 0})
+        s[field] += 1
+
+    async def do(self, op: str, inputs: Any, fn: Callable[[], Awaitable[T]]) -> T:
+        key = (op, _normalize(inputs))
+        self._count(op, "calls")
+        flight = self._flights.get(key)
+        if flight is None:
+            self._count(op, "executed")
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _t, key=key: self._flights.pop(key, None))
+        else:
+            self._count(op, "coalesced")
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()  # last interested caller left
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight: Dict[str, int] = {}
+        for op, _ in self._flights:
+            in_flight[op] = in_flight.get(op, 0) + 1
+        return {
+            op: {**s, "in_flight": in_flight.get(op, 0)}
+            for op, s in self._stats.items()
+        }
+
+flights = SingleFlight()
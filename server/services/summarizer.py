@@ -0,0 +1,326 @@
+# server/services/summarizer.py
+"""
+Whole-document hierarchical summarization.
+
+The document's chunks are read in document order (page, chunk_index), not
+picked by similarity to a seed query, so a summary covers the whole book:
+
+  1. select   at most SUMMARIZE_TOPK chunks (0 = all), sampled evenly
+              across the document when there are more;
+  2. map      consecutive chunks are grouped into windows of up to
+              SUMMARIZE_MAP_WINDOW_TOKENS, at most SUMMARIZE_MAX_MAP_CHUNKS
+              windows (0 = unlimited, sampled evenly beyond the cap), and each
+              window becomes 2-3 bullets, SUMMARIZE_CONCURRENCY at a time;
+  3. reduce   bullets are merged in a tree: each level packs as many
+              consecutive inputs per call as the context window holds, until
+              one call produces the final 3-5 bullets.
+
+summarize_events() yields a progress event per finished call and per level
+and a final event with the bullets and per-level stats (calls, failures,
+prompt/eval tokens, seconds).
+
+SUMMARIZE_DEADLINE_S bounds the whole run: map calls still queued or
+running when MAP_SHARE of it has elapsed are cancelled (which closes their
+Ollama requests), merge levels past the deadline are skipped, and the final
+reduce runs on whatever finished. `coverage` in the final event says how
+much of the document that was.
+"""
+from __future__ import annotations
+import asyncio
+import math
+import time
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..config import (
+    SUMMARIZE_TOPK, SUMMARIZE_MAX_MAP_CHUNKS,
+    SUMMARIZE_MAP_WINDOW_TOKENS, SUMMARIZE_CONCURRENCY, SUMMARIZE_DEADLINE_S,
+)
+from .prompt_packer import Section, TokenEstimator, pack_prompt, prompt_budget
+
+# part of the stored-summary key (services/summary_store.py): bump whenever the
+# prompts or this pipeline change so older summaries are regenerated
+PROMPT_VERSION = "2"
+
+MAP_NUM_PREDICT = 220
+REDUCE_NUM_PREDICT = 320
+FINAL_NUM_PREDICT = 260
+MAP_SHARE = 0.75  # of the deadline given to the map; the rest is kept for reducing
+
+MAP_PROMPT = """You are a teaching assistant. Read the excerpt and produce 2-3 tight bullets capturing the *essential* facts. No fluff, no repetition.
+Excerpt:
+---
+{chunk}
+---
+Bullets:"""
+
+# intermediate tree levels: keep more detail and the document's order
+MERGE_PROMPT = """The following bullets summarize consecutive parts of one document, in order. Merge them into 4-6 bullets that keep the essential facts in the same order. Merge duplicates, no fluff.
+Bullets:
+---
+{points}
+---
+Merged bullets:"""
+
+REDUCE_PROMPT = """Combine the following mini-bullets into a single concise summary with 3-5 bullets total. Merge duplicates, keep it high-level and factual.
+Mini-bullets:
+---
+{points}
+---
+Final 3-5 bullets:"""
+
+@dataclass
+class LevelStats:
+    level: int
+    kind: str                 # "map" | "reduce"
+    calls: int = 0
+    done: int = 0
+    failed: int = 0
+    cancelled: int = 0        # still pending at the deadline
+    prompt_tokens: int = 0
+    eval_tokens: int = 0
+    seconds: float = 0.0
+
+def load_doc_chunks(col, doc_id: str, pages: Optional[Tuple[int, int]] = None) -> List[str]:
+    """Every chunk text of a document (or of an inclusive 1-based page range), in document order."""
+    where: Dict[str, Any] = {"doc_id": doc_id}
+    if pages:
+        where = {"$and": [{"doc_id": doc_id}, {"page": {"$gte": pages[0]}}, {"page": {"$lte": pages[1]}}]}
+    res = col.get(where=where, include=["documents", "metadatas"])
+    rows = [
+        ((m or {}).get("page", 0), (m or {}).get("chunk_index", 0), t)
+        for m, t in zip(res.get("metadatas") or [], res.get("documents") or [])
+        if t and t.strip()
+    ]
+    return [t for _, _, t in sorted(rows, key=lambda r: (r[0], r[1]))]
+
+def sample_evenly(items: List[Any], limit: int) -> List[Any]:
+    """`limit` items spread over the whole list, in order (0 = all)."""
+    n = len(items)
+    if not limit or n <= limit:
+        return list(items)
+    if limit == 1:
+        return [items[n // 2]]
+    return [items[round(i * (n - 1) / (limit - 1))] for i in range(limit)]
+
+def spread_order(n: int) -> List[int]:
+    """0..n-1 in bit-reversed order, so any prefix is spread over the whole range (8 -> 0 4 2 6 1 5 3 7)."""
+    bits = max(1, (n - 1).bit_length())
+    order = (int(format(i, f"0{bits}b")[::-1], 2) for i in range(1 << bits))
+    return [i for i in order if i < n]
+
+def map_windows(chunks: List[str], max_windows: int, window_tokens: int, est: TokenEstimator) -> List[List[str]]:
+    """Group consecutive chunks so the map fits `max_windows` calls where the window budget allows."""
+    per_window = math.ceil(len(chunks) / max_windows) if max_windows else len(chunks)
+    windows: List[List[str]] = []
+    cur: List[str] = []
+    cur_tokens = 0
+    for c in chunks:
+        t = est.count(c)
+        if cur and (len(cur) >= per_window or cur_tokens + t > window_tokens):
+            windows.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(c)
+        cur_tokens += t
+    if cur:
+        windows.append(cur)
+    return sample_evenly(windows, max_windows)
+
+def fan_in_groups(items: List[str], budget: int, est: TokenEstimator, template: str) -> List[List[str]]:
+    """Split consecutive items into groups whose packed reduce prompt fits `budget`."""
+    room = budget - est.count(template.format(points=""))
+    groups: List[List[str]] = []
+    cur: List[str] = []
+    used = 0
+    for it in items:
+        t = est.count(it) + 1
+        if cur and used + t > room:
+            groups.append(cur)
+            cur, used = [], 0
+        cur.append(it)
+        used += t
+    if cur:
+        groups.append(cur)
+    # a lone leftover would be "merged" on its own; fold it into its neighbour
+    if len(groups) > 1 and len(groups[-1]) == 1:
+        groups[-2].extend(groups.pop())
+    return groups
+
+def parse_bullets(text: str, limit: Optional[int] = None) -> List[str]:
+    bullets = [b.strip("-•* ").strip() for b in text.split("\n") if b.strip()]
+    bullets = [b for b in bullets if b]
+    return bullets[:limit] if limit else bullets
+
+async def summarize_events(
+    llm,
+    col,
+    doc_id: str,
+    topk: int = SUMMARIZE_TOPK,
+    max_map: int = SUMMARIZE_MAX_MAP_CHUNKS,
+    concurrency: int = SUMMARIZE_CONCURRENCY,
+    deadline_s: float = SUMMARIZE_DEADLINE_S,
+    pages: Optional[Tuple[int, int]] = None,
+    priority: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async generator of progress events, ending with {"event": "final", ...}.
+    Closing it early (client gone) cancels every call still running.
+    `pages` restricts it to a page range; `priority` is the scheduler class.
+    """
+    t_start = time.perf_counter()
+    deadline = t_start + deadline_s if deadline_s > 0 else None
+    map_deadline = t_start + deadline_s * MAP_SHARE if deadline else None
+    chunks = await asyncio.to_thread(load_doc_chunks, col, doc_id, pages)
+    if not chunks:
+        yield {"event": "final", "bullets": ["No content found."], "coverage": None, "stats": {"chunks_total": 0}}
+        return
+
+    est = llm.tokens
+    selected = sample_evenly(chunks, topk)
+    windows = map_windows(selected, max_map, SUMMARIZE_MAP_WINDOW_TOKENS, est)
+    yield {
+        "event": "start",
+        "chunks_total": len(chunks),
+        "chunks_used": len(selected),
+        "map_calls": len(windows),
+    }
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    levels: List[LevelStats] = []
+
+    async def call(prompt: str, num_predict: int, st: LevelStats) -> str:
+        async with sem:  # bounded here too, so a large book can't flood the scheduler queue
+            res = await llm.generate_full(prompt, 0.2, num_predict, route="summarize", priority=priority)
+        st.prompt_tokens += res.prompt_eval_count
+        st.eval_tokens += res.eval_count
+        return res.text
+
+    async def run_level(
+        st: LevelStats, prompts: List[str], num_predict: int, until: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Yield (index, text | exception) as calls finish; cancel the rest at `until` or if closed early."""
+        t0 = time.perf_counter()
+        st.calls = len(prompts)
+        # dispatch in spread order (the semaphore is FIFO): a deadline cut then leaves gaps across the
+        # whole document instead of dropping its end; results keep their original index
+        tasks = {asyncio.ensure_future(call(prompts[i], num_predict, st)): i for i in spread_order(len(prompts))}
+        pending = set(tasks)
+        try:
+            while pending:
+                timeout = None if until is None else until - time.perf_counter()
+                if timeout is not None and timeout <= 0:
+                    break
+                finished, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for t in finished:
+                    err = t.exception()
+                    if err is None:
+                        st.done += 1
+                    else:
+                        st.failed += 1
+                    yield tasks[t], (t.result() if err is None else err)
+        finally:
+            for t in pending:
+                t.cancel()
+            if until is not None and time.perf_counter() >= until:
+                st.cancelled = len(pending)
+            st.seconds = round(time.perf_counter() - t0, 2)
+
+    # ---- map ----
+    map_st = LevelStats(level=0, kind="map")
+    levels.append(map_st)
+    map_prompts = [
+        pack_prompt(MAP_PROMPT, [Section("chunk", w)], prompt_budget(MAP_NUM_PREDICT), est).text
+        for w in windows
+    ]
+    mapped: Dict[int, str] = {}
+    first_error: Optional[BaseException] = None
+    async with aclosing(run_level(map_st, map_prompts, MAP_NUM_PREDICT, map_deadline)) as results:
+        async for i, out in results:
+            if isinstance(out, BaseException):
+                first_error = first_error or out
+                continue
+            mapped[i] = out
+            yield {"event": "map", "index": i, "bullets": parse_bullets(out), "done": map_st.done, "total": map_st.calls}
+    yield {"event": "level", **asdict(map_st)}
+    if not mapped:
+        if first_error is None:
+            raise HTTPException(status_code=504, detail="Summary deadline passed before any part was summarized")
+        raise first_error
+    covered = sum(len(windows[i]) for i in mapped)
+    coverage = {
+        "map_calls_done": len(mapped),
+        "map_calls_total": len(windows),
+        "chunks_covered": covered,
+        "chunks_total": len(chunks),
+        "fraction": round(covered / len(chunks), 3),
+        "timed_out": map_st.cancelled > 0,
+    }
+
+    # ---- tree reduce ----
+    items = [mapped[i] for i in sorted(mapped)]
+    reduce_budget = prompt_budget(max(REDUCE_NUM_PREDICT, FINAL_NUM_PREDICT))
+    while True:
+        groups = fan_in_groups(items, reduce_budget, est, REDUCE_PROMPT)
+        # no grouping possible (oversized inputs) or out of time: the final call packs what fits
+        out_of_time = deadline is not None and time.perf_counter() >= deadline
+        final = len(groups) == 1 or len(groups) >= len(items) or out_of_time
+        if final:
+            groups = [items]
+        st = LevelStats(level=len(levels), kind="reduce")
+        levels.append(st)
+        template, num_predict = (REDUCE_PROMPT, FINAL_NUM_PREDICT) if final else (MERGE_PROMPT, REDUCE_NUM_PREDICT)
+        prompts = [
+            pack_prompt(template, [Section("points", g, separator="\n")], reduce_budget, est).text
+            for g in groups
+        ]
+        merged: Dict[int, str] = {}
+        async with aclosing(run_level(st, prompts, num_predict, None if final else deadline)) as results:
+            async for i, out in results:
+                if isinstance(out, BaseException):
+                    if final:
+                        raise out
+                    merged[i] = "\n".join(groups[i])  # carry the inputs up rather than lose that part
+                else:
+                    merged[i] = out
+        for i in range(len(groups)):
+            merged.setdefault(i, "\n".join(groups[i]))  # cancelled at the deadline
+        yield {"event": "level", **asdict(st)}
+        items = [merged[i] for i in sorted(merged)]
+        if final:
+            break
+
+    stats = {
+        "chunks_total": len(chunks),
+        "chunks_used": len(selected),
+        "llm_calls": sum(lvl.calls for lvl in levels),
+        "failed_calls": sum(lvl.failed for lvl in levels),
+        "cancelled_calls": sum(lvl.cancelled for lvl in levels),
+        "prompt_tokens": sum(lvl.prompt_tokens for lvl in levels),
+        "eval_tokens": sum(lvl.eval_tokens for lvl in levels),
+        "seconds": round(time.perf_counter() - t_start, 2),
+        "levels": [asdict(lvl) for lvl in levels],
+    }
+    yield {"event": "final", "bullets": parse_bullets(items[0], 5), "coverage": coverage, "stats": stats}
+
+def is_complete(result: Dict[str, Any]) -> bool:
+    """True when every map and reduce call of a run succeeded, i.e. the result is fit to cache."""
+    coverage = result.get("coverage") or {}
+    return (bool(coverage) and not coverage["timed_out"]
+            and coverage["map_calls_done"] == coverage["map_calls_total"]
+            and result["stats"]["failed_calls"] == 0)
+
+async def summarize_document(llm, col, doc_id: str, **kw) -> Dict[str, Any]:
+    """Run summarize_events() to the end and return its final event."""
+    final: Dict[str, Any] = {}
+    label = doc_id if not kw.get("pages") else f"{doc_id} pages={kw['pages'][0]}-{kw['pages'][1]}"
+    async for ev in summarize_events(llm, col, doc_id, **kw):
+        if ev["event"] == "level":
+            print(f"[summarize] doc={label} level={ev['level']} {ev['kind']} "
+                  f"calls={ev['calls']} failed={ev['failed']} cancelled={ev['cancelled']} "
+                  f"tokens={ev['prompt_tokens']}+{ev['eval_tokens']} {ev['seconds']}s")
+        elif ev["event"] == "final":
+            final = ev
+    return final
@@ -0,0 +1,156 @@
+# server/services/summary_store.py
+"""
+Persisted document and section summaries, kept in the active project's
+SQLite database.
+
+A summary is keyed by (doc_id, content_hash, model, prompt_version): a
+changed document, a different LLM or a reworded prompt all miss the store
+and regenerate, without anyone having to clear it. Re-ingesting a file
+creates a new doc_id, so nothing goes stale; rows are removed explicitly
+only when their document is deleted.
+"""
+from __future__ import annotations
+import datetime
+import hashlib
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from ..config import resolve_sqlite_path
+
+def _conn():
+    path = resolve_sqlite_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS summaries (
+      doc_id         TEXT NOT NULL,
+      content_hash   TEXT NOT NULL,
+      model          TEXT NOT NULL,
+      prompt_version TEXT NOT NULL,
+      summary_json   TEXT NOT NULL,
+      created_at     TEXT NOT NULL,
+      PRIMARY KEY (doc_id, content_hash, model, prompt_version)
+    );
+    """)
+    # chapters / page windows, precomputed after ingest (services/sections.py)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS section_summaries (
+      doc_id         TEXT NOT NULL,
+      content_hash   TEXT NOT NULL,
+      model          TEXT NOT NULL,
+      prompt_version TEXT NOT NULL,
+      start_page     INTEGER NOT NULL,
+      end_page       INTEGER NOT NULL,
+      title          TEXT NOT NULL,
+      summary_json   TEXT NOT NULL,
+      created_at     TEXT NOT NULL,
+      PRIMARY KEY (doc_id, content_hash, model, prompt_version, start_page, end_page)
+    );
+    """)
+    return con
+
+def doc_content_hash(col, doc_id: str) -> Optional[str]:
+    """
+    Fingerprint of a document as indexed. Ingest stamps the file's sha256 on
+    every chunk; older documents fall back to hashing their chunk texts in
+    order. None when the document has no chunks.
+    """
+    first = col.get(where={"doc_id": doc_id}, limit=1, include=["metadatas"])
+    metas = first.get("metadatas") or []
+    if not metas:
+        return None
+    if metas[0] and metas[0].get("content_hash"):
+        return metas[0]["content_hash"]
+    res = col.get(where={"doc_id": doc_id}, include=["documents", "metadatas"])
+    rows = sorted(
+        zip(res.get("metadatas") or [], res.get("documents") or []),
+        key=lambda r: ((r[0] or {}).get("chunk_index", 0), r[1] or ""),
+    )
+    h = hashlib.sha256()
+    for _, text in rows:
+        h.update((text or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def get_summary(doc_id: str, content_hash: str, model: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    con = _conn()
+    try:
+        row = con.execute(
+            "SELECT summary_json, created_at FROM summaries "
+            "WHERE doc_id = ? AND content_hash = ? AND model = ? AND prompt_version = ?",
+            (doc_id, content_hash, model, prompt_version),
+        ).fetchone()
+    finally:
+        con.close()
+    if not row:
+        return None
+    return {**json.loads(row[0]), "generated_at": row[1]}
+
+def put_summary(doc_id: str, content_hash: str, model: str, prompt_version: str, summary: Dict[str, Any]) -> str:
+    """Store a summary, replacing any older one of the same document."""
+    created_at = datetime.datetime.utcnow().isoformat() + "Z"
+    con = _conn()
+    try:
+        con.execute("DELETE FROM summaries WHERE doc_id = ?", (doc_id,))
+        con.execute(
+            "INSERT INTO summaries(doc_id, content_hash, model, prompt_version, summary_json, created_at) "
+            "VALUES (?,?,?,?,?,?)",
+            (doc_id, content_hash, model, prompt_version, json.dumps(summary, ensure_ascii=False), created_at),
+        )
+        con.commit()
+    finally:
+        con.close()
+    return created_at
+
+def get_section_summaries(doc_id: str, content_hash: str, model: str, prompt_version: str) -> List[Dict[str, Any]]:
+    """Stored sections of a document in page order."""
+    con = _conn()
+    try:
+        rows = con.execute(
+            "SELECT title, start_page, end_page, summary_json, created_at FROM section_summaries "
+            "WHERE doc_id = ? AND content_hash = ? AND model = ? AND prompt_version = ? "
+            "ORDER BY start_page, end_page",
+            (doc_id, content_hash, model, prompt_version),
+        ).fetchall()
+    finally:
+        con.close()
+    return [
+        {"title": r[0], "start_page": r[1], "end_page": r[2], **json.loads(r[3]), "generated_at": r[4]}
+        for r in rows
+    ]
+
+def put_section_summary(
+    doc_id: str, content_hash: str, model: str, prompt_version: str,
+    title: str, start_page: int, end_page: int, summary: Dict[str, Any],
+) -> str:
+    """Store one section, dropping sections made from another version of the document/model/prompt."""
+    created_at = datetime.datetime.utcnow().isoformat() + "Z"
+    con = _conn()
+    try:
+        con.execute(
+            "DELETE FROM section_summaries WHERE doc_id = ? "
+            "AND (content_hash != ? OR model != ? OR prompt_version != ?)",
+            (doc_id, content_hash, model, prompt_version),
+        )
+        con.execute(
+            "INSERT OR REPLACE INTO section_summaries(doc_id, content_hash, model, prompt_version, "
+            "start_page, end_page, title, summary_json, created_at) VALUES (?,?,?,?,?,?,?,?,?)",
+            (doc_id, content_hash, model, prompt_version, start_page, end_page, title,
+             json.dumps(summary, ensure_ascii=False), created_at),
+        )
+        con.commit()
+    finally:
+        con.close()
+    return created_at
+
+def delete_summaries_for_doc(doc_id: str) -> int:
+    """Whole-document and section summaries of a document."""
+    con = _conn()
+    try:
+        n = con.execute("DELETE FROM summaries WHERE doc_id = ?", (doc_id,)).rowcount
+        n += con.execute("DELETE FROM section_summaries WHERE doc_id = ?", (doc_id,)).rowcount
+        con.commit()
+        return n
+    finally:
+        con.close()
@@ -0,0 +1,187 @@
+# server/services/telemetry.py
+"""
+Per-call telemetry from Ollama's own timing fields.
+
+Every generate/embed call is recorded with eval_count, eval_duration,
+prompt_eval_count, prompt_eval_duration, load_duration and total_duration
+(Ollama reports nanoseconds; we keep milliseconds) plus the calling route.
+Calls go into a ring buffer of recent entries and into fixed-bucket
+histograms per (route, kind), served at GET /metrics/llm.
+
+The route is the `route=` label passed to generate(); embed calls (and
+generate calls without a label) fall back to `current_route`, which the
+HTTP middleware in main.py sets from the request path.
+"""
+from __future__ import annotations
+import bisect
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from ..config import LLM_TELEMETRY_BUFFER
+
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+RELOAD_MS = 500.0  # a load_duration above this means Ollama (re)loaded the model
+
+# bucket upper edges per histogram; the last bucket is open-ended
+_EDGES = {
+    "total_ms": [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000],
+    "load_ms": [1, 10, 100, 500, 1000, 5000, 15000, 60000],
+    "prompt_tokens": [32, 64, 128, 256, 512, 1024, 2048, 4096, 8192],
+    "eval_tokens": [16, 32, 64, 128, 256, 512, 1024, 2048],
+    "tokens_per_s": [1, 2, 5, 10, 20, 40, 80, 160],
+    "prompt_tokens_per_s": [50, 100, 250, 500, 1000, 2500, 5000],
+}
+
+def _ms(ns) -> Optional[float]:
+    return round(ns / 1e6, 2) if ns else None
+
+class Histogram:
+    def __init__(self, edges: List[float]):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.n = 0
+        self.total = 0.0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.edges, v)] += 1
+        self.n += 1
+        self.total += v
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper edge of the bucket holding the q-quantile (open bucket: the last edge)."""
+        if not self.n:
+            return None
+        target, seen = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.edges[min(i, len(self.edges) - 1)]
+        return self.edges[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={e}" for e in self.edges] + [f">{self.edges[-1]}"]
+        return {
+            "count": self.n,
+            "mean": round(self.total / self.n, 2) if self.n else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {label: c for label, c in zip(labels, self.counts) if c},
+        }
+
+class _RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.reloads = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.hist = {k: Histogram(e) for k, e in _EDGES.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "reloads": self.reloads,
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+            "histograms": {k: h.to_dict() for k, h in self.hist.items() if h.n},
+        }
+
+class LLMTelemetry:
+    def __init__(self, buffer_size: int = LLM_TELEMETRY_BUFFER):
+        self._lock = threading.Lock()
+        self.recent: deque = deque(maxlen=buffer_size)
+        self.by_route: Dict[tuple, _RouteStats] = {}
+        self.started_at = time.time()
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        route: Optional[str],
+        data: Optional[dict] = None,
+        wall_ms: Optional[float] = None,
+        cached: bool = False,
+        error: Optional[str] = None,
+    ) -> None:
+        """`data` is Ollama's final JSON object (generate, or /api/embed)."""
+        data = data or {}
+        route = route or current_route.get() or "other"
+        prompt_n = int(data.get("prompt_eval_count") or 0)
+        eval_n = int(data.get("eval_count") or 0)
+        eval_ms = _ms(data.get("eval_duration"))
+        prompt_ms = _ms(data.get("prompt_eval_duration"))
+        entry = {
+            "ts": time.time(),
+            "kind": kind,
+            "model": model,
+            "route": route,
+            "cached": cached,
+            "error": error,
+            "wall_ms": round(wall_ms, 1) if wall_ms is not None else None,
+            "total_ms": _ms(data.get("total_duration")),
+            "load_ms": _ms(data.get("load_duration")),
+            "prompt_tokens": prompt_n,
+            "prompt_ms": prompt_ms,
+            "eval_tokens": eval_n,
+            "eval_ms": eval_ms,
+            "tokens_per_s": round(eval_n / (eval_ms / 1000.0), 1) if eval_n and eval_ms else None,
+            "prompt_tokens_per_s": round(prompt_n / (prompt_ms / 1000.0), 1) if prompt_n and prompt_ms else None,
+        }
+        with self._lock:
+            self.recent.append(entry)
+            st = self.by_route.setdefault((route, kind), _RouteStats())
+            st.calls += 1
+            if error:
+                st.errors += 1
+                return
+            if cached:
+                st.cache_hits += 1
+                return
+            st.prompt_tokens += prompt_n
+            st.eval_tokens += eval_n
+            if entry["load_ms"] and entry["load_ms"] > RELOAD_MS:
+                st.reloads += 1
+            for k in _EDGES:
+                v = entry["wall_ms"] if k == "total_ms" and entry["total_ms"] is None else entry.get(k)
+                if v is not None:
+                    st.hist[k].observe(v)
+
+    def snapshot(self, recent: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            routes: Dict[str, Dict[str, Any]] = {}
+            for (route, kind), st in sorted(self.by_route.items()):
+                routes.setdefault(route, {})[kind] = st.to_dict()
+            tail = list(self.recent)[-recent:] if recent > 0 else []
+        return {"since": self.started_at, "routes": routes, "recent": tail}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.by_route.clear()
+            self.started_at = time.time()
+
+telemetry = LLMTelemetry()
+
+class RouteLabelMiddleware:
+    """
+    Plain ASGI middleware (streaming-safe) that sets current_route from the
+    first path segment: "/chat/stream" -> "chat", "/ingest" -> "ingest".
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = current_route.set(scope.get("path", "").strip("/").split("/", 1)[0] or "root")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
@@ -1,19 +1,71 @@
 # server/services/vectorstore.py
+from typing import Optional
+import httpx
 from langchain_chroma import Chroma
 import chromadb
 from .embedder import OllamaEmbedViaEmbedRoute
 
-_client = None
+DEFAULT_COLLECTION = "siraj_docs"
+
+# Per-project HNSW knobs (ProjectManifest.hnsw) -> Chroma collection metadata
+HNSW_KEYS = ("space", "M", "construction_ef", "search_ef")
+HNSW_SPACES = ("l2", "cosine", "ip")
+
+def hnsw_metadata(params: Optional[dict]) -> Optional[dict]:
+    if not params:
+        return None
+    return {f"hnsw:{k}": params[k] for k in HNSW_KEYS if params.get(k) is not None}
+
+_clients: dict[str, chromadb.PersistentClient] = {}
 def _get_client(persist_directory: str) -> chromadb.PersistentClient:
-    global _client
-    if _client is None:
-        _client = chromadb.PersistentClient(path=persist_directory)
-    return _client
+    # one client per persist dir (projects can be switched at runtime)
+    client = _clients.get(persist_directory)
+    if client is None:
+        client = chromadb.PersistentClient(path=persist_directory)
+        _clients[persist_directory] = client
+    return client
 
-def get_vectordb(persist_directory: str, base_url: str, embed_model: str) -> Chroma:
-    embed = OllamaEmbedViaEmbedRoute(model=embed_model, base_url=base_url)
+def get_vectordb(
+    persist_directory: str,
+    base_url: str,
+    embed_model: str,
+    embed_dim: Optional[int] = None,
+    collection_name: str = DEFAULT_COLLECTION,
+    hnsw: Optional[dict] = None,
+    ahttp: Optional[httpx.AsyncClient] = None,
+    keep_alive: Optional[str] = None,
+) -> Chroma:
+    embed = OllamaEmbedViaEmbedRoute(
+        model=embed_model, base_url=base_url, dim=embed_dim, ahttp=ahttp, keep_alive=keep_alive,
+    )
     return Chroma(
-        collection_name="siraj_docs",          # must match everywhere
+        collection_name=collection_name,       # per project, see ProjectManifest.collection_name
         embedding_function=embed,
-        persist_directory=persist_directory,   # must match CHROMA_DIR
+        client=_get_client(persist_directory),  # must match CHROMA_DIR
+        collection_metadata=hnsw_metadata(hnsw),  # only applied when the collection is created
     )
+
+async def asimilarity_search_with_score(db: Chroma, query: str, k: int = 4, filter: Optional[dict] = None):
+    """
+    Async counterpart of db.similarity_search_with_score(): the query is
+    embedded over the async HTTP pool, only the (local, fast) HNSW lookup
+    runs inline. Returns [(Document, distance)] like the sync call.
+    """
+    vec = await db.embeddings.aembed_query(query)
+    return db.similarity_search_by_vector_with_relevance_scores(vec, k=k, filter=filter)
+
+async def asimilarity_search(db: Chroma, query: str, k: int = 4, filter: Optional[dict] = None):
+    vec = await db.embeddings.aembed_query(query)
+    return db.similarity_search_by_vector(vec, k=k, filter=filter)
+
+def delete_doc_vectors(collection, doc_id: str, batch_size: int = 500) -> tuple[int, set[str]]:
+    """
+    Remove every chunk of `doc_id` from a raw Chroma collection in id batches.
+    Returns (chunks_deleted, source paths those chunks pointed at).
+    """
+    res = collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+    ids = list(res.get("ids") or [])
+    sources = {m.get("source") for m in (res.get("metadatas") or []) if m and m.get("source")}
+    for i in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[i:i + batch_size])
+    return len(ids), sources
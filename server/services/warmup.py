@@ -0,0 +1,200 @@
+# server/services/warmup.py
+"""
+Model warm-up and keep-alive.
+
+At startup the LLM and the active project's embedding model are loaded into
+Ollama (an empty generate / a one-word embed). Every request then carries
+`keep_alive=OLLAMA_KEEP_ALIVE`, and a refresher re-pings a model before that
+expires as long as it saw traffic within OLLAMA_KEEPALIVE_IDLE_S, so models
+stay resident while the app is in use and are released once it goes idle.
+Residency is confirmed against Ollama's /api/ps. GET /ready answers 503
+until the startup warm-up has succeeded (it is retried if Ollama was down).
+"""
+from __future__ import annotations
+import asyncio
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..config import OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, OLLAMA_KEEPALIVE_IDLE_S
+
+REFRESH_CHECK_S = 30.0
+
+def keep_alive_seconds(value: str | int | float | None) -> Optional[float]:
+    """Ollama duration ("30m", "1h30m", "300", "-1") -> seconds; None = forever."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+    s = str(value).strip()
+    if s.lstrip("-").replace(".", "", 1).isdigit():
+        return None if float(s) < 0 else float(s)
+    parts = re.findall(r"(\d+(?:\.\d+)?)(h|m|s|ms)", s)
+    if not parts:
+        return 300.0
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+class ModelState:
+    def __init__(self, model: str, kind: str):
+        self.model = model
+        self.kind = kind              # "llm" | "embed"
+        self.warm = False
+        self.load_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.last_used = 0.0          # last real request (monotonic)
+        self.last_ping = 0.0          # last request of any kind, incl. refreshes
+        self.refreshes = 0
+        self.expires_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "model": self.model,
+            "kind": self.kind,
+            "warm": self.warm,
+            "load_ms": self.load_ms,
+            "idle_s": round(now - self.last_used, 1) if self.last_used else None,
+            "refreshes": self.refreshes,
+            "expires_at": self.expires_at,
+            "error": self.error,
+        }
+
+class ModelKeeper:
+    def __init__(self, keep_alive: str = OLLAMA_KEEP_ALIVE, idle_s: float = OLLAMA_KEEPALIVE_IDLE_S):
+        self.keep_alive = keep_alive
+        self.keep_alive_s = keep_alive_seconds(keep_alive)
+        self.idle_s = idle_s
+        self.models: Dict[str, ModelState] = {}
+        self.started_at = time.time()
+        self.warmed_at: Optional[float] = None
+        self._targets: tuple[list[str], list[str]] = ([], [])
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, model: str, kind: str) -> ModelState:
+        st = self.models.get(model)
+        if st is None:
+            st = self.models[model] = ModelState(model, kind)
+        return st
+
+    def note_use(self, model: str, kind: str = "llm") -> None:
+        """Called by the clients after every successful Ollama request."""
+        st = self.track(model, kind)
+        st.last_used = st.last_ping = time.monotonic()
+        st.warm = True
+
+    # ---------- loading ----------
+    async def _ping(self, http: httpx.AsyncClient, st: ModelState) -> None:
+        if st.kind == "embed":
+            url, body = "/api/embed", {"model": st.model, "input": "warm-up"}
+        else:
+            url, body = "/api/generate", {"model": st.model, "prompt": ""}  # empty prompt = load only
+        body["keep_alive"] = self.keep_alive
+        r = await http.post(f"{OLLAMA_BASE_URL}{url}", json=body, timeout=300)
+        r.raise_for_status()
+        st.last_ping = time.monotonic()
+
+    async def warm_up(self, http: httpx.AsyncClient, llm_models: list[str], embed_models: list[str]) -> bool:
+        self._targets = (llm_models, embed_models)
+        states = [self.track(m, "llm") for m in llm_models] + [self.track(m, "embed") for m in embed_models]
+
+        async def load(st: ModelState):
+            t0 = time.perf_counter()
+            try:
+                await self._ping(http, st)
+                st.warm, st.error = True, None
+                st.load_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            except Exception as e:
+                st.warm, st.error = False, f"{type(e).__name__}: {e}"
+
+        await asyncio.gather(*(load(st) for st in states))
+        if all(st.warm for st in states):
+            self.warmed_at = time.time()
+        print("[warmup] " + ", ".join(
+            f"{st.model}={'warm in %sms' % st.load_ms if st.warm else 'FAILED (%s)' % st.error}" for st in states
+        ))
+        return self.ready()
+
+    # ---------- keep-alive refresh ----------
+    async def sync_resident(self, http: httpx.AsyncClient) -> None:
+        """Mark models warm/cold from what Ollama actually has loaded."""
+        r = await http.get(f"{OLLAMA_BASE_URL}/api/ps", timeout=5)
+        r.raise_for_status()
+        loaded = {m.get("name"): m for m in r.json().get("models", [])}
+        loaded.update({m.get("model"): m for m in loaded.values()})
+        for st in self.models.values():
+            hit = loaded.get(st.model) or loaded.get(f"{st.model}:latest")
+            st.warm = hit is not None
+            st.expires_at = hit.get("expires_at") if hit else None
+
+    async def refresh_once(self, http: httpx.AsyncClient) -> None:
+        if self.keep_alive_s is None:
+            return  # "-1": Ollama keeps them forever
+        now = time.monotonic()
+        for st in self.models.values():
+            in_use = st.last_used and now - st.last_used < self.idle_s
+            due = now - st.last_ping >= self.keep_alive_s / 2
+            if in_use and due:
+                try:
+                    await self._ping(http, st)
+                    st.refreshes += 1
+                    st.warm = True
+                except Exception as e:
+                    st.error = f"{type(e).__name__}: {e}"
+
+    async def run(self, http: httpx.AsyncClient) -> None:
+        await self.warm_up(http, *self._targets)
+        while True:
+            await asyncio.sleep(REFRESH_CHECK_S)
+            try:
+                if self.warmed_at is None:
+                    await self.warm_up(http, *self._targets)
+                await self.refresh_once(http)
+                await self.sync_resident(http)
+            except Exception as e:
+                print(f"[warmup] keep-alive refresh failed: {e}")
+
+    def start(self, http: httpx.AsyncClient, llm_models: list[str], embed_models: list[str]) -> None:
+        """Warm up in the background (startup is not blocked), then keep models alive."""
+        self._targets = (llm_models, embed_models)
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(http))
+
+    def skip(self) -> None:
+        """Warm-up disabled (OLLAMA_WARMUP=0): report ready straight away."""
+        self.warmed_at = time.time()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- readiness ----------
+    def ready(self) -> bool:
+        return self.warmed_at is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "keep_alive": self.keep_alive,
+            "idle_s": self.idle_s,
+            "warm_up_s": round(self.warmed_at - self.started_at, 1) if self.warmed_at else None,
+            "models": [st.to_dict() for st in self.models.values()],
+        }
+
+_keeper: Optional[ModelKeeper] = None
+
+def get_keeper() -> ModelKeeper:
+    global _keeper
+    if _keeper is None:
+        _keeper = ModelKeeper()
+    return _keeper
+
+def note_use(model: str, kind: str = "llm") -> None:
+    get_keeper().note_use(model, kind)